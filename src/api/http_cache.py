@@ -0,0 +1,64 @@
+import gzip
+from typing import Optional
+
+from fastapi import Request, Response
+
+# brotli is optional; without it clients are offered gzip only
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 1024
+
+
+def make_etag(generation: int) -> str:
+    """Weak ETag for any response derived from the graph at this generation"""
+    return f'W/"g{generation}"'
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """A 304 response if the client already holds this ETag, else None"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    tags = {tag.strip() for tag in header.split(",")}
+    if "*" in tags or etag in tags or etag[2:] in tags:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    return None
+
+
+def _accepted_encodings(request: Request) -> dict:
+    accepted = {}
+    for item in request.headers.get("accept-encoding", "").split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if coding:
+            accepted[coding.lower()] = quality
+    return accepted
+
+
+def cached_response(request: Request,
+                    body: bytes,
+                    etag: str,
+                    media_type: str = "application/json") -> Response:
+    """
+    Answer with body tagged by etag, compressed with brotli or gzip when the
+    client accepts it and the body is large enough.
+    """
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if len(body) >= MIN_COMPRESS_SIZE:
+        accepted = _accepted_encodings(request)
+        if brotli is not None and accepted.get("br", 0) > 0:
+            body = brotli.compress(body, quality=5)
+            headers["Content-Encoding"] = "br"
+        elif accepted.get("gzip", 0) > 0:
+            body = gzip.compress(body, compresslevel=6)
+            headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type=media_type, headers=headers)
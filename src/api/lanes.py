@@ -0,0 +1,101 @@
+import os
+import asyncio
+import threading
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Dict, Any, Callable, Tuple
+
+from fastapi import HTTPException, status
+
+# Default (worker threads, queued calls) per workload class. Interactive
+# lookups get the most threads; deep searches and batches are few at a time
+# so a burst of them cannot starve autocomplete of CPU or threads.
+DEFAULT_LANES: Dict[str, Tuple[int, int]] = {
+    "interactive": (8, 256),
+    "search": (2, 32),
+    "batch": (1, 4),
+    "write": (4, 256),
+}
+
+
+class LaneFullError(HTTPException):
+    """A lane's threads and queue are all taken; answered as 503 with Retry-After"""
+
+    def __init__(self, lane: str):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Too many {lane} requests in progress",
+            headers={"Retry-After": "1"}
+        )
+
+
+class Lane(Executor):
+    """
+    A bounded thread pool for one class of endpoints. At most ``workers``
+    calls run at once and at most ``max_queue`` more wait; anything beyond
+    that is refused straight away instead of queueing behind slow work.
+    """
+
+    def __init__(self, name: str, workers: int, max_queue: int):
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"chempath-{name}")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def submit(self, fn: Callable, /, *args, **kwargs) -> Future:
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise LaneFullError(self.name)
+            self._pending += 1
+        try:
+            future = self._pool.submit(fn, *args, **kwargs)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future: Future) -> None:
+        with self._lock:
+            self._pending -= 1
+            self.completed += 1
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """Run fn(*args) on this lane without blocking the event loop"""
+        return await asyncio.get_running_loop().run_in_executor(self, fn, *args)
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        self._pool.shutdown(wait, cancel_futures=cancel_futures)
+
+    def metrics(self) -> Dict[str, int]:
+        with self._lock:
+            pending = self._pending
+        return {
+            "workers": self.workers,
+            "running": min(pending, self.workers),
+            "queued": max(pending - self.workers, 0),
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "rejected": self.rejected
+        }
+
+
+def lanes_from_env() -> Dict[str, Lane]:
+    """
+    One Lane per workload class, sized from CHEMPATH_LANE_<CLASS>_WORKERS and
+    CHEMPATH_LANE_<CLASS>_QUEUE (e.g. CHEMPATH_LANE_SEARCH_WORKERS=4)
+    """
+    lanes = {}
+    for name, (workers, max_queue) in DEFAULT_LANES.items():
+        prefix = f"CHEMPATH_LANE_{name.upper()}"
+        lanes[name] = Lane(
+            name,
+            max(1, int(os.getenv(f"{prefix}_WORKERS", workers))),
+            max(0, int(os.getenv(f"{prefix}_QUEUE", max_queue)))
+        )
+    return lanes
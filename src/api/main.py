@@ -1,12 +1,21 @@
-from fastapi import FastAPI, HTTPException, Query, status
+from fastapi import FastAPI, HTTPException, Query, status, Depends, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 import os
+import time
+import asyncio
 from dotenv import load_dotenv
 from datetime import datetime
 import logging
 from src.database.graph_manager import ChemicalGraph
+from src.database.deadline import Deadline, DeadlineExceeded
+from src.database.write_queue import WriteQueue, QueueFullError
+from src.api.serialization import RawJSONResponse, dumps, fragments_for
+from src.api.http_cache import make_etag, not_modified, cached_response
+from src.api.single_flight import SingleFlight
+from src.api.lanes import LaneFullError, lanes_from_env
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -34,9 +43,36 @@ app.add_middleware(
 # Global graph instance
 graph = None
 
+# Write-behind queue, set when CHEMPATH_WRITE_BEHIND is enabled
+write_queue = None
+
+# Bounded thread pools per workload class, so slow searches never hold up
+# autocomplete and no endpoint blocks the event loop
+lanes = lanes_from_env()
+
+# Identical /paths/ queries running at the same time share one search
+path_flights = SingleFlight(lanes["search"])
+
+# Admission control for /paths/: queries whose estimated number of partial
+# routes exceeds the limit are rejected, downgraded to shortest routes only
+# or queued on the batch lane; above the hard limit they are always rejected
+PATH_COST_LIMIT = int(os.getenv("CHEMPATH_PATH_COST_LIMIT", "200000"))
+PATH_COST_HARD_LIMIT = int(os.getenv("CHEMPATH_PATH_COST_HARD_LIMIT", str(PATH_COST_LIMIT * 50)))
+PATH_COST_POLICY = os.getenv("CHEMPATH_PATH_COST_POLICY", "downgrade")
+
+# Default time budget (seconds) of a /paths/ search, and how often a waiting
+# request checks whether its client is still connected
+PATH_TIMEOUT = float(os.getenv("CHEMPATH_PATH_TIMEOUT", "10"))
+DISCONNECT_POLL_INTERVAL = 0.1
+
+# Identical searches coalesce only when they arrive within the same window
+# (seconds): followers share the first caller's deadline, so this bounds how
+# much of their own time budget they can lose to it
+COALESCE_WINDOW = float(os.getenv("CHEMPATH_COALESCE_WINDOW", "0.5"))
+
 @app.on_event("startup")
 async def startup_event():
-    global graph
+    global graph, write_queue
     logger.info("Starting up ChemPath API")
     
     required_vars = ["NEO4J_URI", "NEO4J_USER", "NEO4J_PASSWORD"]
@@ -46,21 +82,35 @@ async def startup_event():
         logger.error(f"Missing required environment variables: {', '.join(missing_vars)}")
         raise RuntimeError(f"Missing required environment variables: {', '.join(missing_vars)}")
     
-    try:
-        # Initialize graph with connection retry logic
-        graph = ChemicalGraph(
-            os.getenv("NEO4J_URI"),
-            os.getenv("NEO4J_USER"),
-            os.getenv("NEO4J_PASSWORD")
+    # Connect (with backoff) and warm the route index in the background so the
+    # worker can serve /health immediately; /ready reports when it is usable
+    graph = ChemicalGraph(
+        os.getenv("NEO4J_URI"),
+        os.getenv("NEO4J_USER"),
+        os.getenv("NEO4J_PASSWORD"),
+        connect=False,
+        hierarchy_path=os.getenv("CHEMPATH_HIERARCHY_PATH")
+    )
+    graph.connect_in_background()
+
+    # In write-behind mode compound and reaction submissions are queued on
+    # disk and written in batches instead of waiting for Neo4j
+    if os.getenv("CHEMPATH_WRITE_BEHIND", "").lower() in ("1", "true", "yes"):
+        write_queue = WriteQueue(
+            os.getenv("CHEMPATH_WRITE_QUEUE_PATH", "write_queue.db"),
+            max_depth=int(os.getenv("CHEMPATH_WRITE_QUEUE_DEPTH", "10000"))
         )
-        logger.info("Successfully initialized ChemPath API")
-    except Exception as e:
-        logger.error(f"Failed to initialize graph database: {str(e)}")
-        raise
+        write_queue.start(graph)
+        logger.info(f"Write-behind queue enabled with {write_queue.depth} pending writes")
+    logger.info("ChemPath API started, connecting to Neo4j in the background")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     global graph
+    if write_queue:
+        write_queue.stop()
+    for lane in lanes.values():
+        lane.shutdown(wait=False)
     if graph:
         graph.close()
         logger.info("Closed Neo4j connection")
@@ -78,6 +128,8 @@ class CompoundCreate(BaseModel):
 
 class ReactionConditions(BaseModel):
     reagent: str
+    type: Optional[str] = None
+    curriculum: Optional[bool] = None
     temperature: Optional[float] = None
     pressure: Optional[float] = None
     mechanism: Optional[str] = None
@@ -90,6 +142,37 @@ class ReactionCreate(BaseModel):
     conditions: ReactionConditions
 
 
+class PathPair(BaseModel):
+    start: str
+    end: str
+
+
+class BatchPathRequest(BaseModel):
+    pairs: List[PathPair] = Field(..., min_length=1, max_length=1000)
+    max_steps: int = Field(default=5, le=10)
+    paths_per_pair: Optional[int] = Field(default=None, ge=1)
+    exclude_reagents: Optional[List[str]] = None
+    reaction_types: Optional[List[str]] = None
+    max_temperature: Optional[float] = None
+    curriculum_only: bool = False
+
+
+class DistanceMatrixRequest(BaseModel):
+    starts: List[str] = Field(..., min_length=1, max_length=5000)
+    ends: List[str] = Field(..., min_length=1, max_length=5000)
+    max_steps: int = Field(default=5, le=10)
+    exclude_reagents: Optional[List[str]] = None
+    reaction_types: Optional[List[str]] = None
+    max_temperature: Optional[float] = None
+    curriculum_only: bool = False
+
+
+class MultiReactionCreate(BaseModel):
+    reactants: List[str] = Field(..., min_length=1)
+    products: List[str] = Field(..., min_length=1)
+    conditions: ReactionConditions
+
+
 # Endpoints
 
 @app.get("/")
@@ -102,114 +185,656 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """API health check endpoint"""
-    if not graph:
+    """Liveness check: the API process is up (does not touch the database)"""
+    return {
+        "status": "alive",
+        "database": "connected" if graph and graph.is_ready else "connecting",
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness check: the database is reachable and the route index is built"""
+    if not graph or not graph.is_ready:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Database connection not initialized"
         )
     
     try:
-        # Try to execute a simple query to verify database connection
-        with graph._driver.session() as session:
-            result = session.run("RETURN 1 as num").single()
-            if result and result["num"] == 1:
-                return {
-                    "status": "healthy",
-                    "database": "connected",
-                    "timestamp": datetime.utcnow().isoformat()
-                }
+        await lanes["interactive"].run(probe_database)
+    except LaneFullError:
+        raise
     except Exception as e:
-        logger.error(f"Health check failed: {str(e)}")
+        logger.error(f"Readiness check failed: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=f"Database connection error: {str(e)}"
         )
 
+    if not graph.index_ready:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Route index is warming up"
+        )
+    return {
+        "status": "ready",
+        "database": "connected",
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+def probe_database() -> None:
+    """Run a trivial query to verify the database connection"""
+    with graph._session() as session:
+        result = session.run("RETURN 1 as num").single()
+    if not result or result["num"] != 1:
+        raise RuntimeError("Unexpected response from database")
+
 
-@app.get("/compounds/", response_model=List[Dict[str, Any]])
+def require_graph():
+    """Reject requests with 503 until the database connection is ready"""
+    if not graph or not graph.is_ready:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database connection not ready"
+        )
+
+
+async def enqueue_write(kind: str, payload: Dict[str, Any]) -> JSONResponse:
+    """Queue a write and answer 202 with its ticket, or 503 when the queue is full"""
+    try:
+        # The queue lives in SQLite, so even a submit stays off the event loop
+        ticket = await lanes["write"].run(write_queue.submit, kind, payload)
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "5"}
+        )
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={"ticket": ticket, "status": "queued", "queue_depth": write_queue.depth},
+        headers={"Location": f"/writes/{ticket}"}
+    )
+
+
+@app.get("/generation", dependencies=[Depends(require_graph)])
+async def get_generation():
+    """Current graph generation; it changes whenever compounds or reactions are written"""
+    try:
+        return {"generation": await lanes["interactive"].run(graph.read_generation)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/compounds/", response_model=List[Dict[str, Any]],
+         dependencies=[Depends(require_graph)])
 async def get_compounds(
+    request: Request,
     search: Optional[str] = None
 ):
     """Get all compounds with optional filtering."""
+    etag = make_etag(graph.generation)
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
     try:
         filters = {}
         if search:
             filters["search"] = search
 
-        compounds = graph.get_compounds(filters)
-        return compounds
+        compounds = await lanes["interactive"].run(graph.get_compounds, filters)
+        return cached_response(request, dumps(compounds), etag)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.get("/compounds/{formula}", response_model=Dict[str, Any])
-async def get_compound(formula: str):
+@app.get("/compounds/{formula}", response_model=Dict[str, Any],
+         dependencies=[Depends(require_graph)])
+async def get_compound(request: Request, formula: str):
     """Get detailed information about a specific compound"""
+    etag = make_etag(graph.generation)
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
     try:
-        compound = graph.get_compound(formula)
+        compound = await lanes["interactive"].run(graph.get_compound, formula)
         if not compound:
             raise HTTPException(status_code=404, detail="Compound not found")
-        return compound
+        return cached_response(request, dumps(compound), etag)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.get("/compounds/suggestions/", response_model=List[Dict[str, Any]])
+@app.get("/compounds/suggestions/", response_model=List[Dict[str, Any]],
+         dependencies=[Depends(require_graph)])
 async def get_compound_suggestions(
+    request: Request,
     prefix: str = Query(..., min_length=1),
     limit: int = Query(default=10, le=50)
 ):
     """Get compound suggestions for autocomplete"""
+    etag = make_etag(graph.generation)
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
     try:
-        suggestions = graph.get_compound_suggestions(prefix, limit)
-        return suggestions
+        suggestions = await lanes["interactive"].run(graph.get_compound_suggestions, prefix, limit)
+        return cached_response(request, dumps(suggestions), etag)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.get("/paths/", response_model=List[Dict[str, Any]])
+@app.get("/paths/", response_model=Dict[str, Any],
+         dependencies=[Depends(require_graph)])
 async def find_paths(
+    request: Request,
+    start: Optional[List[str]] = Query(default=None),
+    end: Optional[List[str]] = Query(default=None),
+    start_class: Optional[str] = None,
+    end_class: Optional[str] = None,
+    max_steps: int = Query(default=5, le=10),
+    paths_per_pair: Optional[int] = Query(default=None, ge=1),
+    exclude_reagent: Optional[List[str]] = Query(default=None),
+    reaction_type: Optional[List[str]] = Query(default=None),
+    max_temperature: Optional[float] = None,
+    curriculum_only: bool = False,
+    timeout: Optional[float] = Query(default=None, gt=0, le=60),
+    partial: bool = False
+):
+    """
+    Find possible reaction paths between compounds.
+
+    `start` and `end` may be repeated, and `start_class` / `end_class` select
+    every compound of a class, so "any alcohol to any carboxylic acid" is a
+    single request answered by a single search. Reactions can be restricted
+    by excluded reagents, allowed reaction types, a maximum temperature (°C)
+    and to curriculum reactions only.
+
+    Paths reference compounds by formula; their details are listed once in
+    the shared `compounds` table. Identical requests arriving while one is
+    being answered share its search (counted in `/metrics`).
+
+    Every answer other than 304 carries `X-Path-Cost-Estimate`, the predicted
+    number of partial routes, and `X-Path-Plan`. Queries estimated above the server's
+    limit are answered with the shortest routes only ("shortest"), queued
+    behind batch work ("queued") or refused with 422, depending on its policy.
+
+    A search gets `timeout` seconds (the server default when omitted) and
+    stops when every client waiting for it has disconnected. Past the budget
+    it fails with 504, or with `partial=true` returns the routes found so far
+    marked `"truncated": true`.
+    """
+    if not (start or start_class) or not (end or end_class):
+        raise HTTPException(
+            status_code=400, detail="Provide start/start_class and end/end_class")
+    generation = graph.generation
+    etag = make_etag(generation)
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+    # The budget covers loading a new snapshot for the estimate too
+    deadline = Deadline(timeout or PATH_TIMEOUT)
+    try:
+        # May have to load a new snapshot, so it runs with the searches
+        estimate = await lanes["search"].run(
+            graph.estimate_routes, start, end, max_steps, start_class, end_class, deadline)
+    except HTTPException:
+        raise
+    except DeadlineExceeded:
+        raise path_timeout()
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    plan = admission_plan(estimate)
+    headers = {"X-Path-Cost-Estimate": str(estimate), "X-Path-Plan": plan}
+    constraints = {
+        "exclude_reagents": exclude_reagent,
+        "reaction_types": reaction_type,
+        "max_temperature": max_temperature,
+        "curriculum_only": curriculum_only
+    }
+    key = (generation, tuple(start or ()), tuple(end or ()), start_class, end_class,
+           max_steps, paths_per_pair, tuple(exclude_reagent or ()), tuple(reaction_type or ()),
+           max_temperature, curriculum_only, plan == "shortest", timeout, partial,
+           int(time.monotonic() // COALESCE_WINDOW))
+    try:
+        # The deadline is cancelled only once every coalesced caller has gone
+        result = await unless_disconnected(request, path_flights.do(
+            key, paths_body, start, end, max_steps, start_class, end_class,
+            paths_per_pair, constraints, plan == "shortest", deadline, partial,
+            executor=lanes["batch"] if plan == "queued" else None,
+            on_abandon=deadline.cancel))
+        if result is None:
+            raise HTTPException(
+                status_code=404, detail="No valid paths found between compounds", headers=headers)
+        body, truncated = result
+        if truncated:
+            # Never validate a truncated answer as the full one for this generation
+            response = RawJSONResponse(body, headers={"Cache-Control": "no-store"})
+        else:
+            response = cached_response(request, body, etag)
+        response.headers.update(headers)
+        return response
+    except HTTPException:
+        raise
+    except DeadlineExceeded:
+        raise path_timeout(headers)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def admission_plan(estimate: int) -> str:
+    """How to run a path query of this estimated cost: full, shortest or queued (or refuse it)"""
+    if estimate <= PATH_COST_LIMIT:
+        return "full"
+    if estimate > PATH_COST_HARD_LIMIT or PATH_COST_POLICY == "reject":
+        raise HTTPException(
+            status_code=422,
+            detail=f"Query too expensive (about {estimate} partial routes); "
+                   f"lower max_steps or choose fewer start compounds",
+            headers={"X-Path-Cost-Estimate": str(estimate)}
+        )
+    return "queued" if PATH_COST_POLICY == "queue" else "shortest"
+
+
+def path_timeout(headers: Optional[Dict[str, str]] = None) -> HTTPException:
+    """504 for a path query that ran out of time, in Neo4j or in the search"""
+    return HTTPException(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        detail="Path search exceeded its time budget",
+        headers=headers
+    )
+
+
+async def unless_disconnected(request: Request, awaitable) -> Any:
+    """Await awaitable, cancelling it as soon as the client disconnects"""
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                await asyncio.wait({task})
+                # Nobody is left to read this; the status is only for the logs
+                raise HTTPException(status_code=499, detail="Client disconnected")
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+def paths_body(start, end, max_steps, start_class, end_class, paths_per_pair,
+               constraints, shortest_only=False, deadline=None,
+               partial=False) -> Optional[Tuple[bytes, bool]]:
+    """
+    Run a path search and serialize it, or None when nothing was found.
+    Returns (body, truncated); truncated answers are only given with partial.
+    """
+    stats = {}
+    routes = graph.find_routes(
+        start, end, max_steps,
+        start_class=start_class,
+        end_class=end_class,
+        paths_per_pair=paths_per_pair,
+        constraints=constraints,
+        shortest_only=shortest_only,
+        deadline=deadline,
+        partial=partial,
+        stats=stats
+    )
+    truncated = stats.get("truncated", False)
+    if not routes and not truncated:
+        return None
+    fragments = fragments_for(graph.get_index())
+    body = (b'{"compounds":' + fragments.compound_table(routes) +
+            b',"paths":' + fragments.routes(routes))
+    return body + (b',"truncated":true}' if truncated else b'}'), truncated
+
+
+@app.get("/paths/stream", dependencies=[Depends(require_graph)])
+async def stream_paths(
+    request: Request,
+    start: Optional[List[str]] = Query(default=None),
+    end: Optional[List[str]] = Query(default=None),
+    start_class: Optional[str] = None,
+    end_class: Optional[str] = None,
+    max_steps: int = Query(default=5, le=10),
+    paths_per_pair: Optional[int] = Query(default=None, ge=1),
+    limit: Optional[int] = Query(default=None, ge=1),
+    exclude_reagent: Optional[List[str]] = Query(default=None),
+    reaction_type: Optional[List[str]] = Query(default=None),
+    max_temperature: Optional[float] = None,
+    curriculum_only: bool = False,
+    timeout: Optional[float] = Query(default=None, gt=0, le=60)
+):
+    """
+    Find reaction paths by iterative deepening, streaming them shortest first.
+
+    Takes the parameters of `/paths/`. Routes of 1, 2, 3… steps are searched
+    in turn and each number of steps that has routes is sent as soon as it is
+    done, as `{"depth", "compounds", "paths"}`, followed by a final
+    `{"done": true, "routes", "truncated"}`. The stream ends once `limit`
+    routes were sent, so the first result takes as long as a search to the
+    shortest distance whatever `max_steps` is.
+
+    The stream is newline-delimited JSON, or server-sent events (`depth` and
+    `done` events) when the client accepts `text/event-stream`. Nothing found
+    answers 404 and running out of time before the first result 504; later
+    it ends the stream with `"truncated": true`.
+    """
+    if not (start or start_class) or not (end or end_class):
+        raise HTTPException(
+            status_code=400, detail="Provide start/start_class and end/end_class")
+    constraints = {
+        "exclude_reagents": exclude_reagent,
+        "reaction_types": reaction_type,
+        "max_temperature": max_temperature,
+        "curriculum_only": curriculum_only
+    }
+    deadline = Deadline(timeout or PATH_TIMEOUT)
+    headers = {}
+    depths = None
+    try:
+        estimate = await lanes["search"].run(
+            graph.estimate_routes, start, end, max_steps, start_class, end_class, deadline)
+        plan = admission_plan(estimate)
+        headers = {"X-Path-Cost-Estimate": str(estimate), "X-Path-Plan": plan}
+        lane = lanes["batch"] if plan == "queued" else lanes["search"]
+        depths = graph.routes_by_depth(
+            start, end, max_steps,
+            start_class=start_class,
+            end_class=end_class,
+            paths_per_pair=paths_per_pair,
+            constraints=constraints,
+            limit=limit,
+            deadline=deadline
+        )
+        first = await unless_disconnected(request, lane.run(next, depths, None))
+    except HTTPException:
+        stop_search(deadline, depths)
+        raise
+    except DeadlineExceeded:
+        stop_search(deadline, depths)
+        raise path_timeout(headers)
+    except Exception as e:
+        stop_search(deadline, depths)
+        raise HTTPException(status_code=400, detail=str(e))
+    if first is None:
+        stop_search(deadline, depths)
+        raise HTTPException(
+            status_code=404, detail="No valid paths found between compounds", headers=headers)
+
+    sse = "text/event-stream" in request.headers.get("accept", "")
+
+    async def frames():
+        found, truncated, item = 0, False, first
+        try:
+            while item is not None:
+                depth, routes, index = item
+                found += len(routes)
+                fragments = fragments_for(index)
+                yield stream_frame(
+                    "depth",
+                    b'{"depth":' + str(depth).encode() +
+                    b',"compounds":' + fragments.compound_table(routes) +
+                    b',"paths":' + fragments.routes(routes) + b'}',
+                    sse)
+                if plan == "shortest":
+                    break
+                if await request.is_disconnected():
+                    return
+                item = await lane.run(next, depths, None)
+        except DeadlineExceeded:
+            truncated = True
+        except HTTPException as e:
+            # The lane was full; end the stream with what was sent
+            logger.error(f"Path stream stopped early: {e.detail}")
+            truncated = True
+        finally:
+            # Also runs when the response is cancelled because the client went away
+            stop_search(deadline, depths)
+        yield stream_frame("done", dumps({"done": True, "routes": found, "truncated": truncated}), sse)
+
+    headers["Cache-Control"] = "no-cache"
+    if sse:
+        # Keep reverse proxies from buffering the events
+        headers["X-Accel-Buffering"] = "no"
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers=headers
+    )
+
+
+def stop_search(deadline: Deadline, depths) -> None:
+    """
+    End a streamed search: cancel its deadline and close the depth generator.
+    A generator still running on a lane thread is left to stop at its next
+    deadline check.
+    """
+    deadline.cancel()
+    if depths is not None and not depths.gi_running:
+        depths.close()
+
+
+def stream_frame(event: str, payload: bytes, sse: bool) -> bytes:
+    """One message of a streamed response: a server-sent event or an NDJSON line"""
+    if sse:
+        return b"event: " + event.encode() + b"\ndata: " + payload + b"\n\n"
+    return payload + b"\n"
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Counters for request coalescing and the per-class execution lanes"""
+    return {
+        "path_single_flight": path_flights.metrics(),
+        "lanes": {name: lane.metrics() for name, lane in lanes.items()}
+    }
+
+
+@app.get("/reachable", response_model=Dict[str, Any],
+         dependencies=[Depends(require_graph)])
+async def check_reachable(
+    request: Request,
     start: str,
     end: str,
+    max_steps: Optional[int] = Query(default=None, ge=1, le=10)
+):
+    """
+    Can `end` be made from `start` (within `max_steps` reactions)? Answered
+    from the reachability index without enumerating paths; `steps` is the
+    length of the shortest route when `max_steps` is given.
+    """
+    etag = make_etag(graph.generation)
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+    try:
+        result = await lanes["interactive"].run(graph.is_reachable, start, end, max_steps)
+        if result is None:
+            raise HTTPException(status_code=404, detail="Compound not found")
+        return cached_response(request, dumps(result), etag)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/paths/batch", response_model=Dict[str, Any],
+          dependencies=[Depends(require_graph)])
+async def find_paths_batch(request: BatchPathRequest):
+    """
+    Find reaction paths for many start/end pairs (e.g. a worksheet) at once.
+    Returns one entry per pair, in request order, with an empty `paths` list
+    for pairs that have no route, plus one shared `compounds` table.
+    """
+    def solve() -> bytes:
+        results = graph.find_paths_batch(
+            [(pair.start, pair.end) for pair in request.pairs],
+            request.max_steps,
+            request.paths_per_pair,
+            constraints={
+                "exclude_reagents": request.exclude_reagents,
+                "reaction_types": request.reaction_types,
+                "max_temperature": request.max_temperature,
+                "curriculum_only": request.curriculum_only
+            }
+        )
+        fragments = fragments_for(graph.get_index())
+        return (
+            b'{"compounds":' + fragments.compound_table(
+                route for result in results for route in result["paths"]) +
+            b',"results":[' + b",".join(
+                b'{"start":' + dumps(result["start"]) +
+                b',"end":' + dumps(result["end"]) +
+                b',"paths":' + fragments.routes(result["paths"]) + b'}'
+                for result in results
+            ) + b']}'
+        )
+
+    try:
+        return RawJSONResponse(await lanes["batch"].run(solve))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/paths/batch/distances", response_model=Dict[str, Any],
+          dependencies=[Depends(require_graph)])
+async def find_distances_batch(request: DistanceMatrixRequest):
+    """
+    Fewest reaction steps from every start to every end (e.g. for analytics
+    over a whole worksheet), as a matrix with null where there is no route
+    within `max_steps`. All starts are expanded together in one pass.
+    """
+    try:
+        result = await lanes["batch"].run(
+            graph.hop_distances,
+            request.starts,
+            request.ends,
+            request.max_steps,
+            {
+                "exclude_reagents": request.exclude_reagents,
+                "reaction_types": request.reaction_types,
+                "max_temperature": request.max_temperature,
+                "curriculum_only": request.curriculum_only
+            }
+        )
+        return RawJSONResponse(dumps(result))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/synthesis/", response_model=Dict[str, Any],
+         dependencies=[Depends(require_graph)])
+async def plan_synthesis(
+    target: str,
+    available: List[str] = Query(..., min_length=1),
     max_steps: int = Query(default=5, le=10)
 ):
-    """Find possible reaction paths between two compounds."""
+    """
+    Plan a synthesis of target from the available compounds, allowing
+    reactions that need several reactants (e.g. esterification).
+    """
     try:
-        paths = graph.find_paths(start, end, max_steps)
-        if not paths:
+        plan = await lanes["batch"].run(graph.plan_synthesis, target, available, max_steps)
+        if not plan:
             raise HTTPException(
-                status_code=404, detail="No valid paths found between compounds")
-        return paths
+                status_code=404, detail="No synthesis found from the available compounds")
+        return plan
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @app.post("/compounds/", response_model=Dict[str, Any])
 async def create_compound(compound: CompoundCreate):
-    """Create a new compound."""
+    """Create a new compound (queued with a ticket in write-behind mode)."""
+    properties = {k: v for k, v in compound.dict().items() if v is not None}
+    if write_queue:
+        return await enqueue_write("compound", {"formula": compound.formula, "properties": properties})
+    require_graph()
     try:
-        result = graph.add_compound(
+        result = await lanes["write"].run(
+            graph.add_compound,
             compound.formula,  # Mandatory
-            {k: v for k, v in compound.dict().items() if v is not None}
+            properties
         )
         return result.get("c")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @app.post("/reactions/", response_model=str)
 async def create_reaction(reaction: ReactionCreate):
-    """Create a new reaction between compounds."""
+    """Create a new reaction between compounds (queued with a ticket in write-behind mode)."""
+    if write_queue:
+        return await enqueue_write("reaction", {
+            "reactant": reaction.reactant,
+            "product": reaction.product,
+            "conditions": reaction.conditions.dict()
+        })
+    require_graph()
     try:
-        result = graph.add_reaction(
+        result = await lanes["write"].run(
+            graph.add_reaction,
             reaction.reactant,
             reaction.product,
             reaction.conditions.dict()
         )
         return "Reaction created successfully"
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@app.post("/reactions/multi", response_model=str,
+          dependencies=[Depends(require_graph)])
+async def create_multi_reaction(reaction: MultiReactionCreate):
+    """Create a reaction with several reactants and/or products."""
+    try:
+        result = await lanes["write"].run(
+            graph.add_multi_reaction,
+            reaction.reactants,
+            reaction.products,
+            reaction.conditions.dict()
+        )
+        if not result:
+            raise HTTPException(
+                status_code=404, detail="All reactants and products must exist as compounds")
+        return "Reaction created successfully"
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/writes/{ticket}", response_model=Dict[str, Any])
+async def get_write_status(ticket: str):
+    """Status of a queued write: queued, done or failed."""
+    result = await lanes["write"].run(write_queue.status, ticket) if write_queue else None
+    if result is None:
+        raise HTTPException(status_code=404, detail="Write ticket not found")
+    return result
+
+
 # Run the API with Uvicorn: `uvicorn src.api.main:app --reload`
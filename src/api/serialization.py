@@ -0,0 +1,101 @@
+import json
+import threading
+from typing import Any, Dict, Iterable, List, Tuple
+
+from fastapi import Response
+
+from src.database.models import Compound, Reaction, Route
+from src.database.reaction_index import ReactionIndex
+
+# orjson is optional; it is several times faster than the stdlib encoder
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(value: Any) -> bytes:
+    """Encode a value as compact UTF-8 JSON"""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class RawJSONResponse(Response):
+    """Response whose body is already encoded JSON; skips FastAPI's encoder"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
+
+
+class FragmentCache:
+    """
+    Encoded JSON for the compounds and reactions of one ReactionIndex.
+
+    Each record is encoded once, the first time a response needs it, and path
+    responses are assembled by joining the cached fragments. Reactions are
+    keyed by object identity; the cache keeps a reference to each reaction
+    so an id can never be reused by a different object.
+    """
+
+    def __init__(self, index: ReactionIndex):
+        self.index = index
+        self._compounds: Dict[str, bytes] = {}
+        self._reactions: Dict[int, Tuple[Reaction, bytes]] = {}
+
+    def compound(self, formula: str) -> bytes:
+        fragment = self._compounds.get(formula)
+        if fragment is None:
+            node_id = self.index.ids.get(formula)
+            compound = self.index.compounds[node_id] if node_id is not None else Compound(formula)
+            fragment = self._compounds[formula] = dumps(compound.to_dict())
+        return fragment
+
+    def reaction(self, reaction: Reaction) -> bytes:
+        entry = self._reactions.get(id(reaction))
+        if entry is None or entry[0] is not reaction:
+            entry = self._reactions[id(reaction)] = (reaction, dumps(reaction.to_dict()))
+        return entry[1]
+
+    def route(self, route: Route) -> bytes:
+        reactions = route.reactions
+        return b"".join((
+            b'{"start":', dumps(route.start),
+            b',"end":', dumps(route.end),
+            b',"compounds":', dumps(list(route.compounds)),
+            b',"reactions":[', b",".join(self.reaction(r) for r in reactions),
+            b'],"reagents":', dumps([r.reagent for r in reactions]),
+            b',"alternatives":[', b",".join(
+                b"[" + b",".join(self.reaction(r) for r in alternatives) + b"]"
+                for alternatives in route.steps),
+            b'],"total_steps":', str(route.total_steps).encode(),
+            b"}"
+        ))
+
+    def routes(self, routes: List[Route]) -> bytes:
+        return b"[" + b",".join(self.route(route) for route in routes) + b"]"
+
+    def compound_table(self, routes: Iterable[Route]) -> bytes:
+        formulas = dict.fromkeys(formula for route in routes for formula in route.compounds)
+        return b"{" + b",".join(
+            dumps(formula) + b":" + self.compound(formula) for formula in formulas
+        ) + b"}"
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def fragments_for(index: ReactionIndex) -> FragmentCache:
+    """The fragment cache for index, replacing the cache of any older snapshot"""
+    global _cache
+    cache = _cache
+    if cache is None or cache.index is not index:
+        with _cache_lock:
+            if _cache is None or _cache.index is not index:
+                _cache = FragmentCache(index)
+            cache = _cache
+    return cache
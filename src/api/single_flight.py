@@ -0,0 +1,81 @@
+import asyncio
+from concurrent.futures import Executor
+from typing import Optional, Dict, Any, Callable, Hashable
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls: the first caller for a key starts
+    the computation on an executor thread, and everyone who asks for the
+    same key while it is running awaits that same result (or exception).
+    Nothing is cached once the computation finishes, so keys should include
+    whatever makes an answer stale (e.g. the graph generation). When every
+    caller has gone away, the on_abandon callback given by the first one is
+    called so the computation can stop early.
+    """
+
+    def __init__(self, executor: Optional[Executor] = None):
+        self._executor = executor
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self._waiters: Dict[Hashable, int] = {}
+        self._abandon: Dict[Hashable, Callable[[], None]] = {}
+        self.started = 0
+        self.coalesced = 0
+        self.failed = 0
+        self.abandoned = 0
+
+    async def do(self, key: Hashable, fn: Callable[..., Any], *args,
+                 executor: Optional[Executor] = None,
+                 on_abandon: Optional[Callable[[], None]] = None) -> Any:
+        """Await fn(*args) for key, on executor if given instead of the default one"""
+        loop = asyncio.get_running_loop()
+        # Runs on the event loop thread, so no lock is needed around _calls
+        future = self._calls.get(key)
+        if future is None:
+            future = loop.run_in_executor(executor or self._executor, fn, *args)
+            self._calls[key] = future
+            self.started += 1
+            future.add_done_callback(lambda done, key=key: self._finished(key, done))
+            self._waiters[key] = 0
+            if on_abandon is not None:
+                self._abandon[key] = on_abandon
+        else:
+            self.coalesced += 1
+        self._waiters[key] += 1
+        # A caller that goes away (client disconnect) must not cancel the
+        # computation the others are waiting for
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if self._calls.get(key) is future and key in self._waiters:
+                self._waiters[key] -= 1
+                if not self._waiters[key]:
+                    # Later callers must not join a computation being stopped
+                    self.abandoned += 1
+                    del self._calls[key]
+                    del self._waiters[key]
+                    callback = self._abandon.pop(key, None)
+                    if callback is not None:
+                        callback()
+            raise
+
+    def _finished(self, key: Hashable, future: asyncio.Future) -> None:
+        if self._calls.get(key) is future:
+            del self._calls[key]
+            self._waiters.pop(key, None)
+            self._abandon.pop(key, None)
+        if not future.cancelled() and future.exception() is not None:
+            self.failed += 1
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def metrics(self) -> Dict[str, int]:
+        return {
+            "in_flight": self.in_flight,
+            "started": self.started,
+            "coalesced": self.coalesced,
+            "failed": self.failed,
+            "abandoned": self.abandoned
+        }
@@ -0,0 +1,178 @@
+import os
+import pickle
+import logging
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Dict, Any, List, Tuple
+
+from src.database.reaction_index import ReactionIndex
+from src.database.frontier import hop_distances, NO_ROUTE
+from src.database.models import Route
+
+logger = logging.getLogger(__name__)
+
+# Snapshot file last loaded by this worker process, and the snapshot itself
+_worker_snapshot: Tuple[Optional[str], Optional[ReactionIndex]] = (None, None)
+
+
+def _worker_index(path: str) -> ReactionIndex:
+    """The snapshot pickled at path, loaded once per worker process"""
+    global _worker_snapshot
+    if _worker_snapshot[0] != path:
+        with open(path, "rb") as f:
+            _worker_snapshot = (path, pickle.load(f))
+    return _worker_snapshot[1]
+
+
+def solve_source(index: ReactionIndex,
+                 source: str,
+                 targets: List[str],
+                 max_depth: int,
+                 paths_per_pair: Optional[int],
+                 constraints: Optional[Dict[str, Any]]) -> Dict[str, List[Route]]:
+    """Answer every (source, target) pair of a group with a single search tree"""
+    results = {target: [] for target in targets}
+    sources = index.resolve([source])
+    target_ids = index.resolve(targets)
+    if not sources or not target_ids:
+        return results
+
+    edge_mask = index.compile_constraints(constraints)
+    for route in index.find_routes(sources, target_ids, max_depth, paths_per_pair, edge_mask):
+        path = index.describe_route(route, constraints)
+        results[path.end].append(path)
+    return results
+
+
+def _solve_in_worker(task: Tuple) -> Dict[str, List[Route]]:
+    path, *arguments = task
+    return solve_source(_worker_index(path), *arguments)
+
+
+class BatchSolver:
+    """
+    Solves many start/end pairs at once.
+
+    Pairs are deduplicated, pairs with no route within max_depth are dropped
+    after one batched hop-distance pass (see frontier.hop_distances), and the
+    rest are grouped by start compound. The groups are spread over one
+    long-lived process pool. Workers are spawned rather than forked, since
+    forking a process with live driver and executor threads can deadlock.
+    Each snapshot is pickled to a file once, and a worker loads it the first
+    time one of its tasks names that file, so writes never restart the pool.
+    """
+
+    def __init__(self, workers: Optional[int] = None, min_parallel_groups: int = 4):
+        self._workers = workers or os.cpu_count() or 1
+        self._min_parallel_groups = min_parallel_groups
+        self._pool = None
+        self._directory = None
+        self._snapshot_index = None
+        self._snapshot_path = None
+        # Solves using each snapshot file; replaced files go once unused
+        self._in_use: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                logger.info(f"Starting batch path pool with {self._workers} workers")
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self._workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._pool
+
+    def _acquire_snapshot(self, index: ReactionIndex) -> str:
+        """The file holding index for the workers, written when index is new"""
+        with self._lock:
+            if self._snapshot_index is not index:
+                if self._directory is None:
+                    self._directory = tempfile.mkdtemp(prefix="chempath-batch-")
+                descriptor, path = tempfile.mkstemp(suffix=".pickle", dir=self._directory)
+                with os.fdopen(descriptor, "wb") as f:
+                    pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+                previous = self._snapshot_path
+                self._snapshot_index, self._snapshot_path = index, path
+                self._in_use[path] = 0
+                if previous is not None and not self._in_use[previous]:
+                    self._remove_snapshot(previous)
+            self._in_use[self._snapshot_path] += 1
+            return self._snapshot_path
+
+    def _release_snapshot(self, path: str) -> None:
+        with self._lock:
+            self._in_use[path] -= 1
+            if path != self._snapshot_path and not self._in_use[path]:
+                self._remove_snapshot(path)
+
+    def _remove_snapshot(self, path: str) -> None:
+        del self._in_use[path]
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.warning(f"Could not remove batch snapshot {path}: {str(e)}")
+
+    def solve(self,
+              index: ReactionIndex,
+              pairs: List[Tuple[str, str]],
+              max_depth: int = 5,
+              paths_per_pair: Optional[int] = None,
+              constraints: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        # One batched frontier expansion drops pairs with no route in reach
+        known = [(start, end) for start, end in dict.fromkeys(pairs)
+                 if start in index.ids and end in index.ids]
+        starts = list(dict.fromkeys(start for start, _ in known))
+        ends = list(dict.fromkeys(end for _, end in known))
+        rows = hop_distances(index, [index.ids[start] for start in starts], max_depth,
+                             [index.ids[end] for end in ends], index.compile_constraints(constraints))
+        row_of = {start: i for i, start in enumerate(starts)}
+        column_of = {end: i for i, end in enumerate(ends)}
+
+        groups: Dict[str, List[str]] = {}
+        for start, end in known:
+            if rows[row_of[start]][column_of[end]] != NO_ROUTE:
+                groups.setdefault(start, []).append(end)
+
+        tasks = [
+            (source, targets, max_depth, paths_per_pair, constraints)
+            for source, targets in groups.items()
+        ]
+        if self._workers > 1 and len(tasks) >= self._min_parallel_groups:
+            pool = self._get_pool()
+            path = self._acquire_snapshot(index)
+            try:
+                chunksize = max(1, len(tasks) // (self._workers * 4))
+                solved = list(pool.map(_solve_in_worker, [(path,) + task for task in tasks],
+                                       chunksize=chunksize))
+            finally:
+                self._release_snapshot(path)
+        else:
+            solved = [solve_source(index, *task) for task in tasks]
+
+        by_pair = {}
+        for (source, _, _, _, _), results in zip(tasks, solved):
+            for target, paths in results.items():
+                by_pair[(source, target)] = paths
+        return [
+            {"start": start, "end": end, "paths": by_pair.get((start, end), [])}
+            for start, end in pairs
+        ]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+                self._pool = None
+            for path in list(self._in_use):
+                self._remove_snapshot(path)
+            if self._directory is not None:
+                try:
+                    os.rmdir(self._directory)
+                except OSError:
+                    pass
+                self._directory = None
+            self._snapshot_index = None
+            self._snapshot_path = None
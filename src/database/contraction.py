@@ -0,0 +1,405 @@
+import os
+import sys
+import heapq
+import pickle
+import logging
+import argparse
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Dict, List, Tuple, Callable
+from dotenv import load_dotenv
+
+from src.database.graph_algorithms import weakly_connected_components
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever the on-disk layout changes; older files are ignored
+FORMAT_VERSION = 1
+
+# Witness searches give up after settling this many compounds. Giving up
+# only adds a shortcut that was not strictly needed, never a wrong one.
+WITNESS_SETTLE_LIMIT = 64
+
+INFINITY = float("inf")
+
+# (node, node, weight, middle) where middle is the contracted compound a
+# shortcut bypasses, or -1 for a real reaction
+Edge = Tuple[int, int, int, int]
+
+
+def hop_weight(alternatives: List) -> int:
+    """Every reaction step costs 1, so shortest means fewest steps"""
+    return 1
+
+
+def _contract(task: Tuple[List[int], List[Tuple[int, int, int]]]) -> Tuple[List[int], List[Edge]]:
+    """
+    Contract one weakly connected component.
+
+    Compounds are removed one at a time, least important first (edge
+    difference plus contracted neighbours, updated lazily). Removing v adds
+    a shortcut u -> w for each u -> v -> w that is not matched by a witness
+    path avoiding v. Returns the component's compounds in contraction order
+    and every real and shortcut edge, in the ids of the task.
+    """
+    nodes, edges = task
+    local = {node: i for i, node in enumerate(nodes)}
+    count = len(nodes)
+    out: List[Dict[int, Tuple[int, int]]] = [{} for _ in range(count)]
+    inc: List[Dict[int, Tuple[int, int]]] = [{} for _ in range(count)]
+
+    def link(u: int, w: int, weight: int, middle: int) -> None:
+        if u == w:
+            return
+        current = out[u].get(w)
+        if current is None or weight < current[0]:
+            out[u][w] = inc[w][u] = (weight, middle)
+
+    for source, target, weight in edges:
+        link(local[source], local[target], weight, -1)
+
+    def witness(source: int, skip: int, limit: int, targets: Dict[int, int]) -> Dict[int, int]:
+        dist = {source: 0}
+        heap = [(0, source)]
+        remaining = len(targets)
+        settled = 0
+        while heap:
+            d, node = heapq.heappop(heap)
+            if d > dist[node]:
+                continue
+            if d > limit:
+                break
+            if node in targets:
+                remaining -= 1
+                if not remaining:
+                    break
+            settled += 1
+            if settled > WITNESS_SETTLE_LIMIT:
+                break
+            for neighbour, (weight, _) in out[node].items():
+                if neighbour == skip:
+                    continue
+                nd = d + weight
+                if nd < dist.get(neighbour, INFINITY):
+                    dist[neighbour] = nd
+                    heapq.heappush(heap, (nd, neighbour))
+        return dist
+
+    def shortcuts(v: int) -> List[Tuple[int, int, int]]:
+        needed = []
+        for u, (w_in, _) in inc[v].items():
+            targets = {w: w_in + w_out for w, (w_out, _) in out[v].items() if w != u}
+            if not targets:
+                continue
+            dist = witness(u, v, max(targets.values()), targets)
+            needed.extend((u, w, cost) for w, cost in targets.items()
+                          if dist.get(w, INFINITY) > cost)
+        return needed
+
+    removed_neighbours = [0] * count
+
+    def priority(v: int, needed: List) -> int:
+        return len(needed) - len(inc[v]) - len(out[v]) + removed_neighbours[v]
+
+    heap = [(priority(v, shortcuts(v)), v) for v in range(count)]
+    heapq.heapify(heap)
+    order: List[int] = []
+    result: List[Edge] = []
+    while heap:
+        _, v = heapq.heappop(heap)
+        needed = shortcuts(v)
+        current = priority(v, needed)
+        if heap and current > heap[0][0]:
+            heapq.heappush(heap, (current, v))
+            continue
+        order.append(nodes[v])
+        # v's remaining edges all lead to compounds contracted later
+        for w, (weight, middle) in out[v].items():
+            result.append((nodes[v], nodes[w], weight, nodes[middle] if middle >= 0 else -1))
+            del inc[w][v]
+            removed_neighbours[w] += 1
+        for u, (weight, middle) in inc[v].items():
+            result.append((nodes[u], nodes[v], weight, nodes[middle] if middle >= 0 else -1))
+            del out[u][v]
+            removed_neighbours[u] += 1
+        out[v].clear()
+        inc[v].clear()
+        for u, w, cost in needed:
+            link(u, w, cost, v)
+    return order, result
+
+
+class ContractionHierarchy:
+    """
+    Shortcut index for sub-millisecond shortest routes on large graphs.
+
+    Built once from a ReactionIndex snapshot (see build), written to disk
+    and loaded by the API workers. Every compound gets a rank; a query runs
+    a Dijkstra search upwards in rank from the start and another backwards
+    from the end, and each only ever sees the few shortcut edges to more
+    important compounds. Shortcuts on the best route are then unpacked back
+    into the reactions they stand for.
+
+    The index describes one graph generation and is keyed by formula, so
+    it can answer queries for any ReactionIndex of that same generation.
+    """
+
+    def __init__(self,
+                 formulas: List[str],
+                 rank: array,
+                 edges: List[Edge],
+                 generation: int = 0,
+                 hop_weights: bool = True):
+        self.formulas = formulas
+        self.ids: Dict[str, int] = {formula: i for i, formula in enumerate(formulas)}
+        self.rank = rank
+        self.generation = generation
+        self.hop_weights = hop_weights
+
+        # Upward edges: up[u] holds u -> w with rank[w] > rank[u]; down[w]
+        # holds u -> w with rank[u] > rank[w], searched backwards from w
+        up: List[List[Tuple[int, int, int]]] = [[] for _ in formulas]
+        down: List[List[Tuple[int, int, int]]] = [[] for _ in formulas]
+        for u, w, weight, middle in edges:
+            if rank[u] < rank[w]:
+                up[u].append((w, weight, middle))
+            else:
+                down[w].append((u, weight, middle))
+        self.up_offsets, self.up_targets, self.up_weights, self.up_middles = self._csr(up)
+        self.down_offsets, self.down_sources, self.down_weights, self.down_middles = self._csr(down)
+
+    @staticmethod
+    def _csr(lists: List[List[Tuple[int, int, int]]]) -> Tuple[array, array, array, array]:
+        offsets = array("i", [0])
+        nodes, weights, middles = array("i"), array("i"), array("i")
+        for entries in lists:
+            for node, weight, middle in sorted(entries):
+                nodes.append(node)
+                weights.append(weight)
+                middles.append(middle)
+            offsets.append(len(nodes))
+        return offsets, nodes, weights, middles
+
+    @property
+    def shortcut_count(self) -> int:
+        return sum(1 for m in self.up_middles if m >= 0) + sum(1 for m in self.down_middles if m >= 0)
+
+    @classmethod
+    def build(cls,
+              index,
+              weight: Optional[Callable[[List], int]] = None,
+              workers: Optional[int] = None) -> "ContractionHierarchy":
+        """
+        Contract a ReactionIndex. ``weight`` maps an edge's alternative
+        reactions to a positive integer cost (default: one per step). Weakly
+        connected components share no routes, so they are contracted
+        independently, in parallel worker processes when there are several.
+        """
+        weight = weight or hop_weight
+        component, count = weakly_connected_components(
+            index.node_count, index.edge_sources, index.edge_targets)
+        members: List[List[int]] = [[] for _ in range(count)]
+        for node_id in range(index.node_count):
+            members[component[node_id]].append(node_id)
+        edges: List[List[Tuple[int, int, int]]] = [[] for _ in range(count)]
+        for edge_id in range(index.edge_count):
+            source = index.edge_sources[edge_id]
+            cost = int(weight(index.edge_alternatives(edge_id)))
+            if cost < 1:
+                raise ValueError(f"Reaction weights must be positive, got {cost}")
+            edges[component[source]].append((source, index.edge_targets[edge_id], cost))
+
+        # Isolated compounds need no contraction; big components go first
+        tasks = sorted(((members[c], edges[c]) for c in range(count) if edges[c]),
+                       key=lambda task: -len(task[1]))
+        workers = workers or os.cpu_count() or 1
+        if workers > 1 and len(tasks) > 1:
+            logger.info(f"Contracting {len(tasks)} components with {workers} workers")
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_contract, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+        else:
+            results = [_contract(task) for task in tasks]
+
+        rank = array("i", [0] * index.node_count)
+        next_rank = 0
+        all_edges: List[Edge] = []
+        for order, component_edges in results:
+            for node_id in order:
+                rank[node_id] = next_rank
+                next_rank += 1
+            all_edges.extend(component_edges)
+        for node_id in range(index.node_count):
+            if not edges[component[node_id]]:
+                rank[node_id] = next_rank
+                next_rank += 1
+        return cls(list(index.formulas), rank, all_edges, index.generation,
+                   hop_weights=weight is hop_weight)
+
+    def _edge(self, u: int, w: int) -> Tuple[int, int]:
+        """(weight, middle) of the hierarchy edge u -> w"""
+        if self.rank[u] < self.rank[w]:
+            for i in range(self.up_offsets[u], self.up_offsets[u + 1]):
+                if self.up_targets[i] == w:
+                    return self.up_weights[i], self.up_middles[i]
+        else:
+            for i in range(self.down_offsets[w], self.down_offsets[w + 1]):
+                if self.down_sources[i] == u:
+                    return self.down_weights[i], self.down_middles[i]
+        raise KeyError(f"No edge {self.formulas[u]} -> {self.formulas[w]} in the hierarchy")
+
+    def _unpack(self, u: int, w: int) -> List[int]:
+        """The compounds after u on the real route behind edge u -> w"""
+        compounds = []
+        stack = [(u, w)]
+        while stack:
+            a, b = stack.pop()
+            middle = self._edge(a, b)[1]
+            if middle < 0:
+                compounds.append(b)
+            else:
+                stack.append((middle, b))
+                stack.append((a, middle))
+        return compounds
+
+    def shortest(self, start: str, end: str,
+                 max_cost: Optional[int] = None) -> Optional[Tuple[int, List[str]]]:
+        """
+        The cheapest route from start to end as (cost, formulas along the
+        route), or None when there is none (within max_cost, if given).
+        """
+        source, target = self.ids.get(start), self.ids.get(end)
+        if source is None or target is None:
+            return None
+        if source == target:
+            return 0, [start]
+        limit = INFINITY if max_cost is None else max_cost
+
+        dist = ({source: 0}, {target: 0})
+        parent: Tuple[Dict[int, int], Dict[int, int]] = ({}, {})
+        heaps = ([(0, source)], [(0, target)])
+        best, meet = INFINITY, None
+        while heaps[0] or heaps[1]:
+            if not heaps[1] or (heaps[0] and heaps[0][0][0] <= heaps[1][0][0]):
+                side = 0
+            else:
+                side = 1
+            d, node = heapq.heappop(heaps[side])
+            if d >= best or d > limit:
+                # Everything left in this direction is at least as expensive
+                heaps[side].clear()
+                continue
+            if d > dist[side][node]:
+                continue
+            other = dist[1 - side].get(node)
+            if other is not None and d + other < best:
+                best, meet = d + other, node
+            if side == 0:
+                offsets, nodes, weights = self.up_offsets, self.up_targets, self.up_weights
+            else:
+                offsets, nodes, weights = self.down_offsets, self.down_sources, self.down_weights
+            for i in range(offsets[node], offsets[node + 1]):
+                neighbour, nd = nodes[i], d + weights[i]
+                if nd < dist[side].get(neighbour, INFINITY):
+                    dist[side][neighbour] = nd
+                    parent[side][neighbour] = node
+                    heapq.heappush(heaps[side], (nd, neighbour))
+
+        if meet is None or best > limit:
+            return None
+        upward = [meet]
+        while upward[-1] != source:
+            upward.append(parent[0][upward[-1]])
+        upward.reverse()
+        downward = [meet]
+        while downward[-1] != target:
+            downward.append(parent[1][downward[-1]])
+        hops = upward + downward[1:]
+        compounds = [source]
+        for u, w in zip(hops, hops[1:]):
+            compounds.extend(self._unpack(u, w))
+        return best, [self.formulas[node] for node in compounds]
+
+    def route(self, index, source: int, target: int, max_depth: int) -> Optional[Tuple[int, ...]]:
+        """
+        A shortest route between two compounds of a ReactionIndex of the same
+        generation, as the edge ids find_routes returns, or None.
+        """
+        if not self.hop_weights:
+            raise ValueError("Only hop weighted hierarchies answer route queries")
+        found = self.shortest(index.formulas[source], index.formulas[target], max_depth)
+        if found is None or found[0] == 0:
+            return None
+        route = []
+        for a, b in zip(found[1], found[1][1:]):
+            u, w = index.ids[a], index.ids[b]
+            for edge_id in range(index.offsets[u], index.offsets[u + 1]):
+                if index.edge_targets[edge_id] == w:
+                    route.append(edge_id)
+                    break
+            else:
+                raise KeyError(f"Reaction {a} -> {b} is not in the snapshot")
+        return tuple(route)
+
+    def save(self, path: str) -> None:
+        """Write the hierarchy to path atomically (a reader never sees half a file)"""
+        state = {
+            "version": FORMAT_VERSION,
+            "generation": self.generation,
+            "hop_weights": self.hop_weights,
+            "formulas": self.formulas,
+            "rank": self.rank,
+            "edges": [
+                (u, self.up_targets[i], self.up_weights[i], self.up_middles[i])
+                for u in range(len(self.formulas))
+                for i in range(self.up_offsets[u], self.up_offsets[u + 1])
+            ] + [
+                (self.down_sources[i], w, self.down_weights[i], self.down_middles[i])
+                for w in range(len(self.formulas))
+                for i in range(self.down_offsets[w], self.down_offsets[w + 1])
+            ]
+        }
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as handle:
+            pickle.dump(state, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path: str) -> "ContractionHierarchy":
+        """Read a hierarchy written by save. Only load files this service wrote itself."""
+        with open(path, "rb") as handle:
+            state = pickle.load(handle)
+        if state.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported hierarchy format {state.get('version')} in {path}")
+        return cls(state["formulas"], state["rank"], state["edges"],
+                   state["generation"], state["hop_weights"])
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Build the contraction hierarchy for the current graph and save it")
+    parser.add_argument("output", help="File to write (set CHEMPATH_HIERARCHY_PATH to it for the API)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes for contraction (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    from src.database.graph_manager import ChemicalGraph
+
+    load_dotenv()
+    graph = ChemicalGraph(
+        os.getenv("NEO4J_URI"),
+        os.getenv("NEO4J_USER"),
+        os.getenv("NEO4J_PASSWORD"),
+        landmarks=0
+    )
+    try:
+        index = graph.get_index()
+    finally:
+        graph.close()
+    hierarchy = ContractionHierarchy.build(index, workers=args.workers)
+    hierarchy.save(args.output)
+    print(f"Saved {len(hierarchy.formulas)} compounds and {hierarchy.shortcut_count} shortcuts "
+          f"for generation {hierarchy.generation} to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
 import os
 from dotenv import load_dotenv
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Iterator
 from src.database.graph_manager import ChemicalGraph
+from src.database.file_ingestion import (
+    BulkWriter, IngestionStats, Record, dedupe, normalize_formula
+)
 
 
 # Load environment variables
@@ -310,6 +313,29 @@ ESTER = {
             "mechanism": "fischer esterification"
         }
     },
+    ],
+    # Reactions needing more than one reactant are stored as Reaction nodes
+    "multi_reactions": [
+        {
+            "reactants": ["CH3COOH", "CH3OH"],
+            "products": ["CH3COOCH3"],
+            "conditions": {
+                "reagent": "H2SO4",
+                "temperature": "heat",
+                "type": "condensation",
+                "mechanism": "fischer esterification"
+            }
+        },
+        {
+            "reactants": ["CH3COOH", "CH3CH2OH"],
+            "products": ["CH3COOCH2CH3"],
+            "conditions": {
+                "reagent": "H2SO4",
+                "temperature": "heat",
+                "type": "condensation",
+                "mechanism": "fischer esterification"
+            }
+        }
     ]
 }
 
@@ -351,13 +377,39 @@ REACTION_SETS = [
 ]
 
 
-def ingest_data(reaction_sets: List[Dict[str, Any]], clear_existing: bool = False) -> None:
+def reaction_set_records(reaction_sets: List[Dict[str, Any]],
+                         curriculum: bool = True) -> Iterator[Record]:
+    """
+    Compound and reaction records of the reaction sets, all compounds first,
+    with formulas normalized (so HCHO and CH2O are the same compound).
+    """
+    for reaction_set in reaction_sets:
+        for compound in reaction_set["compounds"]:
+            formula = normalize_formula(compound["formula"])
+            yield ("compound", formula, {**compound, "formula": formula})
+    for reaction_set in reaction_sets:
+        for reaction in reaction_set["reactions"]:
+            yield ("reaction",
+                   normalize_formula(reaction["reactant"]),
+                   normalize_formula(reaction["product"]),
+                   {"curriculum": curriculum, **reaction["conditions"]})
+
+
+def ingest_data(reaction_sets: List[Dict[str, Any]],
+                clear_existing: bool = False,
+                curriculum: bool = True,
+                writers: int = 4,
+                create_missing: bool = False) -> None:
     """
     Ingest chemical data into Neo4j database.
 
     Args:
         reaction_sets: List of dictionaries containing compounds and reactions
         clear_existing: If True, clears all existing data before ingestion
+        curriculum: Default `curriculum` flag for reactions that don't set one
+        writers: Number of concurrent writer sessions
+        create_missing: Create placeholder compounds for reactions that refer
+            to compounds not defined in any set, instead of skipping them
     """
     # Initialize graph connection
     graph = ChemicalGraph(
@@ -373,23 +425,26 @@ def ingest_data(reaction_sets: List[Dict[str, Any]], clear_existing: bool = Fals
                 session.run("MATCH (n) DETACH DELETE n")
                 print("Cleared existing data")
 
-        # Process each reaction set
+        # Add compounds, then reactions, on concurrent writer sessions
+        print("\nAdding compounds and reactions...")
+        stats = IngestionStats()
+        records = dedupe(reaction_set_records(reaction_sets, curriculum), stats)
+        BulkWriter(graph, writers, create_missing=create_missing).write(records, stats)
+        print(f"Added {stats.compounds} compounds and {stats.reactions} reactions "
+              f"({stats.duplicates} duplicates, {stats.unchanged} already ingested, "
+              f"{stats.missing} reactions skipped for missing compounds)")
+        for reactant, product in stats.missing_examples:
+            print(f"Skipped reaction with a missing compound: {reactant} -> {product}")
+
         for reaction_set in reaction_sets:
-            # Add compounds
-            print("\nAdding compounds...")
-            for compound in reaction_set["compounds"]:
-                result = graph.add_compound(compound["formula"], compound)
-                print(f"Added compound: {compound['formula']}")
-
-            # Add reactions
-            print("\nAdding reactions...")
-            for reaction in reaction_set["reactions"]:
-                result = graph.add_reaction(
-                    reaction["reactant"],
-                    reaction["product"],
-                    reaction["conditions"]
+            for reaction in reaction_set.get("multi_reactions", []):
+                result = graph.add_multi_reaction(
+                    reaction["reactants"],
+                    reaction["products"],
+                    {"curriculum": curriculum, **reaction["conditions"]}
                 )
-                print(f"Added reaction: {reaction['reactant']} -> {reaction['product']} "
+                print(f"Added reaction: {' + '.join(reaction['reactants'])} -> "
+                      f"{' + '.join(reaction['products'])} "
                       f"using {reaction['conditions']['reagent']}")
 
     except Exception as e:
@@ -411,13 +466,16 @@ def verify_ingestion():
         with graph._driver.session() as session:
             # Count nodes and relationships
             node_count = session.run(
-                "MATCH (n) RETURN count(n) as count").single()["count"]
+                "MATCH (n:Compound) RETURN count(n) as count").single()["count"]
             rel_count = session.run(
-                "MATCH ()-[r]->() RETURN count(r) as count").single()["count"]
+                "MATCH ()-[r:REACTS_TO]->() RETURN count(r) as count").single()["count"]
+            multi_count = session.run(
+                "MATCH (rx:Reaction) RETURN count(rx) as count").single()["count"]
 
             print(f"\nVerification Results:")
             print(f"Total compounds: {node_count}")
             print(f"Total reactions: {rel_count}")
+            print(f"Total multi-reactant reactions: {multi_count}")
 
     finally:
         graph.close()
@@ -0,0 +1,43 @@
+import time
+import threading
+from typing import Optional
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when work runs past its time budget or is cancelled"""
+
+
+class Deadline:
+    """
+    A time budget shared by everything working on one request: Neo4j
+    transactions take their timeout from it and in-process search loops poll
+    it cooperatively. cancel() ends it early, e.g. when the client has gone.
+    """
+
+    def __init__(self, seconds: Optional[float] = None):
+        self._expires = None if seconds is None else time.monotonic() + seconds
+        self._cancelled = threading.Event()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left (never negative), or None for no time limit"""
+        if self._cancelled.is_set():
+            return 0.0
+        if self._expires is None:
+            return None
+        return max(0.0, self._expires - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self._cancelled.is_set() or (
+            self._expires is not None and time.monotonic() >= self._expires)
+
+    def check(self) -> None:
+        if self.expired:
+            raise DeadlineExceeded("cancelled" if self.cancelled else "time budget exceeded")
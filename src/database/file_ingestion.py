@@ -0,0 +1,474 @@
+import os
+import csv
+import sys
+import gzip
+import json
+import time
+import zlib
+import random
+import hashlib
+import argparse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from multiprocessing import Pool
+from typing import Optional, Dict, Any, List, Iterable, Iterator, Tuple
+from dotenv import load_dotenv
+from src.database.graph_manager import ChemicalGraph
+
+# Load environment variables
+load_dotenv()
+
+REACTION_FIELDS = ("reactant", "product", "conditions")
+NUMERIC_FIELDS = ("molecular_weight", "temperature", "pressure")
+
+# Alternative spellings of the same compound, mapped to the formula the graph uses
+FORMULA_ALIASES = {
+    "HCHO": "CH2O",
+}
+
+# Recent record digests kept to drop repeats within a run (about 10 MB);
+# older repeats are caught by the IngestHash check in the graph
+DEDUPE_WINDOW = 100_000
+
+_SUBSCRIPTS = str.maketrans("₀₁₂₃₄₅₆₇₈₉⁺⁻", "0123456789+-")
+
+# A parsed record is ("compound", formula, properties),
+# ("reaction", reactant, product, conditions) or ("invalid", reason)
+Record = Tuple
+
+
+def open_text(path: str):
+    """Open a text file for streaming, transparently decompressing .gz files"""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def detect_format(path: str) -> str:
+    name = path[:-3] if path.endswith(".gz") else path
+    extension = os.path.splitext(name)[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".jsonl", ".ndjson", ".json"):
+        return "jsonl"
+    raise ValueError(f"Cannot tell the format of {path}; use --format csv or jsonl")
+
+
+def read_raw(path: str, fmt: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Yield one raw dict per CSV row or JSON line, reading the file lazily"""
+    fmt = fmt or detect_format(path)
+    with open_text(path) as handle:
+        if fmt == "csv":
+            for row in csv.DictReader(handle):
+                yield {k.strip(): v for k, v in row.items() if k and v not in (None, "")}
+        else:
+            for number, line in enumerate(handle, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    yield {"_error": f"line {number}: {e}"}
+
+
+def normalize_formula(formula: Any) -> str:
+    """Canonical spelling of a formula: no whitespace, ASCII digits and charges"""
+    formula = "".join(str(formula).translate(_SUBSCRIPTS).split())
+    return FORMULA_ALIASES.get(formula, formula)
+
+
+def _coerce(key: str, value: Any) -> Any:
+    if not isinstance(value, str):
+        return value
+    value = value.strip()
+    if key == "curriculum":
+        return value.lower() in ("1", "true", "yes", "y")
+    if key in NUMERIC_FIELDS:
+        try:
+            return float(value)
+        except ValueError:
+            return value
+    return value
+
+
+def parse_record(raw: Dict[str, Any]) -> Record:
+    """Turn a raw row into a normalized, validated compound or reaction record"""
+    if "_error" in raw:
+        return ("invalid", raw["_error"])
+    if raw.get("reactant") or raw.get("product"):
+        if not raw.get("reactant") or not raw.get("product"):
+            return ("invalid", "reaction needs both reactant and product")
+        conditions = raw.get("conditions")
+        if not isinstance(conditions, dict):
+            # Flat rows (CSV) carry the conditions as extra columns
+            conditions = {k: v for k, v in raw.items() if k not in REACTION_FIELDS}
+        conditions = {k: _coerce(k, v) for k, v in conditions.items() if v is not None}
+        reactant = normalize_formula(raw["reactant"])
+        product = normalize_formula(raw["product"])
+        if not reactant or not product:
+            return ("invalid", "empty reactant or product")
+        if reactant == product:
+            return ("invalid", f"{reactant} reacts to itself")
+        return ("reaction", reactant, product, conditions)
+    if raw.get("formula"):
+        formula = normalize_formula(raw["formula"])
+        if not formula:
+            return ("invalid", "empty formula")
+        properties = {k: _coerce(k, v) for k, v in raw.items() if v is not None}
+        properties["formula"] = formula
+        return ("compound", formula, properties)
+    return ("invalid", "row is neither a compound nor a reaction")
+
+
+def _parse_chunk(chunk: List[Dict[str, Any]]) -> List[Record]:
+    return [parse_record(raw) for raw in chunk]
+
+
+def parse_records(raws: Iterable[Dict[str, Any]],
+                  workers: int = 1,
+                  chunk_size: int = 2000) -> Iterator[Record]:
+    """
+    Parse and normalize raw rows, optionally on a process pool. Rows are sent
+    to the pool a bounded number of chunks at a time, so memory stays constant
+    however large the input is.
+    """
+    if workers <= 1:
+        for raw in raws:
+            yield parse_record(raw)
+        return
+
+    raws = iter(raws)
+    with Pool(workers) as pool:
+        while True:
+            chunks = [chunk for chunk in (list(islice(raws, chunk_size)) for _ in range(workers * 2))
+                      if chunk]
+            if not chunks:
+                break
+            for parsed in pool.imap(_parse_chunk, chunks):
+                yield from parsed
+
+
+def record_key(record: Record) -> bytes:
+    """Short digest identifying a record's full content"""
+    payload = json.dumps(record, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).digest()
+
+
+def content_hash(record: Record) -> str:
+    """Content hash recorded in the graph for each ingested record"""
+    return record_key(record).hex()
+
+
+def dedupe(records: Iterable[Record],
+           stats: "IngestionStats",
+           window: int = DEDUPE_WINDOW) -> Iterator[Record]:
+    """
+    Drop records repeating one of the last `window` distinct records, in
+    constant memory (16-byte digests, least recently seen evicted first)
+    """
+    seen: "OrderedDict[bytes, None]" = OrderedDict()
+    for record in records:
+        if record[0] == "invalid":
+            stats.invalid += 1
+            if stats.invalid <= 10:
+                print(f"Skipping invalid record: {record[1]}", file=sys.stderr)
+            continue
+        key = record_key(record)
+        if key in seen:
+            seen.move_to_end(key)
+            stats.duplicates += 1
+            continue
+        seen[key] = None
+        if len(seen) > window:
+            seen.popitem(last=False)
+        yield record
+
+
+def coalesce(entries: List[Tuple[Record, str]]) -> List[Tuple[Record, List[str]]]:
+    """
+    Merge (record, hash) entries that write the same compound, or the same
+    reactant -> product conversion with the same reagent, into one record
+    carrying all of their hashes. Later properties win.
+    """
+    merged: Dict[Tuple, Tuple[Record, List[str]]] = {}
+    for record, hash in entries:
+        if record[0] == "compound":
+            key = record[:2]
+        else:
+            key = (record[0], record[1], record[2], record[3].get("reagent") or "")
+        if key in merged:
+            previous, hashes = merged[key]
+            record = previous[:-1] + ({**previous[-1], **record[-1]},)
+            hashes.append(hash)
+            merged[key] = (record, hashes)
+        else:
+            merged[key] = (record, [hash])
+    return list(merged.values())
+
+
+def batched(records: Iterable[Record], size: int) -> Iterator[List[Record]]:
+    records = iter(records)
+    while True:
+        batch = list(islice(records, size))
+        if not batch:
+            return
+        yield batch
+
+
+class IngestionStats:
+    """Counters for one ingestion run, with periodic progress reports"""
+
+    def __init__(self, interval: float = 5.0):
+        self.read = 0
+        self.invalid = 0
+        self.duplicates = 0
+        self.unchanged = 0
+        self.compounds = 0
+        self.reactions = 0
+        self.missing = 0
+        self.missing_examples: List[Tuple[str, str]] = []
+        self.started = time.monotonic()
+        self.interval = interval
+        self._last_report = self.started
+
+    def counted(self, raws: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        for raw in raws:
+            self.read += 1
+            yield raw
+
+    def add_missing(self, pairs: List[Tuple[str, str]], keep: int = 20) -> None:
+        """Count reactions skipped for missing compounds, keeping a few examples"""
+        self.missing += len(pairs)
+        self.missing_examples.extend(pairs[:max(0, keep - len(self.missing_examples))])
+
+    def report(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last_report < self.interval:
+            return
+        self._last_report = now
+        elapsed = max(now - self.started, 1e-9)
+        print(f"{self.read} records read ({self.read / elapsed:.0f}/s), "
+              f"{self.compounds} compounds and {self.reactions} reactions written, "
+              f"{self.duplicates} duplicates, {self.unchanged} already ingested, "
+              f"{self.invalid} invalid, "
+              f"{self.missing} reactions with missing compounds", file=sys.stderr)
+        if force and self.missing_examples:
+            print("Reactions skipped for missing compounds (e.g.): " + ", ".join(
+                f"{reactant} -> {product}" for reactant, product in self.missing_examples),
+                file=sys.stderr)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "read": self.read,
+            "invalid": self.invalid,
+            "duplicates": self.duplicates,
+            "unchanged": self.unchanged,
+            "compounds": self.compounds,
+            "reactions": self.reactions,
+            "missing": self.missing,
+            "missing_examples": [list(pair) for pair in self.missing_examples],
+            "seconds": round(time.monotonic() - self.started, 3)
+        }
+
+
+def is_transient(error: Exception) -> bool:
+    """Whether a Neo4j error (e.g. a deadlock) is worth retrying"""
+    is_retryable = getattr(error, "is_retryable", None)
+    if callable(is_retryable) and is_retryable():
+        return True
+    return "TransientError" in (getattr(error, "code", None) or "")
+
+
+def shard_of(formula: str, shards: int) -> int:
+    """Stable shard for a formula, so its writes always go to the same writer"""
+    return zlib.crc32(formula.encode("utf-8")) % shards
+
+
+class BulkWriter:
+    """
+    Writes a record stream with a pool of writer threads, each using its own
+    session from the driver's connection pool.
+
+    Records are taken a window at a time. All compounds of a window are
+    written before any of its reactions. Compounds are sharded by formula,
+    so no two writers ever write the same compound. Reactions are sharded by
+    reactant, but writing one also locks its product, which another writer
+    may be linking at the same time; the deadlocks this can cause, like any
+    transient error, are retried with backoff.
+
+    Records writing the same compound or reaction variant within a window are
+    coalesced into one. With skip_known, records whose content hash the graph
+    already holds are dropped first, so re-ingesting an unchanged corpus only
+    reads. Reactions whose compounds do not exist are reported in the stats,
+    or, with create_missing, their compounds are created as placeholders.
+    """
+
+    def __init__(self,
+                 graph: Optional[ChemicalGraph],
+                 writers: int = 4,
+                 batch_size: int = 1000,
+                 max_retries: int = 5,
+                 retry_delay: float = 0.1,
+                 skip_known: bool = True,
+                 create_missing: bool = False):
+        self.graph = graph
+        self.skip_known = skip_known
+        self.create_missing = create_missing
+        self.writers = max(1, writers)
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+    def _add_batch(self, compounds, reactions, **kwargs) -> List[bool]:
+        if self.graph is None:
+            return [True] * len(reactions)
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.graph.add_batch(compounds, reactions, bump_generation=False, **kwargs)
+            except Exception as e:
+                if attempt == self.max_retries or not is_transient(e):
+                    raise
+                delay = self.retry_delay * 2 ** attempt * (1 + random.random())
+                print(f"Transient error, retrying batch in {delay:.2f}s: {e}", file=sys.stderr)
+                time.sleep(delay)
+
+    def _write_shard(self,
+                     kind: str,
+                     entries: List[Tuple[Record, List[str]]]) -> Tuple[int, List[Tuple[str, str]]]:
+        """
+        Write one shard's (record, hashes) entries in batches. Returns how many
+        were written and the reactant/product pairs of reactions that were not.
+        """
+        written = 0
+        missing = []
+        for start in range(0, len(entries), self.batch_size):
+            chunk = entries[start:start + self.batch_size]
+            if kind == "compound":
+                compounds = [entry for entry in chunk if entry[0][0] == "compound"]
+                self._add_batch(
+                    [(record[1], record[2]) for record, _ in compounds], [],
+                    compound_hashes=[hashes for _, hashes in compounds],
+                    placeholders=[record[1] for record, _ in chunk if record[0] == "placeholder"]
+                )
+                written += len(compounds)
+            else:
+                results = self._add_batch(
+                    [], [record[1:] for record, _ in chunk],
+                    reaction_hashes=[hashes for _, hashes in chunk]
+                )
+                written += sum(results)
+                missing.extend((record[1], record[2]) for (record, _), ok in zip(chunk, results) if not ok)
+        return written, missing
+
+    def _write_sharded(self,
+                       pool: ThreadPoolExecutor,
+                       kind: str,
+                       entries: List[Tuple[Record, List[str]]]) -> Tuple[int, List[Tuple[str, str]]]:
+        shards: List[List[Tuple[Record, List[str]]]] = [[] for _ in range(self.writers)]
+        for entry in entries:
+            shards[shard_of(entry[0][1], self.writers)].append(entry)
+        futures = [pool.submit(self._write_shard, kind, shard) for shard in shards if shard]
+        written, missing = 0, []
+        for future in futures:
+            shard_written, shard_missing = future.result()
+            written += shard_written
+            missing.extend(shard_missing)
+        return written, missing
+
+    def write(self, records: Iterable[Record], stats: IngestionStats) -> None:
+        window = self.writers * self.batch_size
+        with ThreadPoolExecutor(max_workers=self.writers, thread_name_prefix="writer") as pool:
+            for batch in batched(records, window):
+                entries = [(record, content_hash(record)) for record in batch]
+                if self.graph is not None and self.skip_known:
+                    known = self.graph.known_hashes([hash for _, hash in entries])
+                    if known:
+                        entries = [entry for entry in entries if entry[1] not in known]
+                        stats.unchanged += len(batch) - len(entries)
+                merged = coalesce(entries)
+                stats.duplicates += len(entries) - len(merged)
+                entries = merged
+                compounds = [entry for entry in entries if entry[0][0] == "compound"]
+                reactions = [entry for entry in entries if entry[0][0] == "reaction"]
+                if self.create_missing:
+                    # Placeholders are written with the compounds, sharded by
+                    # formula, so no two writers ever create the same node
+                    defined = {record[1] for record, _ in compounds}
+                    endpoints = dict.fromkeys(
+                        formula for record, _ in reactions for formula in record[1:3])
+                    compounds += [(("placeholder", formula), []) for formula in endpoints
+                                  if formula not in defined]
+                stats.compounds += self._write_sharded(pool, "compound", compounds)[0]
+                written, missing = self._write_sharded(pool, "reaction", reactions)
+                stats.reactions += written
+                stats.add_missing(missing)
+                stats.report()
+        if self.graph is not None and (stats.compounds or stats.reactions):
+            self.graph.bump_generation()
+
+
+def ingest_files(graph: Optional[ChemicalGraph],
+                 paths: List[str],
+                 fmt: Optional[str] = None,
+                 batch_size: int = 1000,
+                 workers: int = 1,
+                 progress_interval: float = 5.0,
+                 writers: int = 4,
+                 skip_known: bool = True,
+                 create_missing: bool = False) -> IngestionStats:
+    """
+    Stream CSV/JSONL files into the graph: read -> parse/normalize ->
+    validate -> dedupe -> batch -> skip already ingested -> write. With
+    graph=None nothing is written (a dry run that still parses and counts
+    everything).
+    """
+    stats = IngestionStats(progress_interval)
+    raws = (raw for path in paths for raw in read_raw(path, fmt))
+    records = dedupe(parse_records(stats.counted(raws), workers), stats)
+    BulkWriter(graph, writers, batch_size, skip_known=skip_known,
+               create_missing=create_missing).write(records, stats)
+    stats.report(force=True)
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Stream compounds and reactions from CSV or JSONL files into Neo4j")
+    parser.add_argument("paths", nargs="+", help="CSV/JSONL files, optionally gzipped")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="Override format detection")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processes for parsing and normalizing (default: 1, inline)")
+    parser.add_argument("--writers", type=int, default=4,
+                        help="Concurrent Neo4j writer sessions (default: 4)")
+    parser.add_argument("--progress-interval", type=float, default=5.0,
+                        help="Seconds between progress reports")
+    parser.add_argument("--force", action="store_true",
+                        help="Rewrite records even if their content hash is already in the graph")
+    parser.add_argument("--create-missing", action="store_true",
+                        help="Create placeholder compounds for reactions that refer to unknown ones")
+    parser.add_argument("--dry-run", action="store_true", help="Parse and validate without writing")
+    args = parser.parse_args(argv)
+
+    graph = None
+    if not args.dry_run:
+        graph = ChemicalGraph(
+            os.getenv("NEO4J_URI"),
+            os.getenv("NEO4J_USER"),
+            os.getenv("NEO4J_PASSWORD")
+        )
+    try:
+        stats = ingest_files(graph, args.paths, args.format, args.batch_size,
+                             args.workers, args.progress_interval, args.writers,
+                             skip_known=not args.force, create_missing=args.create_missing)
+        print(json.dumps(stats.to_dict()))
+    finally:
+        if graph:
+            graph.close()
+
+
+if __name__ == "__main__":
+    # Example: python -m src.database.file_ingestion reactions.csv --workers 4
+    main()
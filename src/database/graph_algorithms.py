@@ -0,0 +1,108 @@
+from array import array
+from typing import List, Sequence, Tuple
+
+
+def strongly_connected_components(node_count: int,
+                                  offsets: Sequence[int],
+                                  targets: Sequence[int]) -> Tuple[array, int]:
+    """
+    Tarjan's algorithm over a CSR graph, without recursion.
+
+    Returns (component of each node, number of components). Components are
+    numbered in reverse topological order: every edge between two different
+    components goes from a higher number to a lower one.
+    """
+    component = array("i", [-1] * node_count)
+    index = array("i", [-1] * node_count)
+    lowlink = array("i", [0] * node_count)
+    on_stack = bytearray(node_count)
+    stack: List[int] = []
+    count = 0
+    counter = 0
+
+    for root in range(node_count):
+        if index[root] != -1:
+            continue
+        # Each frame is (node, position of the next edge to look at)
+        frames = [(root, offsets[root])]
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = 1
+        while frames:
+            node, edge = frames[-1]
+            end = offsets[node + 1]
+            while edge < end:
+                target = targets[edge]
+                edge += 1
+                if index[target] == -1:
+                    frames[-1] = (node, edge)
+                    index[target] = lowlink[target] = counter
+                    counter += 1
+                    stack.append(target)
+                    on_stack[target] = 1
+                    frames.append((target, offsets[target]))
+                    break
+                if on_stack[target] and index[target] < lowlink[node]:
+                    lowlink[node] = index[target]
+            else:
+                frames.pop()
+                if frames:
+                    parent = frames[-1][0]
+                    if lowlink[node] < lowlink[parent]:
+                        lowlink[parent] = lowlink[node]
+                if lowlink[node] == index[node]:
+                    while True:
+                        member = stack.pop()
+                        on_stack[member] = 0
+                        component[member] = count
+                        if member == node:
+                            break
+                    count += 1
+    return component, count
+
+
+def weakly_connected_components(node_count: int,
+                                sources: Sequence[int],
+                                targets: Sequence[int]) -> Tuple[array, int]:
+    """Union-find over an edge list; returns (component of each node, number of components)"""
+    parent = array("i", range(node_count))
+
+    def find(node: int) -> int:
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for source, target in zip(sources, targets):
+        a, b = find(source), find(target)
+        if a != b:
+            parent[max(a, b)] = min(a, b)
+
+    component = array("i", [0] * node_count)
+    numbers = {}
+    for node in range(node_count):
+        component[node] = numbers.setdefault(find(node), len(numbers))
+    return component, len(numbers)
+
+
+def transitive_closure(count: int,
+                       dag_offsets: Sequence[int],
+                       dag_targets: Sequence[int]) -> List[int]:
+    """
+    Reachability bitsets over a DAG whose edges all go from a higher node
+    number to a lower one (as strongly_connected_components numbers them).
+
+    Returns one Python int per node with bit d set when d is reachable
+    (including the node itself). Nodes are visited in ascending order, so
+    every successor's bitset is complete before it is OR-ed in; each OR
+    handles 64 nodes per machine word. Node c only has bits 0..c, so the
+    total size is at most about count²/8 bytes.
+    """
+    reach = [0] * count
+    for c in range(count):
+        bits = 1 << c
+        for position in range(dag_offsets[c], dag_offsets[c + 1]):
+            bits |= reach[dag_targets[position]]
+        reach[c] = bits
+    return reach
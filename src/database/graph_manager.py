@@ -1,85 +1,208 @@
-from neo4j import GraphDatabase
-from neo4j.exceptions import ServiceUnavailable, ConfigurationError
+import os
 import time
 import logging
-from typing import Optional, Dict, Any, List
+import threading
+from typing import Optional, Dict, Any, List, Iterable, Iterator, Set, Tuple, Union
+from src.database.reaction_index import ReactionIndex
+from src.database.reaction_hypergraph import ReactionHypergraph
+from src.database.batch_search import BatchSolver
+from src.database.frontier import hop_distances, NO_ROUTE
+from src.database.landmarks import LandmarkIndex
+from src.database.contraction import ContractionHierarchy
+from src.database.models import Route
+from src.database.deadline import Deadline, DeadlineExceeded
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+# A single GraphMeta node holds the generation. It starts from the current
+# timestamp so it keeps increasing even if the database is wiped and reseeded.
+GENERATION_BUMP = """
+    MERGE (m:GraphMeta {key: 'graph'})
+    SET m.generation = coalesce(m.generation, timestamp()) + 1
+    RETURN m.generation AS generation
+"""
+
+GENERATION_READ = """
+    MATCH (m:GraphMeta {key: 'graph'})
+    RETURN m.generation AS generation
+"""
+
+
+class GraphNotReadyError(RuntimeError):
+    """Raised when the graph is used before its Neo4j connection is established"""
+
+
+def is_transaction_timeout(error: Exception) -> bool:
+    """Whether a Neo4j error is a transaction running past its timeout"""
+    return (getattr(error, "code", None) or "").startswith(
+        "Neo.ClientError.Transaction.TransactionTimedOut")
+
+
 class ChemicalGraph:
-    def __init__(self, uri: str, user: str, password: str, max_retries: int = 5, retry_delay: int = 5):
+    def __init__(self, uri: str, user: str, password: str, max_retries: Optional[int] = None,
+                 retry_delay: Optional[float] = None, batch_workers: Optional[int] = None,
+                 max_retry_delay: int = 60, connect: bool = True,
+                 generation_ttl: float = 1.0, landmarks: int = 8,
+                 hierarchy_path: Optional[str] = None):
         self._uri = uri
         self._user = user
         self._password = password
         self._driver = None
-        self._max_retries = max_retries
+        # The retry budget of a synchronous connect; defaults come from the environment
+        if max_retries is None:
+            max_retries = int(os.getenv("NEO4J_CONNECT_RETRIES", "5"))
+        if retry_delay is None:
+            retry_delay = float(os.getenv("NEO4J_RETRY_DELAY", "5"))
+        self._max_retries = max(1, max_retries)
         self._retry_delay = retry_delay
-        self._connect()
+        self._max_retry_delay = max_retry_delay
+        self._ready = threading.Event()
+        self._closed = threading.Event()
+        self._connect_thread = None
+        self._generation = 0
+        self._generation_ttl = generation_ttl
+        self._generation_checked = float("-inf")
+        self._index = None
+        self._hypergraph = None
+        self._index_lock = threading.Lock()
+        self._landmark_count = landmarks
+        self._landmarks = None
+        self._hierarchy_path = hierarchy_path
+        self._hierarchy = None
+        self._hierarchy_mtime = None
+        self._batch_solver = BatchSolver(batch_workers)
+        if connect:
+            self._connect()
 
-    def _connect(self) -> None:
-        """Establish connection to Neo4j with retry logic"""
+    def _connect(self, retry_forever: bool = False) -> None:
+        """Establish connection to Neo4j, retrying with exponential backoff"""
+        # neo4j is imported here so that creating a graph (and the API worker) stays cheap
+        from neo4j import GraphDatabase
+        from neo4j.exceptions import ConfigurationError
+
+        max_retries = None if retry_forever else self._max_retries
         retries = 0
         last_exception = None
 
-        while retries < self._max_retries:
+        while (max_retries is None or retries < max_retries) and not self._closed.is_set():
             try:
-                logger.info(f"Attempting to connect to Neo4j (Attempt {retries + 1}/{self._max_retries})")
+                logger.info(f"Attempting to connect to Neo4j (Attempt {retries + 1}/{max_retries or '∞'})")
                 if not self._uri:
                     raise ConfigurationError("Neo4j URI is not set")
-                
-                self._driver = GraphDatabase.driver(
-                    self._uri, 
+
+                driver = GraphDatabase.driver(
+                    self._uri,
                     auth=(self._user, self._password),
                     max_connection_lifetime=3600,  # 1 hour
                     max_connection_pool_size=50,
                     connection_acquisition_timeout=60  # 1 minute timeout
                 )
                 # Verify connection
-                self._driver.verify_connectivity()
+                try:
+                    driver.verify_connectivity()
+                except Exception:
+                    driver.close()
+                    raise
+                self._driver = driver
+                self._ready.set()
                 logger.info("Successfully connected to Neo4j")
+                try:
+                    self._setup_constraints()
+                except Exception:
+                    # Already logged; the graph works without them, only slower
+                    logger.warning("Continuing without uniqueness constraints")
                 return
             except Exception as e:
                 last_exception = e
                 logger.error(f"Failed to connect to Neo4j: {str(e)}")
                 retries += 1
-                if retries < self._max_retries:
-                    logger.info(f"Retrying in {self._retry_delay} seconds...")
-                    time.sleep(self._retry_delay)
+                if max_retries is None or retries < max_retries:
+                    delay = min(self._retry_delay * 2 ** (retries - 1), self._max_retry_delay)
+                    logger.info(f"Retrying in {delay} seconds...")
+                    self._closed.wait(delay)
 
         # If we get here, all retries failed
         logger.error("Max retries reached. Could not connect to Neo4j")
-        raise last_exception
+        raise last_exception or GraphNotReadyError("Graph was closed before connecting")
+
+    def connect_in_background(self, warm_index: bool = True) -> threading.Thread:
+        """
+        Connect to Neo4j on a daemon thread, retrying until it succeeds, then
+        optionally build the route search snapshot so the first query is fast.
+        The thread then keeps the cached generation fresh (see generation).
+        """
+        def run():
+            try:
+                self._connect(retry_forever=True)
+                if warm_index:
+                    self.get_index()
+                    logger.info("Route search index warmed")
+            except Exception as e:
+                logger.error(f"Background initialisation failed: {str(e)}")
+            self._watch_generation()
+
+        if self._connect_thread is None or not self._connect_thread.is_alive():
+            self._connect_thread = threading.Thread(
+                target=run, name="chempath-neo4j-connect", daemon=True)
+            self._connect_thread.start()
+        return self._connect_thread
+
+    @property
+    def is_ready(self) -> bool:
+        """True once a verified Neo4j connection exists"""
+        return self._ready.is_set()
+
+    @property
+    def index_ready(self) -> bool:
+        return self._index is not None
+
+    def _session(self):
+        if not self._ready.is_set():
+            raise GraphNotReadyError("Database connection not ready")
+        return self._driver.session()
 
     def close(self):
         """Close the driver connection"""
+        self._closed.set()
+        self._batch_solver.close()
         if self._driver:
             self._driver.close()
 
     def _verify_connection(self):
         try:
-            with self._driver.session() as session:
+            with self._session() as session:
                 session.run("MATCH (n) RETURN count(n) AS count").single()
         except Exception as e:
             logging.error(f"Failed to connect to Neo4j: {e}")
             raise
 
     def _setup_constraints(self):
-        """Setup necessary constraints for the database"""
+        """
+        Setup necessary constraints for the database, on every connect. They
+        also index the lookups of MERGE and known_hashes, and keep concurrent
+        writers from creating duplicate compounds or ingest hashes.
+        """
         try:
-            with self._driver.session() as session:
+            with self._session() as session:
                 # Ensure unique formulas
                 session.run("""
                     CREATE CONSTRAINT compound_formula IF NOT EXISTS
                     FOR (c:Compound) REQUIRE c.formula IS UNIQUE
                 """)
+                # Content hashes of ingested records, for idempotent re-ingestion
+                session.run("""
+                    CREATE CONSTRAINT ingest_hash IF NOT EXISTS
+                    FOR (h:IngestHash) REQUIRE h.hash IS UNIQUE
+                """)
         except Exception as e:
             logger.error(f"Error setting constraints: {str(e)}")
             raise
 
     def get_compounds(self, filters: Dict[str, Any] = None) -> List[Dict]:
         try:
-            with self._driver.session() as session:
+            with self._session() as session:
                 query = "MATCH (c:Compound) WHERE 1=1"
                 params = {}
 
@@ -98,7 +221,7 @@ class ChemicalGraph:
 
     def get_compound(self, formula: str) -> Optional[Dict]:
         try:
-            with self._driver.session() as session:
+            with self._session() as session:
                 result = session.run(
                     "MATCH (c:Compound {formula: $formula}) RETURN c",
                     formula=formula
@@ -110,7 +233,7 @@ class ChemicalGraph:
 
     def get_compound_suggestions(self, prefix: str, limit: int) -> List[Dict]:
         try:
-            with self._driver.session() as session:
+            with self._session() as session:
                 result = session.run("""
                     MATCH (c:Compound)
                     WHERE c.formula STARTS WITH $prefix 
@@ -125,20 +248,19 @@ class ChemicalGraph:
 
     def add_compound(self, formula: str, properties: Dict[str, Any] = None) -> Dict:
         try:
-            with self._driver.session() as session:
+            with self._session() as session:
                 if not properties:
                     properties = {}
 
-                result = session.execute_write(
-                    lambda tx: tx.run(
-                        """
-                        MERGE (c:Compound {formula: $formula})
-                        SET c += $properties
-                        RETURN c
-                        """,
-                        formula=formula,
-                        properties=properties
-                    ).data()
+                result = self._write(
+                    session,
+                    """
+                    MERGE (c:Compound {formula: $formula})
+                    SET c += $properties
+                    RETURN c
+                    """,
+                    formula=formula,
+                    properties=properties
                 )
                 return result[0] if result else None
         except Exception as e:
@@ -149,57 +271,622 @@ class ChemicalGraph:
                      reactant: str,
                      product: str,
                      conditions: Dict[str, Any]) -> Dict:
+        """
+        Add a reactant -> product reaction. Each reagent gets its own
+        relationship (keyed by `variant`), so alternative reagents for the same
+        conversion are kept instead of overwriting each other.
+        """
         try:
-            with self._driver.session() as session:
+            with self._session() as session:
 
-                result = session.execute_write(
-                    lambda tx: tx.run(
-                        """
-                        MATCH (r:Compound {formula: $reactant})
-                        MATCH (p:Compound {formula: $product})
-                        MERGE (r)-[rel:REACTS_TO]->(p)
-                        SET rel += $conditions
-                        RETURN rel
-                        """,
-                        reactant=reactant,
-                        product=product,
-                        conditions=conditions
-                    ).data()
+                result = self._write(
+                    session,
+                    """
+                    MATCH (r:Compound {formula: $reactant})
+                    MATCH (p:Compound {formula: $product})
+                    MERGE (r)-[rel:REACTS_TO {variant: $variant}]->(p)
+                    SET rel += $conditions
+                    RETURN rel
+                    """,
+                    reactant=reactant,
+                    product=product,
+                    variant=conditions.get("reagent") or "",
+                    conditions=conditions
                 )
                 return result[0] if result else None
         except Exception as e:
             logger.error(f"Error adding reaction: {str(e)}")
             raise
 
-    def find_paths(self, start_compound: str, end_compound: str, max_depth: int = 5) -> List[Dict]:
-        try:
-            with self._driver.session() as session:
-                query = """
-                    MATCH path = (start:Compound {formula: $start})
-                        -[reactions:REACTS_TO*..%d]->
-                        (end:Compound {formula: $end})
-                    WHERE ALL(r IN relationships(path) WHERE 1=1
-                """ % max_depth
-
-                params = {"start": start_compound, "end": end_compound}
-
-                query += """)
-                    WITH path,
-                        [n IN nodes(path) | n] as compounds,
-                        [r IN relationships(path) | properties(r)] as reactions,
-                        [r IN relationships(path) | r.reagent] as reagents,
-                        length(path) AS path_length
-                    RETURN {
-                        compounds: compounds,
-                        reactions: reactions,
-                        reagents: reagents,
-                        total_steps: path_length
-                    } as pathInfo
-                    ORDER BY path_length
-                """
+    def add_multi_reaction(self,
+                           reactants: List[str],
+                           products: List[str],
+                           conditions: Dict[str, Any]) -> Dict:
+        """Add a reaction with several reactants and/or products as a Reaction node"""
+        try:
+            with self._session() as session:
+                key = "%s>%s|%s" % (
+                    "+".join(sorted(reactants)),
+                    "+".join(sorted(products)),
+                    conditions.get("reagent") or ""
+                )
 
-                result = session.run(query, params).data()
-                return [record['pathInfo'] for record in result]
+                result = self._write(
+                    session,
+                    """
+                    MATCH (c:Compound) WHERE c.formula IN $participants
+                    WITH count(c) AS found
+                    WHERE found = size($participants)
+                    MERGE (rx:Reaction {key: $key})
+                    SET rx += $conditions
+                    WITH rx
+                    UNWIND $reactants AS formula
+                    MATCH (r:Compound {formula: formula})
+                    MERGE (r)-[:REACTANT_OF]->(rx)
+                    WITH DISTINCT rx
+                    UNWIND $products AS formula
+                    MATCH (p:Compound {formula: formula})
+                    MERGE (rx)-[:PRODUCES]->(p)
+                    RETURN DISTINCT rx
+                    """,
+                    key=key,
+                    reactants=list(dict.fromkeys(reactants)),
+                    products=list(dict.fromkeys(products)),
+                    participants=list(dict.fromkeys(reactants + products)),
+                    conditions=conditions
+                )
+                return result[0] if result else None
+        except Exception as e:
+            logger.error(f"Error adding reaction: {str(e)}")
+            raise
+
+    def add_batch(self,
+                  compounds: List[Tuple[str, Dict[str, Any]]],
+                  reactions: List[Tuple[str, str, Dict[str, Any]]],
+                  bump_generation: bool = True,
+                  compound_hashes: Optional[List[List[str]]] = None,
+                  reaction_hashes: Optional[List[List[str]]] = None,
+                  placeholders: Optional[List[str]] = None) -> List[bool]:
+        """
+        Add many compounds and reactions in one transaction, compounds first so
+        reactions may refer to compounds of the same batch. Returns, per
+        reaction, whether both of its compounds existed and it was written.
+
+        Concurrent bulk writers pass bump_generation=False, since every bump
+        locks the same GraphMeta node, and call bump_generation() once at the end.
+        Content hashes (a list per compound or reaction), when given, are
+        recorded for the records actually written (see known_hashes).
+        Placeholder formulas are created, flagged `placeholder: true`, unless
+        a compound with that formula already exists, so reactions referring
+        to compounds never defined can still be written. The flag is removed
+        when the compound itself is written later.
+        """
+        compound_hashes = compound_hashes or [None] * len(compounds)
+        reaction_hashes = reaction_hashes or [None] * len(reactions)
+        try:
+            with self._session() as session:
+                _, _, written = self._write_many(session, [
+                    (
+                        """
+                        UNWIND $rows AS row
+                        MERGE (c:Compound {formula: row.formula})
+                        SET c += row.properties
+                        REMOVE c.placeholder
+                        FOREACH (hash IN row.hashes | MERGE (:IngestHash {hash: hash}))
+                        RETURN row.formula AS formula
+                        """,
+                        {"rows": [{"formula": formula, "properties": properties or {},
+                                   "hashes": hashes or []}
+                                  for (formula, properties), hashes in zip(compounds, compound_hashes)]}
+                    ),
+                    (
+                        """
+                        UNWIND $formulas AS formula
+                        MERGE (c:Compound {formula: formula})
+                        ON CREATE SET c.placeholder = true
+                        RETURN formula
+                        """,
+                        {"formulas": placeholders or []}
+                    ),
+                    (
+                        """
+                        UNWIND $rows AS row
+                        MATCH (r:Compound {formula: row.reactant})
+                        MATCH (p:Compound {formula: row.product})
+                        MERGE (r)-[rel:REACTS_TO {variant: row.variant}]->(p)
+                        SET rel += row.conditions
+                        FOREACH (hash IN row.hashes | MERGE (:IngestHash {hash: hash}))
+                        RETURN row.position AS position
+                        """,
+                        {"rows": [
+                            {"position": position, "reactant": reactant, "product": product,
+                             "variant": conditions.get("reagent") or "", "conditions": conditions,
+                             "hashes": hashes or []}
+                            for position, ((reactant, product, conditions), hashes)
+                            in enumerate(zip(reactions, reaction_hashes))
+                        ]}
+                    )
+                ], bump_generation)
+                positions = {record["position"] for record in written}
+                return [position in positions for position in range(len(reactions))]
+        except Exception as e:
+            logger.error(f"Error adding batch: {str(e)}")
+            raise
+
+    def known_hashes(self, hashes: List[str]) -> Set[str]:
+        """The subset of content hashes already recorded by earlier ingestion"""
+        try:
+            with self._session() as session:
+                result = session.run("""
+                    UNWIND $hashes AS hash
+                    MATCH (h:IngestHash {hash: hash})
+                    RETURN h.hash AS hash
+                    """,
+                    hashes=hashes
+                )
+                return {record["hash"] for record in result}
+        except Exception as e:
+            logger.error(f"Error reading ingest hashes: {str(e)}")
+            raise
+
+    def _write(self, session, query: str, **params) -> List[Dict]:
+        """
+        Run a write query and, if it changed anything, bump the graph
+        generation in the same transaction.
+        """
+        return self._write_many(session, [(query, params)])[0]
+
+    def _write_many(self,
+                    session,
+                    statements: List[Tuple[str, Dict[str, Any]]],
+                    bump_generation: bool = True) -> List[List[Dict]]:
+        """Run several write queries in one transaction with a single generation bump"""
+        def work(tx):
+            results, changed = [], False
+            for query, params in statements:
+                result = tx.run(query, **params)
+                results.append(result.data())
+                # Matched-only MERGEs return rows too; only counters show a write
+                changed = result.consume().counters.contains_updates or changed
+            bump = bump_generation and changed
+            generation = tx.run(GENERATION_BUMP).single()["generation"] if bump else None
+            return results, generation
+
+        results, generation = session.execute_write(work)
+        if generation is not None:
+            self._mark_changed(generation)
+        return results
+
+    def bump_generation(self) -> int:
+        """Advance the graph generation, e.g. after writes made with bump_generation=False"""
+        try:
+            with self._session() as session:
+                generation = session.execute_write(
+                    lambda tx: tx.run(GENERATION_BUMP).single()["generation"])
+            self._mark_changed(generation)
+            return generation
+        except Exception as e:
+            logger.error(f"Error bumping graph generation: {str(e)}")
+            raise
+
+    @staticmethod
+    def _edge_conditions(conditions: Dict[str, Any]) -> Dict[str, Any]:
+        """Reaction conditions as stored on a relationship, minus the internal `variant` key"""
+        return {k: v for k, v in conditions.items() if k != 'variant'}
+
+    @staticmethod
+    def _read_generation(tx) -> int:
+        record = tx.run(GENERATION_READ).single()
+        return record["generation"] if record else 0
+
+    def read_generation(self) -> int:
+        """Fetch the current graph generation from Neo4j (one indexed lookup)"""
+        with self._session() as session:
+            generation = session.execute_read(self._read_generation)
+        self._generation_checked = time.monotonic()
+        if generation != self._generation:
+            # Authoritative, so it may also move back (e.g. the graph was wiped)
+            self._generation = generation
+            self.invalidate_index()
+        return generation
+
+    @property
+    def generation(self) -> int:
+        """
+        The graph generation: bumped transactionally by every write, so any
+        cache built over the graph can tag itself with it. Only the cached
+        value is returned, so it is safe to read on the event loop; the
+        background thread (or refresh_generation) notices other writers.
+        """
+        return self._generation
+
+    def refresh_generation(self) -> int:
+        """The generation, re-read from Neo4j if it is older than generation_ttl"""
+        if self.is_ready and time.monotonic() - self._generation_checked >= self._generation_ttl:
+            try:
+                self.read_generation()
+            except Exception as e:
+                logger.error(f"Error reading graph generation: {str(e)}")
+        return self._generation
+
+    def _watch_generation(self) -> None:
+        """Re-read the generation every generation_ttl seconds until closed"""
+        while not self._closed.wait(self._generation_ttl):
+            if self.is_ready:
+                self.refresh_generation()
+
+    def _mark_changed(self, generation: int) -> None:
+        # Concurrent writers may report out of order; generations only move forward
+        if generation > self._generation:
+            self._generation = generation
+            self.invalidate_index()
+
+    def _load_index(self, timeout: Optional[float] = None) -> ReactionIndex:
+        """
+        Load a consistent snapshot of all compounds and reactions for route
+        search, with a Neo4j transaction timeout in seconds if given; running
+        past it raises DeadlineExceeded
+        """
+        def work(tx):
+            generation = self._read_generation(tx)
+            compounds = tx.run("MATCH (c:Compound) RETURN c").data()
+            reactions = tx.run("""
+                MATCH (r:Compound)-[rel:REACTS_TO]->(p:Compound)
+                RETURN r.formula AS reactant, p.formula AS product,
+                       properties(rel) AS conditions
+            """).data()
+            return generation, compounds, reactions
+
+        if timeout is not None:
+            from neo4j import unit_of_work
+            work = unit_of_work(timeout=timeout)(work)
+        with self._session() as session:
+            try:
+                generation, compounds, reactions = session.execute_read(work)
+            except Exception as e:
+                if timeout is not None and is_transaction_timeout(e):
+                    raise DeadlineExceeded("snapshot load exceeded the time budget") from e
+                raise
+        return ReactionIndex(
+            [record['c'] for record in compounds],
+            [(record['reactant'], record['product'], self._edge_conditions(record['conditions']))
+             for record in reactions],
+            generation=generation
+        )
+
+    def get_index(self, deadline: Optional[Deadline] = None) -> ReactionIndex:
+        """
+        Return the current route search snapshot, rebuilding it when the graph
+        changed. A rebuild needed by a request with a deadline gets the time
+        left as its Neo4j transaction timeout.
+        """
+        generation = self.refresh_generation()
+        index = self._index
+        if index is None or index.generation < generation:
+            with self._index_lock:
+                if self._index is None or self._index.generation < self._generation:
+                    timeout = None
+                    if deadline is not None:
+                        deadline.check()
+                        timeout = deadline.remaining()
+                    index = self._load_index(timeout)
+                    self._attach_landmarks(index)
+                    self._attach_hierarchy(index)
+                    self._index = index
+                index = self._index
+        return index
+
+    def _attach_landmarks(self, index: ReactionIndex) -> None:
+        """Give a new snapshot ALT landmarks, refreshed from the previous ones when possible"""
+        if not self._landmark_count:
+            return
+        try:
+            if self._landmarks is None:
+                self._landmarks = LandmarkIndex(index, self._landmark_count)
+            else:
+                self._landmarks = self._landmarks.refresh(index)
+            index.landmarks = self._landmarks
+        except Exception as e:
+            # Landmarks only speed up searches; fall back to the reverse BFS
+            logger.error(f"Error preparing landmarks: {str(e)}")
+
+    def _attach_hierarchy(self, index: ReactionIndex) -> None:
+        """
+        Load the contraction hierarchy built offline (python -m
+        src.database.contraction) and attach it when it matches the snapshot's
+        generation. A stale file is reloaded once it has been rebuilt.
+        """
+        if not self._hierarchy_path:
+            return
+        try:
+            if self._hierarchy is None or self._hierarchy.generation != index.generation:
+                mtime = os.path.getmtime(self._hierarchy_path)
+                if mtime != self._hierarchy_mtime:
+                    self._hierarchy = ContractionHierarchy.load(self._hierarchy_path)
+                    self._hierarchy_mtime = mtime
+            if self._hierarchy.generation == index.generation and self._hierarchy.hop_weights:
+                index.hierarchy = self._hierarchy
+            else:
+                logger.info(f"Contraction hierarchy in {self._hierarchy_path} is for generation "
+                            f"{self._hierarchy.generation}, not {index.generation}; not using it")
+        except Exception as e:
+            # The hierarchy only speeds up shortest route queries
+            logger.error(f"Error loading contraction hierarchy: {str(e)}")
+
+    def _load_hypergraph(self) -> ReactionHypergraph:
+        """Load compounds, Reaction nodes and REACTS_TO edges as one consistent hypergraph"""
+        def work(tx):
+            generation = self._read_generation(tx)
+            compounds = tx.run("MATCH (c:Compound) RETURN c").data()
+            reactions = tx.run("""
+                MATCH (rx:Reaction)
+                RETURN [(r:Compound)-[:REACTANT_OF]->(rx) | r.formula] AS reactants,
+                       [(rx)-[:PRODUCES]->(p:Compound) | p.formula] AS products,
+                       properties(rx) AS conditions
+                UNION ALL
+                MATCH (r:Compound)-[rel:REACTS_TO]->(p:Compound)
+                RETURN [r.formula] AS reactants, [p.formula] AS products,
+                       properties(rel) AS conditions
+            """).data()
+            return generation, compounds, reactions
+
+        with self._session() as session:
+            generation, compounds, reactions = session.execute_read(work)
+        return ReactionHypergraph(
+            [record['c'] for record in compounds],
+            [(record['reactants'], record['products'], self._edge_conditions(record['conditions']))
+             for record in reactions],
+            generation=generation
+        )
+
+    def get_hypergraph(self) -> ReactionHypergraph:
+        """Return the current multi-reactant planning snapshot, rebuilding it when the graph changed"""
+        generation = self.refresh_generation()
+        hypergraph = self._hypergraph
+        if hypergraph is None or hypergraph.generation < generation:
+            with self._index_lock:
+                if self._hypergraph is None or self._hypergraph.generation < self._generation:
+                    self._hypergraph = self._load_hypergraph()
+                hypergraph = self._hypergraph
+        return hypergraph
+
+    def invalidate_index(self) -> None:
+        self._index = None
+        self._hypergraph = None
+
+    def plan_synthesis(self,
+                       target: str,
+                       available: Iterable[str],
+                       max_steps: Optional[int] = None) -> Optional[Dict]:
+        """
+        Plan the cheapest synthesis of target when several reactants may be
+        needed per step, using only the available compounds as starting materials.
+        """
+        try:
+            return self.get_hypergraph().plan(target, available, max_steps)
+        except Exception as e:
+            logger.error(f"Error planning synthesis: {str(e)}")
+            raise
+
+    def find_routes(self,
+                    start_compound: Union[str, Iterable[str], None],
+                    end_compound: Union[str, Iterable[str], None],
+                    max_depth: int = 5,
+                    start_class: Optional[str] = None,
+                    end_class: Optional[str] = None,
+                    paths_per_pair: Optional[int] = None,
+                    constraints: Optional[Dict[str, Any]] = None,
+                    shortest_only: bool = False,
+                    deadline: Optional[Deadline] = None,
+                    partial: bool = False,
+                    stats: Optional[Dict[str, Any]] = None) -> List[Route]:
+        """
+        Find reaction paths from any start compound to any end compound.
+
+        Starts and ends may be single formulas, collections of formulas and/or
+        compound class selectors (e.g. "alcohol"); the whole query is answered
+        by one multi-source search instead of one search per pair.
+
+        Args:
+            start_compound: Formula or formulas to start from
+            end_compound: Formula or formulas to reach
+            max_depth: Maximum number of reaction steps
+            start_class: Also start from every compound of this class
+            end_class: Also accept every compound of this class as an end
+            paths_per_pair: Keep only this many shortest paths per (start, end) pair
+            constraints: Reaction filters applied while searching, see
+                ReactionIndex.compile_constraints (exclude_reagents,
+                reaction_types, max_temperature, curriculum_only)
+            shortest_only: Only return routes as short as the shortest one,
+                searching no deeper than that (a much cheaper query)
+            deadline: Time budget for the snapshot load and the search;
+                DeadlineExceeded is raised when it runs out
+            partial: Instead return the routes found before the deadline,
+                setting stats["truncated"]
+            stats: Receives search counters, see ReactionIndex.find_routes
+        """
+        try:
+            if isinstance(start_compound, str):
+                start_compound = [start_compound]
+            if isinstance(end_compound, str):
+                end_compound = [end_compound]
+
+            index = self.get_index(deadline)
+            sources = index.resolve(start_compound, start_class)
+            targets = index.resolve(end_compound, end_class)
+            if not sources or not targets:
+                return []
+
+            edge_mask = index.compile_constraints(constraints)
+            if shortest_only:
+                try:
+                    max_depth = index.shortest_depth(sources, targets, max_depth, edge_mask, deadline)
+                except DeadlineExceeded:
+                    if not partial:
+                        raise
+                    if stats is not None:
+                        stats["truncated"] = True
+                    return []
+                if max_depth is None:
+                    return []
+            routes = index.find_routes(sources, targets, max_depth, paths_per_pair, edge_mask,
+                                       stats=stats, deadline=deadline, partial=partial)
+            return [index.describe_route(route, constraints) for route in routes]
         except Exception as e:
             logger.error(f"Error finding path: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+    def routes_by_depth(self,
+                        start_compound: Union[str, Iterable[str], None],
+                        end_compound: Union[str, Iterable[str], None],
+                        max_depth: int = 5,
+                        start_class: Optional[str] = None,
+                        end_class: Optional[str] = None,
+                        paths_per_pair: Optional[int] = None,
+                        constraints: Optional[Dict[str, Any]] = None,
+                        limit: Optional[int] = None,
+                        deadline: Optional[Deadline] = None
+                        ) -> Iterator[Tuple[int, List[Route], ReactionIndex]]:
+        """
+        Find reaction paths by iterative deepening, yielding (depth, routes,
+        index) for each number of steps that has routes, shortest first, until
+        limit routes were found. Arguments are as for find_routes; the index
+        is the snapshot the routes were described from.
+        """
+        try:
+            if isinstance(start_compound, str):
+                start_compound = [start_compound]
+            if isinstance(end_compound, str):
+                end_compound = [end_compound]
+
+            index = self.get_index(deadline)
+            sources = index.resolve(start_compound, start_class)
+            targets = index.resolve(end_compound, end_class)
+            edge_mask = index.compile_constraints(constraints)
+            for depth, routes in index.routes_by_depth(sources, targets, max_depth, limit,
+                                                       paths_per_pair, edge_mask, deadline):
+                yield depth, [index.describe_route(route, constraints) for route in routes], index
+        except Exception as e:
+            logger.error(f"Error finding path: {str(e)}")
+            raise
+
+    def is_reachable(self,
+                     start_compound: str,
+                     end_compound: str,
+                     max_depth: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Whether end_compound can be made from start_compound (within max_depth
+        steps, if given), with the number of steps needed when a bound is
+        given. None when either compound is unknown.
+        """
+        try:
+            index = self.get_index()
+            source, target = index.ids.get(start_compound), index.ids.get(end_compound)
+            if source is None or target is None:
+                return None
+            steps = None
+            if max_depth is None:
+                reachable = index.reachable(source, target)
+            else:
+                steps = index.distance(source, target, max_depth)
+                reachable = steps is not None
+            return {"start": start_compound, "end": end_compound,
+                    "reachable": reachable, "steps": steps}
+        except Exception as e:
+            logger.error(f"Error checking reachability: {str(e)}")
+            raise
+
+    def estimate_routes(self,
+                        start_compound: Union[str, Iterable[str], None],
+                        end_compound: Union[str, Iterable[str], None],
+                        max_depth: int = 5,
+                        start_class: Optional[str] = None,
+                        end_class: Optional[str] = None,
+                        deadline: Optional[Deadline] = None) -> int:
+        """
+        Predicted number of partial routes find_routes would explore (an
+        upper bound). A snapshot load it needs runs within deadline.
+        """
+        try:
+            if isinstance(start_compound, str):
+                start_compound = [start_compound]
+            if isinstance(end_compound, str):
+                end_compound = [end_compound]
+            index = self.get_index(deadline)
+            return index.estimate_routes(
+                index.resolve(start_compound, start_class),
+                index.resolve(end_compound, end_class),
+                max_depth
+            )
+        except Exception as e:
+            logger.error(f"Error estimating path query cost: {str(e)}")
+            raise
+
+    def find_paths(self,
+                   start_compound: Union[str, Iterable[str], None],
+                   end_compound: Union[str, Iterable[str], None],
+                   max_depth: int = 5,
+                   **kwargs) -> List[Dict]:
+        """find_routes, with each Route as a plain dict (compounds referenced by formula)"""
+        routes = self.find_routes(start_compound, end_compound, max_depth, **kwargs)
+        return [route.to_dict() for route in routes]
+
+    def compound_table(self, routes: Iterable[Route]) -> Dict[str, Dict[str, Any]]:
+        """The {formula: compound} table for the compounds referenced by routes"""
+        return self.get_index().compound_table(routes)
+
+    def hop_distances(self,
+                      start_compounds: List[str],
+                      end_compounds: Optional[List[str]] = None,
+                      max_depth: int = 5,
+                      constraints: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Fewest reaction steps from every start compound to every end compound
+        (all compounds when end_compounds is None), computed for the whole
+        batch at once. Returns {starts, ends, distances} where distances[i][j]
+        is None when ends[j] cannot be made from starts[i] within max_depth
+        steps, or when either compound is unknown.
+        """
+        try:
+            index = self.get_index()
+            if end_compounds is None:
+                end_compounds = list(index.formulas)
+            sources = [index.ids[f] for f in dict.fromkeys(start_compounds) if f in index.ids]
+            targets = [index.ids[f] for f in dict.fromkeys(end_compounds) if f in index.ids]
+            rows = hop_distances(index, sources, max_depth, targets,
+                                 index.compile_constraints(constraints))
+            row_of = {index.formulas[s]: row for s, row in zip(sources, rows)}
+            column_of = {index.formulas[t]: i for i, t in enumerate(targets)}
+            distances = []
+            for start in start_compounds:
+                row = row_of.get(start)
+                distances.append([
+                    None if row is None or end not in column_of or row[column_of[end]] == NO_ROUTE
+                    else row[column_of[end]]
+                    for end in end_compounds
+                ])
+            return {"starts": list(start_compounds), "ends": list(end_compounds),
+                    "distances": distances}
+        except Exception as e:
+            logger.error(f"Error computing hop distances: {str(e)}")
+            raise
+
+    def find_paths_batch(self,
+                         pairs: List[Tuple[str, str]],
+                         max_depth: int = 5,
+                         paths_per_pair: Optional[int] = None,
+                         constraints: Optional[Dict[str, Any]] = None) -> List[Dict]:
+        """
+        Find reaction paths for many (start, end) pairs at once.
+
+        Duplicate pairs are solved once and pairs sharing a start compound share
+        one search; the searches run in parallel worker processes. Returns one
+        {start, end, paths} entry per input pair, in input order, where paths
+        is a list of Route objects.
+        """
+        try:
+            return self._batch_solver.solve(
+                self.get_index(), pairs, max_depth, paths_per_pair, constraints)
+        except Exception as e:
+            logger.error(f"Error finding batch paths: {str(e)}")
+            raise
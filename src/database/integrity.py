@@ -0,0 +1,208 @@
+import os
+import sys
+import json
+import argparse
+from collections import Counter
+from typing import Optional, Dict, Any, List, Iterable, Tuple
+from dotenv import load_dotenv
+from src.database.graph_manager import ChemicalGraph
+from src.database.graph_algorithms import strongly_connected_components, weakly_connected_components
+from src.database.file_ingestion import FORMULA_ALIASES, normalize_formula, parse_records, read_raw
+
+# Load environment variables
+load_dotenv()
+
+
+def scan(compounds: Iterable[Dict[str, Any]],
+         reactions: Iterable[Tuple[str, str, Dict[str, Any]]],
+         multi_reactions: Iterable[Tuple[List[str], List[str], Dict[str, Any]]] = ()) -> Dict[str, Any]:
+    """
+    Check an in-memory export of the graph (or of a corpus about to be
+    ingested) and report:
+
+    - missing_compounds: formulas used by reactions but never defined, with
+      how many reactions reference each; placeholder compounds (created by
+      --create-missing ingestion) still waiting for their record count too
+    - isolated: compounds that take part in no reaction
+    - islands: groups of connected compounds cut off from the main network
+    - cycles: strongly connected components with more than one compound
+    - duplicate_aliases: compounds defined under more than one formula
+    """
+    defined: Dict[str, Dict[str, Any]] = {}
+    placeholders: List[str] = []
+    for compound in compounds:
+        if compound.get("placeholder"):
+            placeholders.append(compound["formula"])
+        else:
+            defined.setdefault(compound["formula"], {}).update(compound)
+
+    ids: Dict[str, int] = {formula: i for i, formula in enumerate(defined)}
+    formulas = list(defined)
+    missing = Counter()
+    sources, targets = [], []
+    reaction_count = 0
+
+    def node(formula: str) -> int:
+        if formula not in ids:
+            missing[formula] += 1
+            ids[formula] = len(formulas)
+            formulas.append(formula)
+        elif formula not in defined:
+            missing[formula] += 1
+        return ids[formula]
+
+    for reactant, product, _ in reactions:
+        reaction_count += 1
+        sources.append(node(reactant))
+        targets.append(node(product))
+    for reactants, products, _ in multi_reactions:
+        reaction_count += 1
+        reactant_ids = [node(formula) for formula in reactants]
+        product_ids = [node(formula) for formula in products]
+        for source in reactant_ids:
+            for target in product_ids:
+                sources.append(source)
+                targets.append(target)
+
+    for formula in placeholders:
+        if formula not in defined:
+            # Listed even when no reaction refers to it any more
+            missing[formula] += 0
+
+    node_count = len(formulas)
+    degree = _degrees(node_count, sources, targets)
+
+    # Islands: weak components other than the largest, ignoring isolated nodes
+    weak, weak_count = weakly_connected_components(node_count, sources, targets)
+    members: List[List[str]] = [[] for _ in range(weak_count)]
+    for node_id in range(node_count):
+        if degree[node_id]:
+            members[weak[node_id]].append(formulas[node_id])
+    groups = sorted((group for group in members if group), key=len, reverse=True)
+
+    # Cycles: strong components over a CSR copy of the edges
+    order = sorted(range(len(sources)), key=sources.__getitem__)
+    offsets = [0] * (node_count + 1)
+    for source in sources:
+        offsets[source + 1] += 1
+    for node_id in range(node_count):
+        offsets[node_id + 1] += offsets[node_id]
+    csr_targets = [targets[edge] for edge in order]
+    strong, strong_count = strongly_connected_components(node_count, offsets, csr_targets)
+    components: List[List[str]] = [[] for _ in range(strong_count)]
+    for node_id in range(node_count):
+        components[strong[node_id]].append(formulas[node_id])
+
+    return {
+        "compounds": len(defined),
+        "reactions": reaction_count,
+        "missing_compounds": dict(missing.most_common()),
+        "isolated": [formula for formula in defined if not degree[ids[formula]]],
+        "islands": groups[1:],
+        "cycles": sorted((c for c in components if len(c) > 1), key=len, reverse=True),
+        "duplicate_aliases": duplicate_aliases(defined)
+    }
+
+
+def _degrees(node_count: int, sources: List[int], targets: List[int]) -> List[int]:
+    """Number of reactions each node takes part in"""
+    degree = [0] * node_count
+    for source, target in zip(sources, targets):
+        degree[source] += 1
+        degree[target] += 1
+    return degree
+
+
+def duplicate_aliases(defined: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Formulas that are known aliases of each other, or share a compound name"""
+    duplicates = []
+    for alias, formula in FORMULA_ALIASES.items():
+        if alias in defined and formula in defined:
+            duplicates.append({"formulas": [formula, alias], "reason": "alias"})
+    by_name: Dict[str, List[str]] = {}
+    for formula, compound in defined.items():
+        name = compound.get("name")
+        if name:
+            by_name.setdefault(name.strip().lower(), []).append(formula)
+    for name, formulas in by_name.items():
+        canonical = {normalize_formula(formula) for formula in formulas}
+        if len(formulas) > 1 and len(canonical) > 1:
+            duplicates.append({"formulas": formulas, "reason": f"same name: {name}"})
+    return duplicates
+
+
+def export_graph(graph: ChemicalGraph) -> Tuple[List[Dict], List[Tuple], List[Tuple]]:
+    """Read compounds, REACTS_TO edges and Reaction nodes in one transaction"""
+    def work(tx):
+        compounds = [record["c"] for record in tx.run("MATCH (c:Compound) RETURN c").data()]
+        reactions = [
+            (record["reactant"], record["product"], record["conditions"])
+            for record in tx.run("""
+                MATCH (r:Compound)-[rel:REACTS_TO]->(p:Compound)
+                RETURN r.formula AS reactant, p.formula AS product,
+                       properties(rel) AS conditions
+            """).data()
+        ]
+        multi = [
+            (record["reactants"], record["products"], record["conditions"])
+            for record in tx.run("""
+                MATCH (rx:Reaction)
+                RETURN [(r:Compound)-[:REACTANT_OF]->(rx) | r.formula] AS reactants,
+                       [(rx)-[:PRODUCES]->(p:Compound) | p.formula] AS products,
+                       properties(rx) AS conditions
+            """).data()
+        ]
+        return compounds, reactions, multi
+
+    with graph._session() as session:
+        return session.execute_read(work)
+
+
+def scan_records(records: Iterable[Tuple]) -> Dict[str, Any]:
+    """Scan parsed ingestion records (see file_ingestion.parse_record)"""
+    compounds, reactions = [], []
+    for record in records:
+        if record[0] == "compound":
+            compounds.append(record[2])
+        elif record[0] == "reaction":
+            reactions.append(record[1:])
+    return scan(compounds, reactions)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Report missing compounds, islands, cycles and duplicate aliases")
+    parser.add_argument("paths", nargs="*",
+                        help="CSV/JSONL files to scan (default: the built-in reaction sets)")
+    parser.add_argument("--graph", action="store_true", help="Scan the live Neo4j graph instead")
+    args = parser.parse_args(argv)
+
+    if args.graph:
+        graph = ChemicalGraph(
+            os.getenv("NEO4J_URI"),
+            os.getenv("NEO4J_USER"),
+            os.getenv("NEO4J_PASSWORD")
+        )
+        try:
+            report = scan(*export_graph(graph))
+        finally:
+            graph.close()
+    elif args.paths:
+        raws = (raw for path in args.paths for raw in read_raw(path))
+        report = scan_records(parse_records(raws))
+    else:
+        # Formulas as written, so aliases such as HCHO/CH2O are reported
+        from src.database.data_ingestion import REACTION_SETS
+        report = scan(
+            [c for reaction_set in REACTION_SETS for c in reaction_set["compounds"]],
+            [(r["reactant"], r["product"], r["conditions"])
+             for reaction_set in REACTION_SETS for r in reaction_set["reactions"]],
+            [(r["reactants"], r["products"], r["conditions"])
+             for reaction_set in REACTION_SETS for r in reaction_set.get("multi_reactions", [])]
+        )
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
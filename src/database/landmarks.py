@@ -0,0 +1,215 @@
+import logging
+from array import array
+from collections import deque
+from typing import Optional, Dict, List, Iterable, Set
+
+# NumPy is optional; without it the distance vectors are stdlib int arrays
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+logger = logging.getLogger(__name__)
+
+# Distance stored for "not reachable"; large enough that a bound using it
+# exceeds any max_depth, small enough that differences fit in 32 bits
+UNREACHABLE = 1 << 30
+
+
+def _vector(values: List[int]):
+    if numpy is not None:
+        return numpy.array(values, dtype=numpy.int32)
+    return array("i", values)
+
+
+class LandmarkIndex:
+    """
+    ALT (A*, landmarks, triangle inequality) lower bounds for a ReactionIndex.
+
+    For a few landmark compounds L we store the hop distances d(L, v)
+    (forward) and d(v, L) (backward) for every compound v. For any v and t,
+
+        d(v, t) >= d(v, L) - d(t, L)   and   d(v, t) >= d(L, t) - d(L, v)
+
+    so the largest of these over all landmarks is a lower bound on the steps
+    still needed, and an infinite one proves t unreachable from v. Bounds
+    hold for any subset of the reactions, so they also prune constrained
+    searches.
+    """
+
+    def __init__(self, index, count: int = 8, strategy: str = "farthest",
+                 landmarks: Optional[List[int]] = None):
+        self.index = index
+        if landmarks is None:
+            landmarks = self._select(count, strategy)
+        self.landmarks = landmarks
+        self.forward = [self._bfs(landmark, reverse=False) for landmark in landmarks]
+        self.backward = [self._bfs(landmark, reverse=True) for landmark in landmarks]
+
+    def _degrees(self) -> List[int]:
+        index = self.index
+        degree = [index.offsets[v + 1] - index.offsets[v] for v in range(index.node_count)]
+        for target in index.edge_targets:
+            degree[target] += 1
+        return degree
+
+    def _select(self, count: int, strategy: str) -> List[int]:
+        """Pick landmarks by degree, or farthest-first over the undirected graph"""
+        index = self.index
+        degree = self._degrees()
+        by_degree = sorted(range(index.node_count), key=lambda v: -degree[v])
+        by_degree = [v for v in by_degree if degree[v]]
+        if strategy == "degree" or not by_degree:
+            return by_degree[:count]
+        if index._reverse_offsets is None:
+            index._build_reverse()
+
+        landmarks = [by_degree[0]]
+        distance = [UNREACHABLE] * index.node_count
+        while len(landmarks) < count:
+            # Multi-source BFS from the newest landmark, keeping the minimum
+            queue = deque([landmarks[-1]])
+            distance[landmarks[-1]] = 0
+            while queue:
+                node = queue.popleft()
+                depth = distance[node] + 1
+                for neighbour in self._neighbours(node):
+                    if depth < distance[neighbour]:
+                        distance[neighbour] = depth
+                        queue.append(neighbour)
+            # Unreached (other islands) count as farthest; ties go to high degree
+            candidate = max(by_degree, key=lambda v: (distance[v], degree[v]))
+            if distance[candidate] == 0:
+                break
+            landmarks.append(candidate)
+        return landmarks
+
+    def _neighbours(self, node: int) -> Iterable[int]:
+        index = self.index
+        for edge_id in range(index.offsets[node], index.offsets[node + 1]):
+            yield index.edge_targets[edge_id]
+        for position in range(index._reverse_offsets[node], index._reverse_offsets[node + 1]):
+            yield index.edge_sources[index._reverse_edges[position]]
+
+    def _successors(self, node: int, reverse: bool) -> Iterable[int]:
+        index = self.index
+        if reverse:
+            for position in range(index._reverse_offsets[node], index._reverse_offsets[node + 1]):
+                yield index.edge_sources[index._reverse_edges[position]]
+        else:
+            for edge_id in range(index.offsets[node], index.offsets[node + 1]):
+                yield index.edge_targets[edge_id]
+
+    def _bfs(self, landmark: int, reverse: bool):
+        if reverse and self.index._reverse_offsets is None:
+            self.index._build_reverse()
+        distance = [UNREACHABLE] * self.index.node_count
+        distance[landmark] = 0
+        queue = deque([landmark])
+        while queue:
+            node = queue.popleft()
+            depth = distance[node] + 1
+            for neighbour in self._successors(node, reverse):
+                if depth < distance[neighbour]:
+                    distance[neighbour] = depth
+                    queue.append(neighbour)
+        return _vector(distance)
+
+    def lower_bound(self, node: int, target: int) -> int:
+        """Lower bound on the reaction steps from node to target (UNREACHABLE if none)"""
+        bound = 0
+        for forward, backward in zip(self.forward, self.backward):
+            bound = max(bound, int(backward[node]) - int(backward[target]),
+                        int(forward[target]) - int(forward[node]))
+        return min(bound, UNREACHABLE)
+
+    def bounds(self, targets: Iterable[int]) -> "LandmarkBounds":
+        return LandmarkBounds(self, targets)
+
+    def refresh(self, index) -> "LandmarkIndex":
+        """
+        Landmarks for a newer snapshot of the graph. When reactions and
+        compounds were only added, the existing distances are carried over
+        and lowered through the new reactions; anything else (removals,
+        landmarks gone) rebuilds from scratch.
+        """
+        old = self.index
+        count = len(self.landmarks)
+        old_edges = {(old.formulas[s], old.formulas[t])
+                     for s, t in zip(old.edge_sources, old.edge_targets)}
+        new_edges = {(index.formulas[s], index.formulas[t])
+                     for s, t in zip(index.edge_sources, index.edge_targets)}
+        if not old_edges <= new_edges or any(formula not in index.ids for formula in old.formulas):
+            logger.info("Reactions were removed; rebuilding landmarks")
+            return LandmarkIndex(index, count)
+        added = new_edges - old_edges
+        if len(added) > max(16, len(new_edges) // 10):
+            return LandmarkIndex(index, count)
+
+        refreshed = LandmarkIndex.__new__(LandmarkIndex)
+        refreshed.index = index
+        refreshed.landmarks = [index.ids[old.formulas[landmark]] for landmark in self.landmarks]
+        new_ids = [index.ids[formula] for formula in old.formulas]
+        refreshed.forward = [self._remap(vector, new_ids, index.node_count) for vector in self.forward]
+        refreshed.backward = [self._remap(vector, new_ids, index.node_count) for vector in self.backward]
+        if index._reverse_offsets is None:
+            index._build_reverse()
+
+        added_ids = [(index.ids[source], index.ids[target]) for source, target in added]
+        for forward, backward in zip(refreshed.forward, refreshed.backward):
+            refreshed._lower(forward, [(s, t) for s, t in added_ids], reverse=False)
+            refreshed._lower(backward, [(t, s) for s, t in added_ids], reverse=True)
+        return refreshed
+
+    @staticmethod
+    def _remap(vector, new_ids: List[int], node_count: int):
+        if numpy is not None:
+            remapped = numpy.full(node_count, UNREACHABLE, dtype=numpy.int32)
+            remapped[numpy.array(new_ids, dtype=numpy.int64)] = vector
+            return remapped
+        remapped = array("i", [UNREACHABLE]) * node_count
+        for old_id, new_id in enumerate(new_ids):
+            remapped[new_id] = vector[old_id]
+        return remapped
+
+    def _lower(self, distance, edges: List, reverse: bool) -> None:
+        """Propagate distance decreases caused by new edges (u, v) through the graph"""
+        queue = deque()
+        for u, v in edges:
+            if distance[u] + 1 < distance[v]:
+                distance[v] = distance[u] + 1
+                queue.append(v)
+        while queue:
+            node = queue.popleft()
+            depth = distance[node] + 1
+            for neighbour in self._successors(node, reverse):
+                if depth < distance[neighbour]:
+                    distance[neighbour] = depth
+                    queue.append(neighbour)
+
+
+class LandmarkBounds:
+    """
+    Lazily computed lower bounds to the nearest of a few targets, used by
+    ReactionIndex.find_routes in place of an exhaustive reverse BFS. Behaves
+    like the {node: distance} dict that distances_to returns: nodes that
+    cannot reach any target are absent.
+    """
+
+    def __init__(self, landmarks: LandmarkIndex, targets: Iterable[int]):
+        self._landmarks = landmarks
+        self._targets = list(targets)
+        self._cache: Dict[int, Optional[int]] = {target: 0 for target in self._targets}
+        self.evaluated = 0
+
+    def get(self, node: int) -> Optional[int]:
+        if node in self._cache:
+            return self._cache[node]
+        self.evaluated += 1
+        bound = min(self._landmarks.lower_bound(node, target) for target in self._targets)
+        result = None if bound >= UNREACHABLE else bound
+        self._cache[node] = result
+        return result
+
+    def __contains__(self, node: int) -> bool:
+        return self.get(node) is not None
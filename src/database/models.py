@@ -0,0 +1,144 @@
+import sys
+from typing import Optional, Dict, Any, List, Tuple
+
+
+def intern_formula(formula: str) -> str:
+    """Formulas repeat across compounds, reactions and routes; keep one copy of each"""
+    return sys.intern(str(formula))
+
+
+class Compound:
+    """A compound node. Known properties get slots, anything else lands in `extra`."""
+
+    __slots__ = ("formula", "name", "compound_class", "molecular_weight", "state", "extra")
+
+    def __init__(self,
+                 formula: str,
+                 name: Optional[str] = None,
+                 compound_class: Optional[str] = None,
+                 molecular_weight: Optional[float] = None,
+                 state: Optional[str] = None,
+                 extra: Optional[Dict[str, Any]] = None):
+        self.formula = intern_formula(formula)
+        self.name = name
+        self.compound_class = sys.intern(compound_class) if compound_class else None
+        self.molecular_weight = molecular_weight
+        self.state = state
+        self.extra = extra or None
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> "Compound":
+        """Build from Neo4j node properties"""
+        extra = {k: v for k, v in record.items()
+                 if k not in ("formula", "name", "class", "molecular_weight", "state")}
+        return cls(record["formula"], record.get("name"), record.get("class"),
+                   record.get("molecular_weight"), record.get("state"), extra)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {"formula": self.formula}
+        if self.name is not None:
+            data["name"] = self.name
+        if self.compound_class is not None:
+            data["class"] = self.compound_class
+        if self.molecular_weight is not None:
+            data["molecular_weight"] = self.molecular_weight
+        if self.state is not None:
+            data["state"] = self.state
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def __repr__(self) -> str:
+        return f"Compound({self.formula!r})"
+
+
+class Reaction:
+    """One set of conditions for a reactant -> product conversion"""
+
+    __slots__ = ("reagent", "reaction_type", "temperature", "mechanism", "curriculum", "extra")
+
+    def __init__(self,
+                 reagent: Optional[str] = None,
+                 reaction_type: Optional[str] = None,
+                 temperature: Any = None,
+                 mechanism: Optional[str] = None,
+                 curriculum: Optional[bool] = None,
+                 extra: Optional[Dict[str, Any]] = None):
+        self.reagent = sys.intern(reagent) if isinstance(reagent, str) else reagent
+        self.reaction_type = sys.intern(reaction_type) if isinstance(reaction_type, str) else reaction_type
+        self.temperature = temperature
+        self.mechanism = mechanism
+        self.curriculum = curriculum
+        self.extra = extra or None
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> "Reaction":
+        """Build from Neo4j relationship properties"""
+        extra = {k: v for k, v in record.items()
+                 if k not in ("reagent", "type", "temperature", "mechanism", "curriculum")}
+        return cls(record.get("reagent"), record.get("type"), record.get("temperature"),
+                   record.get("mechanism"), record.get("curriculum"), extra)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {}
+        if self.reagent is not None:
+            data["reagent"] = self.reagent
+        if self.reaction_type is not None:
+            data["type"] = self.reaction_type
+        if self.temperature is not None:
+            data["temperature"] = self.temperature
+        if self.mechanism is not None:
+            data["mechanism"] = self.mechanism
+        if self.curriculum is not None:
+            data["curriculum"] = self.curriculum
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def __repr__(self) -> str:
+        return f"Reaction({self.reagent!r})"
+
+
+class Route:
+    """
+    A reaction path. Compounds are referenced by formula so many routes can
+    share one compound table; each step holds its alternative Reactions.
+    """
+
+    __slots__ = ("compounds", "steps")
+
+    def __init__(self, compounds: Tuple[str, ...], steps: Tuple[Tuple[Reaction, ...], ...]):
+        self.compounds = compounds
+        self.steps = steps
+
+    @property
+    def start(self) -> str:
+        return self.compounds[0]
+
+    @property
+    def end(self) -> str:
+        return self.compounds[-1]
+
+    @property
+    def total_steps(self) -> int:
+        return len(self.steps)
+
+    @property
+    def reactions(self) -> List[Reaction]:
+        return [alternatives[0] for alternatives in self.steps]
+
+    def to_dict(self) -> Dict[str, Any]:
+        reactions = [reaction.to_dict() for reaction in self.reactions]
+        return {
+            "start": self.start,
+            "end": self.end,
+            "compounds": list(self.compounds),
+            "reactions": reactions,
+            "reagents": [reaction.get("reagent") for reaction in reactions],
+            "alternatives": [[r.to_dict() for r in alternatives] for alternatives in self.steps],
+            "total_steps": self.total_steps
+        }
+
+    def __repr__(self) -> str:
+        return f"Route({' -> '.join(self.compounds)})"
+
@@ -0,0 +1,162 @@
+import heapq
+from array import array
+from typing import Optional, Dict, Any, List, Iterable, Tuple
+
+
+class ReactionHypergraph:
+    """Read-only AND-OR view of the reaction network.
+
+    Compounds are OR nodes (any one producing reaction is enough) and reactions
+    are AND nodes (every reactant is needed). Both multi-reactant ``Reaction``
+    entities and plain REACTS_TO edges become hyperedges. Incidence is kept in
+    CSR arrays in both directions so a search never has to scan reactions.
+    """
+
+    def __init__(self,
+                 compounds: List[Dict[str, Any]],
+                 reactions: List[Tuple[List[str], List[str], Dict[str, Any]]],
+                 generation: int = 0):
+        self.generation = generation
+        self.formulas: List[str] = []
+        self.ids: Dict[str, int] = {}
+        self.compounds: List[Dict[str, Any]] = []
+        for compound in compounds:
+            formula = compound["formula"]
+            if formula not in self.ids:
+                self.ids[formula] = len(self.formulas)
+                self.formulas.append(formula)
+                self.compounds.append(compound)
+
+        # Reactions are only usable if every participant is a known compound
+        kept = []
+        for reactants, products, conditions in reactions:
+            reactant_ids = list(dict.fromkeys(self.ids.get(f) for f in reactants))
+            product_ids = list(dict.fromkeys(self.ids.get(f) for f in products))
+            if reactant_ids and product_ids and None not in reactant_ids and None not in product_ids:
+                kept.append((reactant_ids, product_ids, conditions))
+
+        self.reaction_conditions: List[Dict[str, Any]] = [r[2] for r in kept]
+        self.reactant_offsets, self.reactants = self._pack([r[0] for r in kept])
+        self.product_offsets, self.products = self._pack([r[1] for r in kept])
+        self.consumer_offsets, self.consumers = self._invert(self.reactant_offsets, self.reactants)
+        self.producer_offsets, self.producers = self._invert(self.product_offsets, self.products)
+
+    @property
+    def reaction_count(self) -> int:
+        return len(self.reaction_conditions)
+
+    @staticmethod
+    def _pack(rows: List[List[int]]) -> Tuple[array, array]:
+        offsets = array("i", [0])
+        values = array("i")
+        for row in rows:
+            values.extend(row)
+            offsets.append(len(values))
+        return offsets, values
+
+    def _invert(self, offsets: array, values: array) -> Tuple[array, array]:
+        """Build the compound -> reactions incidence from a reaction -> compounds one"""
+        counts = [0] * (len(self.formulas) + 1)
+        for value in values:
+            counts[value + 1] += 1
+        for node_id in range(len(self.formulas)):
+            counts[node_id + 1] += counts[node_id]
+        inverted = array("i", [0] * len(values))
+        cursor = counts[:-1]
+        for reaction_id in range(len(offsets) - 1):
+            for position in range(offsets[reaction_id], offsets[reaction_id + 1]):
+                node_id = values[position]
+                inverted[cursor[node_id]] = reaction_id
+                cursor[node_id] += 1
+        return array("i", counts), inverted
+
+    def reaction_reactants(self, reaction_id: int) -> array:
+        return self.reactants[self.reactant_offsets[reaction_id]:self.reactant_offsets[reaction_id + 1]]
+
+    def reaction_products(self, reaction_id: int) -> array:
+        return self.products[self.product_offsets[reaction_id]:self.product_offsets[reaction_id + 1]]
+
+    def plan(self,
+             target: str,
+             available: Iterable[str],
+             max_steps: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Find the cheapest synthesis of target from the available compounds.
+
+        Best-first search over hyperedges (Knuth's generalisation of Dijkstra):
+        a compound is settled in cost order, and a reaction fires once all of
+        its reactants are settled, costing one step plus its reactants' costs.
+        Returns the synthesis steps in executable order, or None.
+        """
+        target_id = self.ids.get(target)
+        if target_id is None:
+            return None
+
+        cost: Dict[int, int] = {}
+        via: Dict[int, int] = {}
+        settled = bytearray(len(self.formulas))
+        missing = array("i", (self.reactant_offsets[r + 1] - self.reactant_offsets[r]
+                              for r in range(self.reaction_count)))
+        heap = []
+        for formula in available:
+            node_id = self.ids.get(formula)
+            if node_id is not None and node_id not in cost:
+                cost[node_id] = 0
+                heap.append((0, node_id))
+        heapq.heapify(heap)
+
+        while heap:
+            node_cost, node_id = heapq.heappop(heap)
+            if settled[node_id] or node_cost > cost[node_id]:
+                continue
+            settled[node_id] = 1
+            if node_id == target_id:
+                break
+            for position in range(self.consumer_offsets[node_id], self.consumer_offsets[node_id + 1]):
+                reaction_id = self.consumers[position]
+                missing[reaction_id] -= 1
+                if missing[reaction_id]:
+                    continue
+                reaction_cost = 1 + sum(cost[r] for r in self.reaction_reactants(reaction_id))
+                if max_steps is not None and reaction_cost > max_steps:
+                    continue
+                for product in self.reaction_products(reaction_id):
+                    if not settled[product] and reaction_cost < cost.get(product, reaction_cost + 1):
+                        cost[product] = reaction_cost
+                        via[product] = reaction_id
+                        heapq.heappush(heap, (reaction_cost, product))
+
+        if not settled[target_id]:
+            return None
+
+        steps: List[int] = []
+        emitted = set()
+
+        def emit(node_id: int) -> None:
+            reaction_id = via.get(node_id)
+            if reaction_id is None or reaction_id in emitted:
+                return
+            emitted.add(reaction_id)
+            for reactant in self.reaction_reactants(reaction_id):
+                emit(reactant)
+            steps.append(reaction_id)
+
+        emit(target_id)
+        return {
+            "target": target,
+            "starting_materials": sorted({
+                self.formulas[node_id]
+                for reaction_id in steps
+                for node_id in self.reaction_reactants(reaction_id)
+                if node_id not in via
+            }),
+            "steps": [
+                {
+                    "reactants": [self.formulas[r] for r in self.reaction_reactants(reaction_id)],
+                    "products": [self.formulas[p] for p in self.reaction_products(reaction_id)],
+                    "conditions": self.reaction_conditions[reaction_id]
+                }
+                for reaction_id in steps
+            ],
+            "total_steps": len(steps)
+        }
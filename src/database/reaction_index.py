@@ -0,0 +1,753 @@
+import re
+import threading
+from array import array
+from collections import deque
+from typing import Optional, Dict, Any, List, Iterable, Iterator, Tuple, Set, Union
+from src.database.models import Compound, Reaction, Route
+from src.database.deadline import Deadline, DeadlineExceeded
+from src.database.graph_algorithms import (
+    strongly_connected_components, weakly_connected_components, transitive_closure
+)
+
+# Edge flag bit 0 marks curriculum reactions; reagent and type bits follow
+CURRICULUM_FLAG = 1
+
+# Landmark bounds replace the reverse BFS for queries with at most this many targets
+LANDMARK_MAX_TARGETS = 4
+
+# Above this many (source, target) component pairs the reachability pre-check
+# is skipped and the search prunes on its own
+MAX_REACHABILITY_PAIRS = 4096
+
+# Guards the lazily extended walk counts of every snapshot (a module lock
+# rather than one per snapshot, so snapshots stay picklable)
+_walks_lock = threading.Lock()
+
+# Attributes of a snapshot that are not pickled (see ReactionIndex.__getstate__)
+_UNPICKLED = ("landmarks", "hierarchy", "_walks", "_compiled", "_reverse_offsets", "_reverse_edges")
+
+# Searches poll their deadline once per this many expanded compounds
+DEADLINE_CHECK_INTERVAL = 256
+
+# Snapshots with at most this many strongly connected components get an exact
+# reachability bitset per component (about count²/8 bytes, 50 MB at the limit)
+CLOSURE_MAX_COMPONENTS = 20000
+
+TEMPERATURE_KEYWORDS = {
+    "room temperature": 25.0,
+    "rt": 25.0,
+    "heat": 100.0,
+    "reflux": 100.0,
+}
+# A minus sign right after a digit is a range dash ("0-5"), not a sign
+_TEMPERATURE_NUMBER = re.compile(r"(?<![\d.])-?\d+(?:\.\d+)?")
+# "+" only separates reagents with spaces around it, so "H+" keeps its charge
+_REAGENT_SEPARATORS = re.compile(r"[/,;]|\s+\+\s+")
+
+
+def parse_temperature(value: Any) -> Optional[float]:
+    """Best-effort temperature in °C; ranges such as "0-5°C" or "-10 to -5" give the upper bound"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip().lower()
+    if text in TEMPERATURE_KEYWORDS:
+        return TEMPERATURE_KEYWORDS[text]
+    numbers = _TEMPERATURE_NUMBER.findall(text.replace("–", " "))
+    if not numbers:
+        return None
+    return max(float(n) for n in numbers)
+
+
+def reagent_components(reagent: Any) -> List[str]:
+    """Split a reagent string like "NaNO2/HCl, H2O + heat" into its individual reagents"""
+    if not reagent:
+        return []
+    text = str(reagent)
+    parts = [part.strip() for part in _REAGENT_SEPARATORS.split(text)]
+    return list(dict.fromkeys([text] + [part for part in parts if part]))
+
+
+class ReactionIndex:
+    """Read-only in-memory snapshot of the REACTS_TO graph used for route search.
+
+    Compounds are numbered 0..n-1 and the outgoing reactions of compound ``i``
+    occupy ``edge_targets[offsets[i]:offsets[i + 1]]`` (CSR layout), so the
+    position of a reaction in that array doubles as its edge id.
+
+    Parallel reactions between the same two compounds (e.g. ethanol to
+    acetaldehyde with K2Cr2O7/H+ or CuO) collapse into one edge whose
+    alternative conditions sit in ``alternatives[alternative_offsets[e]:
+    alternative_offsets[e + 1]]``, so a search expands each pair only once.
+
+    The strongly connected components are condensed into a DAG whose
+    reachability labels (see may_reach) prove in O(1) that most unreachable
+    pairs have no route, without searching. Unless the graph is very large,
+    a bitset transitive closure over that DAG makes the answer exact.
+    """
+
+    def __init__(self,
+                 compounds: List[Union[Compound, Dict[str, Any]]],
+                 reactions: List[Tuple[str, str, Dict[str, Any]]],
+                 generation: int = 0,
+                 closure_limit: int = CLOSURE_MAX_COMPONENTS):
+        self.generation = generation
+        self.formulas: List[str] = []
+        self.ids: Dict[str, int] = {}
+        self.compounds: List[Compound] = []
+        self.classes: Dict[str, List[int]] = {}
+
+        for compound in compounds:
+            if not isinstance(compound, Compound):
+                compound = Compound.from_record(compound)
+            if compound.formula in self.ids:
+                continue
+            node_id = len(self.formulas)
+            self.ids[compound.formula] = node_id
+            self.formulas.append(compound.formula)
+            self.compounds.append(compound)
+            if compound.compound_class:
+                self.classes.setdefault(compound.compound_class, []).append(node_id)
+
+        # Reactions whose endpoints are not compounds cannot be traversed
+        grouped: Dict[Tuple[int, int], List[Dict[str, Any]]] = {}
+        for reactant, product, conditions in reactions:
+            if reactant in self.ids and product in self.ids:
+                alternatives = grouped.setdefault((self.ids[reactant], self.ids[product]), [])
+                if conditions not in alternatives:
+                    alternatives.append(conditions)
+        edges = sorted(grouped.items(), key=lambda edge: edge[0][0])
+
+        self.offsets = array("i", [0] * (len(self.formulas) + 1))
+        self.edge_sources = array("i", (pair[0] for pair, _ in edges))
+        self.edge_targets = array("i", (pair[1] for pair, _ in edges))
+        self.alternative_offsets = array("i", [0])
+        self.alternatives: List[Reaction] = []
+        for (source, _), alternatives in edges:
+            self.offsets[source + 1] += 1
+            self.alternatives.extend(Reaction.from_record(conditions) for conditions in alternatives)
+            self.alternative_offsets.append(len(self.alternatives))
+        for node_id in range(len(self.formulas)):
+            self.offsets[node_id + 1] += self.offsets[node_id]
+
+        self._reverse_offsets = None
+        self._reverse_edges = None
+        # Optional LandmarkIndex and ContractionHierarchy attached by the owner of the snapshot
+        self.landmarks = None
+        self.hierarchy = None
+        self._condense()
+        # Exact reachability per component, or None on very large graphs
+        self.closure: Optional[List[int]] = None
+        if self.component_count <= closure_limit:
+            self.closure = transitive_closure(self.component_count, self.dag_offsets, self.dag_targets)
+        self._compile_alternative_flags()
+        self._compiled: Dict[Tuple, Optional[Tuple[bytearray, bytearray]]] = {}
+        # _walks[k][v]: walks of at most k steps from v, filled in on demand
+        self._walks: List[array] = [array("d", [1.0]) * len(self.formulas)]
+
+    @property
+    def node_count(self) -> int:
+        return len(self.formulas)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.edge_targets)
+
+    def edge_alternatives(self, edge_id: int) -> List[Reaction]:
+        return self.alternatives[self.alternative_offsets[edge_id]:self.alternative_offsets[edge_id + 1]]
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """
+        Pickle the graph, compound table and reachability labels for batch
+        workers, leaving out the attached landmarks and hierarchy and the
+        caches that are rebuilt on demand
+        """
+        state = self.__dict__.copy()
+        for name in _UNPICKLED:
+            del state[name]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self.landmarks = None
+        self.hierarchy = None
+        self._reverse_offsets = None
+        self._reverse_edges = None
+        self._compiled = {}
+        self._walks = [array("d", [1.0]) * self.node_count]
+
+    def resolve(self,
+                formulas: Optional[Iterable[str]] = None,
+                compound_class: Optional[str] = None) -> List[int]:
+        """Map formulas and/or a class selector to compound ids, skipping unknown formulas"""
+        node_ids = []
+        seen = set()
+        for formula in formulas or ():
+            node_id = self.ids.get(formula)
+            if node_id is not None and node_id not in seen:
+                seen.add(node_id)
+                node_ids.append(node_id)
+        if compound_class:
+            for node_id in self.classes.get(compound_class, ()):
+                if node_id not in seen:
+                    seen.add(node_id)
+                    node_ids.append(node_id)
+        return node_ids
+
+    def _condense(self) -> None:
+        """
+        Build the SCC condensation DAG and its reachability labels.
+
+        Tarjan numbers components in reverse topological order (every DAG
+        edge goes from a higher number to a lower one), so that number is one
+        reverse topological rank; a second rank comes from Kahn's algorithm
+        run from the sinks with a LIFO queue. For each rank, ``low`` is the
+        smallest rank reachable from a component. If c reaches d, then
+        [low[d], rank[d]] lies inside [low[c], rank[c]] for both ranks and
+        both are in the same weakly connected component; a pair failing any
+        of these tests has no route.
+        """
+        component, count = strongly_connected_components(
+            self.node_count, self.offsets, self.edge_targets)
+        self.component = component
+        self.component_count = count
+
+        successors: List[Set[int]] = [set() for _ in range(count)]
+        for edge_id, target in enumerate(self.edge_targets):
+            a, b = component[self.edge_sources[edge_id]], component[target]
+            if a != b:
+                successors[a].add(b)
+        self.dag_offsets = array("i", [0])
+        self.dag_targets = array("i")
+        for targets in successors:
+            self.dag_targets.extend(sorted(targets))
+            self.dag_offsets.append(len(self.dag_targets))
+
+        # Second reverse topological rank: sinks first, last discovered first
+        out_degree = [len(targets) for targets in successors]
+        predecessors: List[List[int]] = [[] for _ in range(count)]
+        for c, targets in enumerate(successors):
+            for d in targets:
+                predecessors[d].append(c)
+        second = array("i", [0] * count)
+        stack = [c for c in range(count) if not out_degree[c]]
+        rank = 0
+        while stack:
+            c = stack.pop()
+            second[c] = rank
+            rank += 1
+            for p in predecessors[c]:
+                out_degree[p] -= 1
+                if not out_degree[p]:
+                    stack.append(p)
+
+        low = array("i", range(count))
+        second_low = array("i", second)
+        # Ascending Tarjan number visits every successor before its predecessors
+        for c in range(count):
+            for d in successors[c]:
+                if low[d] < low[c]:
+                    low[c] = low[d]
+                if second_low[d] < second_low[c]:
+                    second_low[c] = second_low[d]
+        self._labels = (low, second, second_low)
+        self.topological_order = array("i", range(count - 1, -1, -1))
+
+        weak, _ = weakly_connected_components(
+            count,
+            [c for c in range(count) for _ in successors[c]],
+            [d for c in range(count) for d in successors[c]]
+        )
+        self._weak = weak
+
+    def component_may_reach(self, c: int, d: int) -> bool:
+        """False when component c provably cannot reach component d (exact with the closure)"""
+        if c == d:
+            return True
+        if self.closure is not None:
+            return bool(self.closure[c] >> d & 1)
+        low, second, second_low = self._labels
+        return (
+            low[c] <= low[d] and d < c
+            and second_low[c] <= second_low[d] and second[d] < second[c]
+            and self._weak[c] == self._weak[d]
+        )
+
+    def may_reach(self, source: int, target: int) -> bool:
+        """
+        False when no route from source to target exists, whatever its
+        length. With the closure built, True means a route exists.
+        """
+        return self.component_may_reach(self.component[source], self.component[target])
+
+    def any_may_reach(self, sources: Iterable[int], targets: Iterable[int]) -> bool:
+        """
+        False when no source can reach any target. Large selections are not
+        checked pairwise and count as reachable, unless the closure is built:
+        then the sources' bitsets are OR-ed and each target is one bit test.
+        """
+        component = self.component
+        source_components = {component[s] for s in sources}
+        target_components = {component[t] for t in targets}
+        if self.closure is not None:
+            reach = 0
+            for c in source_components:
+                reach |= self.closure[c]
+            return any(reach >> d & 1 for d in target_components)
+        if len(source_components) * len(target_components) > MAX_REACHABILITY_PAIRS:
+            return True
+        return any(
+            self.component_may_reach(c, d)
+            for c in source_components for d in target_components
+        )
+
+    def distance(self, source: int, target: int, max_depth: Optional[int] = None) -> Optional[int]:
+        """
+        Fewest reaction steps from source to target, or None when there is no
+        route (of at most max_depth steps, if given). Unreachable pairs are
+        answered from the closure without searching.
+        """
+        if source == target:
+            return 0
+        if not self.may_reach(source, target):
+            return None
+        if self.hierarchy is not None:
+            found = self.hierarchy.shortest(self.formulas[source], self.formulas[target], max_depth)
+            return found[0] if found else None
+        return self.distances_to([target], max_depth or self.node_count, sources=[source]).get(source)
+
+    def reachable(self, source: int, target: int, max_depth: Optional[int] = None) -> bool:
+        """Whether target can be made from source (within max_depth steps, if given)"""
+        if max_depth is None and self.closure is not None:
+            return self.may_reach(source, target)
+        return self.distance(source, target, max_depth) is not None
+
+    def _compile_alternative_flags(self) -> None:
+        """Encode each reaction's curriculum flag, reagents and type as one bitmask"""
+        self.reagent_bits: Dict[str, int] = {}
+        self.type_bits: Dict[str, int] = {}
+        next_bit = 1
+        self.alternative_flags: List[int] = []
+        self.alternative_temperatures = array("d")
+
+        for reaction in self.alternatives:
+            flags = CURRICULUM_FLAG if reaction.curriculum else 0
+            for reagent in reagent_components(reaction.reagent):
+                if reagent not in self.reagent_bits:
+                    self.reagent_bits[reagent] = 1 << next_bit
+                    next_bit += 1
+                flags |= self.reagent_bits[reagent]
+            reaction_type = reaction.reaction_type
+            if reaction_type:
+                if reaction_type not in self.type_bits:
+                    self.type_bits[reaction_type] = 1 << next_bit
+                    next_bit += 1
+                flags |= self.type_bits[reaction_type]
+            self.alternative_flags.append(flags)
+            temperature = parse_temperature(reaction.temperature)
+            self.alternative_temperatures.append(float("nan") if temperature is None else temperature)
+
+    def _walk_counts(self, depth: int) -> array:
+        """Number of walks of at most depth steps (including staying put) from each compound"""
+        with _walks_lock:
+            while len(self._walks) <= depth:
+                previous = self._walks[-1]
+                offsets, edge_targets = self.offsets, self.edge_targets
+                walks = array("d", [1.0]) * self.node_count
+                for node_id in range(self.node_count):
+                    total = 1.0
+                    for edge_id in range(offsets[node_id], offsets[node_id + 1]):
+                        total += previous[edge_targets[edge_id]]
+                    walks[node_id] = total
+                self._walks.append(walks)
+            return self._walks[depth]
+
+    def estimate_routes(self, sources: Iterable[int], targets: Iterable[int], max_depth: int) -> int:
+        """
+        Predicted cost of find_routes: the number of partial routes of up to
+        max_depth steps from the sources, from per-compound walk counts
+        that are computed once per snapshot. It is an upper bound, since
+        constraints and the distance bounds only ever prune; 0 when no
+        target is reachable at all.
+        """
+        sources = set(sources)
+        if max_depth < 1 or not self.any_may_reach(sources, targets):
+            return 0
+        walks = self._walk_counts(max_depth)
+        return int(sum(walks[source] - 1 for source in sources))
+
+    def shortest_depth(self,
+                       sources: Iterable[int],
+                       targets: Iterable[int],
+                       max_depth: int,
+                       edge_mask: Optional[bytearray] = None,
+                       deadline: Optional[Deadline] = None) -> Optional[int]:
+        """Fewest steps from any source to any target, up to max_depth, or None"""
+        sources = list(sources)
+        targets = list(targets)
+        if not self.any_may_reach(sources, targets):
+            return None
+        distances = self.distances_to(targets, max_depth, edge_mask, sources, deadline)
+        best = None
+        for source in sources:
+            depth = distances.get(source)
+            if depth == 0:
+                # A source that is also a target needs a route of at least one step
+                depth = None
+                for edge_id in range(self.offsets[source], self.offsets[source + 1]):
+                    if edge_mask is not None and not edge_mask[edge_id]:
+                        continue
+                    after = distances.get(self.edge_targets[edge_id])
+                    if after is not None and after < max_depth and (depth is None or after + 1 < depth):
+                        depth = after + 1
+            if depth is not None and (best is None or depth < best):
+                best = depth
+        return best
+
+    def compile_constraints(self, constraints: Optional[Dict[str, Any]]) -> Optional[bytearray]:
+        """
+        Compile reaction constraints into a per-edge allow mask for the search.
+
+        Supported keys: exclude_reagents, reaction_types, max_temperature and
+        curriculum_only. Reactions with an unknown temperature are kept, and an
+        edge is allowed when any of its alternative conditions is. The mask is
+        computed once per distinct set of constraints and reused, so filtering
+        costs one byte lookup per expanded edge. Returns None when nothing is
+        filtered.
+        """
+        compiled = self._compile(constraints)
+        return compiled[0] if compiled else None
+
+    def _compile(self, constraints: Optional[Dict[str, Any]]) -> Optional[Tuple[bytearray, bytearray]]:
+        """Build (edge mask, alternative mask) for a constraint set"""
+        if not constraints:
+            return None
+        exclude = tuple(sorted(set(constraints.get("exclude_reagents") or ())))
+        types = tuple(sorted(set(constraints.get("reaction_types") or ())))
+        max_temperature = constraints.get("max_temperature")
+        curriculum_only = bool(constraints.get("curriculum_only"))
+        key = (exclude, types, max_temperature, curriculum_only)
+        if not (exclude or types or max_temperature is not None or curriculum_only):
+            return None
+        if key in self._compiled:
+            return self._compiled[key]
+
+        forbidden = 0
+        for reagent in exclude:
+            forbidden |= self.reagent_bits.get(reagent, 0)
+        allowed_types = 0
+        for reaction_type in types:
+            allowed_types |= self.type_bits.get(reaction_type, 0)
+        required = CURRICULUM_FLAG if curriculum_only else 0
+
+        alternative_mask = bytearray(len(self.alternatives))
+        temperatures = self.alternative_temperatures
+        for alternative_id, flags in enumerate(self.alternative_flags):
+            if flags & forbidden or (flags & required) != required:
+                continue
+            if types and not flags & allowed_types:
+                continue
+            if max_temperature is not None and temperatures[alternative_id] > max_temperature:
+                continue
+            alternative_mask[alternative_id] = 1
+
+        offsets = self.alternative_offsets
+        edge_mask = bytearray(self.edge_count)
+        for edge_id in range(self.edge_count):
+            if any(alternative_mask[offsets[edge_id]:offsets[edge_id + 1]]):
+                edge_mask[edge_id] = 1
+        self._compiled[key] = (edge_mask, alternative_mask)
+        return self._compiled[key]
+
+    def _build_reverse(self) -> None:
+        counts = [0] * (self.node_count + 1)
+        for target in self.edge_targets:
+            counts[target + 1] += 1
+        for node_id in range(self.node_count):
+            counts[node_id + 1] += counts[node_id]
+        reverse_edges = array("i", [0] * self.edge_count)
+        cursor = counts[:-1]
+        for edge_id, target in enumerate(self.edge_targets):
+            reverse_edges[cursor[target]] = edge_id
+            cursor[target] += 1
+        self._reverse_offsets = array("i", counts)
+        self._reverse_edges = reverse_edges
+
+    def distances_to(self,
+                     targets: Iterable[int],
+                     max_depth: int,
+                     edge_mask: Optional[bytearray] = None,
+                     sources: Optional[Iterable[int]] = None,
+                     deadline: Optional[Deadline] = None) -> Dict[int, int]:
+        """
+        Hop distance from every compound to the nearest target (a super-sink),
+        up to max_depth. Given a few sources (any number with the closure),
+        compounds that none of them can reach are left out, so the search
+        stays between sources and targets. Raises DeadlineExceeded once the
+        deadline, if given, has passed.
+        """
+        if self._reverse_offsets is None:
+            self._build_reverse()
+        offsets, reverse_edges = self._reverse_offsets, self._reverse_edges
+        edge_sources = self.edge_sources
+        component = self.component
+        source_components = None
+        if sources is not None:
+            source_components = list({component[s] for s in sources})
+            if self.closure is None and len(source_components) > 16:
+                source_components = None
+        reachable: Dict[int, bool] = {}
+        source_reach = None
+        if source_components is not None and self.closure is not None:
+            # One bitset for all sources; bit c says whether c is reachable
+            source_reach = 0
+            for c in source_components:
+                source_reach |= self.closure[c]
+
+        distances = {}
+        queue = deque()
+        for target in targets:
+            if target not in distances:
+                distances[target] = 0
+                queue.append(target)
+        visited = 0
+        while queue:
+            node_id = queue.popleft()
+            visited += 1
+            if deadline is not None and not visited % DEADLINE_CHECK_INTERVAL:
+                deadline.check()
+            depth = distances[node_id]
+            if depth >= max_depth:
+                continue
+            for position in range(offsets[node_id], offsets[node_id + 1]):
+                edge_id = reverse_edges[position]
+                if edge_mask is not None and not edge_mask[edge_id]:
+                    continue
+                source = edge_sources[edge_id]
+                if source in distances:
+                    continue
+                if source_components is not None:
+                    c = component[source]
+                    if c not in reachable:
+                        if source_reach is not None:
+                            reachable[c] = bool(source_reach >> c & 1)
+                        else:
+                            reachable[c] = any(
+                                self.component_may_reach(s, c) for s in source_components)
+                    if not reachable[c]:
+                        continue
+                distances[source] = depth + 1
+                queue.append(source)
+        return distances
+
+    def find_routes(self,
+                    sources: Iterable[int],
+                    targets: Iterable[int],
+                    max_depth: int,
+                    routes_per_pair: Optional[int] = None,
+                    edge_mask: Optional[bytearray] = None,
+                    stats: Optional[Dict[str, int]] = None,
+                    deadline: Optional[Deadline] = None,
+                    partial: bool = False) -> List[Tuple[int, ...]]:
+        """Enumerate routes from any source to any target in a single search.
+
+        A reverse BFS from a virtual super-sink joined to every target gives a
+        lower bound on the remaining steps from each compound, which prunes the
+        forward expansion from the (virtual super-) source for every pair at
+        once. Routes never reuse a reaction, matching Cypher's variable length
+        pattern semantics. Each route is returned as a tuple of edge ids,
+        shortest first; ``routes_per_pair`` keeps only the best routes for every
+        (start, end) pair. Reactions not allowed by ``edge_mask`` (see
+        compile_constraints) are never expanded.
+
+        With landmarks attached and only a few targets, their lower bounds
+        (see LandmarkIndex) are computed lazily for the compounds the search
+        reaches instead of running the reverse BFS. ``stats``, if given,
+        receives the number of compounds expanded and bounds evaluated.
+
+        A single shortest route between two compounds, without constraints,
+        comes from the attached ContractionHierarchy when there is one.
+
+        The search polls ``deadline`` as it goes. When it expires (or is
+        cancelled) DeadlineExceeded is raised, or with ``partial`` the routes
+        found so far are returned and stats["truncated"] is set.
+        """
+        target_set: Set[int] = set(targets)
+        sources = list(dict.fromkeys(sources))
+        if not target_set or max_depth < 1 or not self.any_may_reach(sources, target_set):
+            return []
+        if (self.hierarchy is not None and routes_per_pair == 1 and edge_mask is None
+                and len(sources) == 1 and len(target_set) == 1 and sources[0] not in target_set):
+            route = self.hierarchy.route(self, sources[0], next(iter(target_set)), max_depth)
+            return [route] if route else []
+        if stats is not None:
+            stats["truncated"] = False
+        if self.landmarks is not None and len(target_set) <= LANDMARK_MAX_TARGETS:
+            remaining = self.landmarks.bounds(target_set)
+        else:
+            try:
+                remaining = self.distances_to(target_set, max_depth, edge_mask, sources, deadline)
+            except DeadlineExceeded:
+                if not partial:
+                    raise
+                if stats is not None:
+                    stats["truncated"] = True
+                return []
+        routes: List[Tuple[int, ...]] = []
+        expanded = [0]
+        try:
+            self._expand_routes(sources, target_set, remaining, max_depth, edge_mask,
+                                deadline, routes, expanded)
+        except DeadlineExceeded:
+            if not partial:
+                raise
+            if stats is not None:
+                stats["truncated"] = True
+        if stats is not None:
+            stats["expanded"] = expanded[0]
+            stats["bounds"] = remaining.evaluated if hasattr(remaining, "evaluated") else len(remaining)
+
+        routes.sort(key=len)
+        if routes_per_pair is None:
+            return routes
+
+        return self._per_pair(routes, routes_per_pair, {})
+
+    def routes_by_depth(self,
+                        sources: Iterable[int],
+                        targets: Iterable[int],
+                        max_depth: int,
+                        limit: Optional[int] = None,
+                        routes_per_pair: Optional[int] = None,
+                        edge_mask: Optional[bytearray] = None,
+                        deadline: Optional[Deadline] = None
+                        ) -> Iterator[Tuple[int, List[Tuple[int, ...]]]]:
+        """
+        Iterative deepening version of find_routes: yields (depth, routes)
+        with every route of exactly that many steps, shortest depth first,
+        as soon as that depth has been searched. Depths without routes are
+        skipped. It stops after ``limit`` routes in total, so the first
+        answer costs a search to the true shortest distance rather than to
+        max_depth. The lower bounds come from one reverse BFS (or the
+        landmarks) shared by every depth. DeadlineExceeded ends the iteration.
+        """
+        target_set: Set[int] = set(targets)
+        sources = list(dict.fromkeys(sources))
+        if not target_set or max_depth < 1 or not self.any_may_reach(sources, target_set):
+            return
+        if self.landmarks is not None and len(target_set) <= LANDMARK_MAX_TARGETS:
+            remaining = self.landmarks.bounds(target_set)
+        else:
+            remaining = self.distances_to(target_set, max_depth, edge_mask, sources, deadline)
+        bounds = [remaining.get(source) for source in sources if source in remaining]
+        if not bounds:
+            return
+        found = 0
+        per_pair: Dict[Tuple[int, int], int] = {}
+        expanded = [0]
+        for depth in range(max(1, min(bounds)), max_depth + 1):
+            routes: List[Tuple[int, ...]] = []
+            self._expand_routes(sources, target_set, remaining, depth, edge_mask, deadline,
+                                routes, expanded, exact=True,
+                                limit=None if limit is None or routes_per_pair else limit - found)
+            if routes_per_pair is not None:
+                routes = self._per_pair(routes, routes_per_pair, per_pair)
+            if limit is not None:
+                routes = routes[:limit - found]
+            if routes:
+                found += len(routes)
+                yield depth, routes
+            if limit is not None and found >= limit:
+                return
+
+    def _per_pair(self,
+                  routes: List[Tuple[int, ...]],
+                  routes_per_pair: int,
+                  per_pair: Dict[Tuple[int, int], int]) -> List[Tuple[int, ...]]:
+        """Keep routes while their (start, end) pair, counted in per_pair, is under the quota"""
+        kept = []
+        for route in routes:
+            pair = (self.edge_sources[route[0]], self.edge_targets[route[-1]])
+            if per_pair.get(pair, 0) < routes_per_pair:
+                per_pair[pair] = per_pair.get(pair, 0) + 1
+                kept.append(route)
+        return kept
+
+    def _expand_routes(self,
+                       sources: List[int],
+                       target_set: Set[int],
+                       remaining,
+                       max_depth: int,
+                       edge_mask: Optional[bytearray],
+                       deadline: Optional[Deadline],
+                       routes: List[Tuple[int, ...]],
+                       expanded: List[int],
+                       exact: bool = False,
+                       limit: Optional[int] = None) -> None:
+        """
+        Depth-first route enumeration pruned by the lower bounds in
+        ``remaining``, appending to ``routes`` (so they survive a
+        DeadlineExceeded) and counting expansions in ``expanded[0]``. With
+        ``exact`` only routes of exactly max_depth steps are kept, and the
+        search stops once ``limit`` routes have been collected.
+        """
+        offsets, edge_targets = self.offsets, self.edge_targets
+        path: List[int] = []
+        used: Set[int] = set()
+
+        def expand(node_id: int) -> None:
+            expanded[0] += 1
+            if deadline is not None and not expanded[0] % DEADLINE_CHECK_INTERVAL:
+                deadline.check()
+            depth = len(path)
+            for edge_id in range(offsets[node_id], offsets[node_id + 1]):
+                if limit is not None and len(routes) >= limit:
+                    return
+                if edge_id in used or (edge_mask is not None and not edge_mask[edge_id]):
+                    continue
+                product = edge_targets[edge_id]
+                bound = remaining.get(product)
+                if bound is None or depth + 1 + bound > max_depth:
+                    continue
+                path.append(edge_id)
+                if product in target_set and (not exact or depth + 1 == max_depth):
+                    routes.append(tuple(path))
+                if depth + 1 < max_depth:
+                    used.add(edge_id)
+                    expand(product)
+                    used.discard(edge_id)
+                path.pop()
+
+        for source in sources:
+            if source in remaining:
+                expand(source)
+
+    def describe_route(self,
+                       route: Tuple[int, ...],
+                       constraints: Optional[Dict[str, Any]] = None) -> Route:
+        """
+        Turn a route of edge ids into a Route. Each step keeps the alternative
+        conditions allowed by the constraints, the first being the default.
+        """
+        compiled = self._compile(constraints)
+        compounds = (self.formulas[self.edge_sources[route[0]]],) + tuple(
+            self.formulas[self.edge_targets[edge_id]] for edge_id in route)
+        steps = []
+        for edge_id in route:
+            start, stop = self.alternative_offsets[edge_id], self.alternative_offsets[edge_id + 1]
+            steps.append(tuple(
+                self.alternatives[alternative_id]
+                for alternative_id in range(start, stop)
+                if compiled is None or compiled[1][alternative_id]
+            ))
+        return Route(compounds, tuple(steps))
+
+    def compound_table(self, routes: Iterable[Route]) -> Dict[str, Dict[str, Any]]:
+        """The shared {formula: compound} table referenced by a set of routes"""
+        table = {}
+        for route in routes:
+            for formula in route.compounds:
+                if formula not in table and formula in self.ids:
+                    table[formula] = self.compounds[self.ids[formula]].to_dict()
+        return table
@@ -0,0 +1,234 @@
+import json
+import time
+import uuid
+import logging
+import sqlite3
+import threading
+from typing import Optional, Dict, Any, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(RuntimeError):
+    """Raised when a write is submitted while the queue is at its maximum depth"""
+
+
+class WriteQueue:
+    """
+    Durable write-behind queue for compound and reaction submissions.
+
+    Submissions are stored in a local SQLite file and acknowledged with a
+    ticket. A background worker drains them in batches: repeated writes of the
+    same compound, or of the same reactant -> product conversion with the same
+    reagent, are coalesced, and each batch is written with one
+    ChemicalGraph.add_batch transaction. Writes are MERGEs, so a batch that is
+    replayed after a crash leaves the graph unchanged.
+    """
+
+    def __init__(self,
+                 path: str,
+                 max_depth: int = 10000,
+                 batch_size: int = 500,
+                 flush_interval: float = 0.5,
+                 max_attempts: int = 3,
+                 retention: float = 3600):
+        self.path = path
+        self.max_depth = max_depth
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._wakeup = threading.Event()
+        self._worker = None
+
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS writes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                ticket TEXT NOT NULL UNIQUE,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                submitted REAL NOT NULL,
+                completed REAL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS writes_status ON writes (status, seq)")
+        self._depth = self._db.execute(
+            "SELECT count(*) FROM writes WHERE status = 'queued'").fetchone()[0]
+
+    @property
+    def depth(self) -> int:
+        """Number of submissions waiting to be written"""
+        return self._depth
+
+    def submit(self, kind: str, payload: Dict[str, Any]) -> str:
+        """Queue a "compound" or "reaction" write and return its ticket"""
+        if kind not in ("compound", "reaction"):
+            raise ValueError(f"Unknown write kind: {kind}")
+        ticket = uuid.uuid4().hex
+        with self._lock:
+            if self._depth >= self.max_depth:
+                raise QueueFullError(f"Write queue is full ({self._depth} pending writes)")
+            self._db.execute(
+                "INSERT INTO writes (ticket, kind, payload, status, submitted) "
+                "VALUES (?, ?, ?, 'queued', ?)",
+                (ticket, kind, json.dumps(payload), time.time())
+            )
+            self._depth += 1
+        if self._depth >= self.batch_size:
+            self._wakeup.set()
+        return ticket
+
+    def status(self, ticket: str) -> Optional[Dict[str, Any]]:
+        """State of a submission, or None for an unknown (or expired) ticket"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT seq, kind, status, error, submitted, completed FROM writes WHERE ticket = ?",
+                (ticket,)
+            ).fetchone()
+            if row is None:
+                return None
+            seq, kind, state, error, submitted, completed = row
+            result = {
+                "ticket": ticket,
+                "kind": kind,
+                "status": state,
+                "submitted": submitted,
+                "completed": completed
+            }
+            if error:
+                result["error"] = error
+            if state == "queued":
+                result["position"] = self._db.execute(
+                    "SELECT count(*) FROM writes WHERE status = 'queued' AND seq < ?", (seq,)
+                ).fetchone()[0]
+            return result
+
+    def _finish(self, outcomes: List[Tuple[int, str, Optional[str]]]) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "UPDATE writes SET status = ?, error = ?, completed = ? WHERE seq = ?",
+                [(state, error, now, seq) for seq, state, error in outcomes]
+            )
+            self._db.execute("COMMIT")
+            self._depth -= len(outcomes)
+
+    def _write(self, graph, rows: List[Tuple[int, str, Dict[str, Any]]]) -> None:
+        """Write rows as one coalesced batch and record each ticket's outcome"""
+        compounds: Dict[str, Dict[str, Any]] = {}
+        reactions: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        reaction_seqs: Dict[Tuple[str, str, str], List[int]] = {}
+        outcomes = []
+        for seq, kind, payload in rows:
+            if kind == "compound":
+                compounds.setdefault(payload["formula"], {}).update(payload.get("properties") or {})
+                outcomes.append((seq, "done", None))
+            else:
+                conditions = payload.get("conditions") or {}
+                key = (payload["reactant"], payload["product"], conditions.get("reagent") or "")
+                reactions.setdefault(key, {}).update(conditions)
+                reaction_seqs.setdefault(key, []).append(seq)
+
+        written = graph.add_batch(
+            list(compounds.items()),
+            [(reactant, product, conditions)
+             for (reactant, product, _), conditions in reactions.items()]
+        )
+        for key, ok in zip(reactions, written):
+            for seq in reaction_seqs[key]:
+                if ok:
+                    outcomes.append((seq, "done", None))
+                else:
+                    outcomes.append((seq, "failed", "Reactant or product compound not found"))
+        self._finish(outcomes)
+
+    def drain_once(self, graph) -> int:
+        """Write the next batch of queued submissions; returns how many were taken"""
+        with self._lock:
+            rows = [
+                (seq, kind, json.loads(payload))
+                for seq, kind, payload in self._db.execute(
+                    "SELECT seq, kind, payload FROM writes WHERE status = 'queued' "
+                    "ORDER BY seq LIMIT ?", (self.batch_size,)
+                )
+            ]
+        if not rows:
+            return 0
+
+        try:
+            self._write(graph, rows)
+            return len(rows)
+        except Exception as e:
+            logger.error(f"Error writing batch of {len(rows)} queued writes: {str(e)}")
+            if not graph.is_ready:
+                # The connection dropped; keep everything queued for later
+                raise
+
+        # Isolate the submission that broke the batch by retrying one at a time
+        for row in rows:
+            try:
+                self._write(graph, [row])
+            except Exception as e:
+                self._record_failure(row[0], str(e))
+        return len(rows)
+
+    def _record_failure(self, seq: int, error: str) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE writes SET attempts = attempts + 1, error = ? WHERE seq = ?", (error, seq))
+            attempts = self._db.execute(
+                "SELECT attempts FROM writes WHERE seq = ?", (seq,)).fetchone()[0]
+        if attempts >= self.max_attempts:
+            self._finish([(seq, "failed", error)])
+
+    def purge(self) -> int:
+        """Forget finished submissions older than the retention period"""
+        with self._lock:
+            cursor = self._db.execute(
+                "DELETE FROM writes WHERE status != 'queued' AND completed < ?",
+                (time.time() - self.retention,)
+            )
+            return cursor.rowcount
+
+    def start(self, graph) -> threading.Thread:
+        """Start draining the queue into graph on a daemon thread"""
+        def run():
+            delay = self.flush_interval
+            last_purge = time.monotonic()
+            while not self._stopped.is_set():
+                taken = 0
+                if graph.is_ready:
+                    try:
+                        taken = self.drain_once(graph)
+                        delay = self.flush_interval
+                    except Exception:
+                        delay = min(delay * 2, 30)
+                if time.monotonic() - last_purge > 60:
+                    self.purge()
+                    last_purge = time.monotonic()
+                # A full batch means more is probably waiting
+                if taken < self.batch_size:
+                    self._wakeup.wait(delay)
+                    self._wakeup.clear()
+
+        self._worker = threading.Thread(target=run, name="write-behind", daemon=True)
+        self._worker.start()
+        return self._worker
+
+    def stop(self, timeout: float = 10) -> None:
+        """Stop the worker and close the queue; pending writes stay on disk"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._worker is not None:
+            self._worker.join(timeout)
+        with self._lock:
+            self._db.close()
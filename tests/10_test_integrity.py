@@ -0,0 +1,74 @@
+import pytest
+from src.database.graph_algorithms import strongly_connected_components, weakly_connected_components
+from src.database.integrity import scan
+
+
+def csr(node_count, edges):
+    offsets = [0] * (node_count + 1)
+    for source, _ in edges:
+        offsets[source + 1] += 1
+    for i in range(node_count):
+        offsets[i + 1] += offsets[i]
+    targets = [target for _, target in sorted(edges)]
+    return offsets, targets
+
+
+class TestComponents:
+    """Test the component algorithms used by the integrity scanner"""
+
+    def test_strong_components_in_reverse_topological_order(self):
+        edges = [(0, 1), (1, 2), (2, 0), (2, 3), (3, 4), (4, 3), (5, 0)]
+        component, count = strongly_connected_components(6, *csr(6, edges))
+        assert count == 3
+        assert component[0] == component[1] == component[2]
+        assert component[3] == component[4]
+        for source, target in edges:
+            assert component[source] >= component[target]
+
+    def test_long_chain_does_not_recurse(self):
+        n = 50000
+        edges = [(i, i + 1) for i in range(n - 1)]
+        _, count = strongly_connected_components(n, *csr(n, edges))
+        assert count == n
+
+    def test_weak_components(self):
+        component, count = weakly_connected_components(5, [0, 3], [1, 4])
+        assert count == 3
+        assert component[0] == component[1] != component[3] == component[4]
+
+
+class TestScan:
+    """Test the integrity report"""
+
+    def test_report(self):
+        compounds = [{"formula": f, "name": f} for f in ["A", "B", "C", "D", "E", "F"]]
+        compounds.append({"formula": "HCHO", "name": "Formaldehyde"})
+        compounds.append({"formula": "CH2O", "name": "Formaldehyde"})
+        reactions = [
+            ("A", "B", {}), ("B", "A", {}), ("B", "C", {}),
+            ("D", "E", {}),
+            ("C", "X", {}), ("A", "X", {})
+        ]
+        report = scan(compounds, reactions)
+        assert report["missing_compounds"] == {"X": 2}
+        assert report["isolated"] == ["F", "HCHO", "CH2O"]
+        assert report["islands"] == [["D", "E"]]
+        assert report["cycles"] == [["A", "B"]]
+        assert report["duplicate_aliases"] == [{"formulas": ["CH2O", "HCHO"], "reason": "alias"}]
+
+    def test_multi_reaction_participants(self):
+        report = scan([{"formula": "A"}], [], [(["A", "B"], ["C"], {})])
+        assert report["missing_compounds"] == {"B": 1, "C": 1}
+
+    def test_unresolved_placeholders_are_missing(self):
+        compounds = [{"formula": "A"}, {"formula": "B", "placeholder": True},
+                     {"formula": "C", "placeholder": True}, {"formula": "D"}]
+        report = scan(compounds, [("A", "B", {}), ("A", "D", {})])
+        assert report["missing_compounds"] == {"B": 1, "C": 0}
+        assert report["compounds"] == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
+
+# Run it as follows: "pytest tests/10_test_integrity.py -v"
@@ -0,0 +1,118 @@
+import random
+from collections import deque
+import pytest
+from src.database import landmarks as landmarks_module
+from src.database.reaction_index import ReactionIndex
+from src.database.landmarks import LandmarkIndex, UNREACHABLE
+
+
+def random_reactions(n, m, seed):
+    rng = random.Random(seed)
+    return [(f"C{rng.randrange(n)}", f"C{rng.randrange(n)}", {"reagent": f"r{rng.randrange(3)}"})
+            for _ in range(m)]
+
+
+def make_index(n, reactions):
+    return ReactionIndex([{"formula": f"C{i}"} for i in range(n)], reactions)
+
+
+def distances_from(index, source):
+    distance = {source: 0}
+    queue = deque([source])
+    while queue:
+        node = queue.popleft()
+        for edge in range(index.offsets[node], index.offsets[node + 1]):
+            target = index.edge_targets[edge]
+            if target not in distance:
+                distance[target] = distance[node] + 1
+                queue.append(target)
+    return distance
+
+
+@pytest.fixture(autouse=True, params=["numpy", "array"])
+def vectors(request, monkeypatch):
+    """Run every test with NumPy distance vectors and with the stdlib fallback"""
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(landmarks_module, "numpy", None)
+    return request.param
+
+
+@pytest.fixture
+def index():
+    return make_index(80, random_reactions(80, 160, seed=11))
+
+
+class TestLandmarks:
+    """Test ALT lower bounds and their use in route search"""
+
+    def test_bounds_are_admissible(self, index):
+        landmarks = LandmarkIndex(index, 6)
+        for source in range(index.node_count):
+            distance = distances_from(index, source)
+            for target in range(index.node_count):
+                bound = landmarks.lower_bound(source, target)
+                if target in distance:
+                    assert bound <= distance[target]
+                else:
+                    assert bound <= UNREACHABLE
+
+    def test_routes_match_reverse_bfs(self, index):
+        rng = random.Random(2)
+        landmarks = LandmarkIndex(index, 6)
+        for _ in range(40):
+            source, target = rng.randrange(80), rng.randrange(80)
+            mask = index.compile_constraints({"exclude_reagents": ["r1"]}) if rng.random() < 0.5 else None
+            index.landmarks = None
+            expected = index.find_routes([source], [target], 6, edge_mask=mask)
+            index.landmarks = landmarks
+            assert index.find_routes([source], [target], 6, edge_mask=mask) == expected
+
+    def test_refresh_matches_rebuild(self):
+        reactions = random_reactions(60, 90, seed=4)
+        old = make_index(60, reactions)
+        landmarks = LandmarkIndex(old, 5)
+        new = make_index(60, reactions + random_reactions(60, 8, seed=5))
+        refreshed = landmarks.refresh(new)
+        rebuilt = LandmarkIndex(new, landmarks=refreshed.landmarks)
+        assert [list(v) for v in refreshed.forward] == [list(v) for v in rebuilt.forward]
+        assert [list(v) for v in refreshed.backward] == [list(v) for v in rebuilt.backward]
+
+    def test_refresh_after_removal_rebuilds(self):
+        reactions = random_reactions(40, 60, seed=6)
+        landmarks = LandmarkIndex(make_index(40, reactions), 4)
+        smaller = make_index(40, reactions[:-10])
+        refreshed = landmarks.refresh(smaller)
+        rebuilt = LandmarkIndex(smaller, landmarks=refreshed.landmarks)
+        assert [list(v) for v in refreshed.forward] == [list(v) for v in rebuilt.forward]
+
+    def test_hub_target_needs_far_fewer_expansions(self):
+        rng = random.Random(5)
+        n = 3000
+        pool = [0]
+        reactions = []
+        for i in range(1, n):
+            for _ in range(2):
+                j = rng.choice(pool) if rng.random() < 0.7 else rng.randrange(n)
+                reactions.append((f"C{i}", f"C{j}", {}))
+            pool += [i, rng.choice(pool)]
+        index = make_index(n, reactions)
+        landmarks = LandmarkIndex(index, 16)
+
+        in_degree = [0] * n
+        for target in index.edge_targets:
+            in_degree[target] += 1
+        hub = max(range(n), key=in_degree.__getitem__)
+        bfs_stats, alt_stats = {}, {}
+        expected = index.find_routes([n - 1], [hub], 4, stats=bfs_stats)
+        index.landmarks = landmarks
+        assert index.find_routes([n - 1], [hub], 4, stats=alt_stats) == expected
+        assert (alt_stats["expanded"] + alt_stats["bounds"]) * 10 < \
+            bfs_stats["expanded"] + bfs_stats["bounds"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
+
+# Run it as follows: "pytest tests/11_test_landmarks.py -v"
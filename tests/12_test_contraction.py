@@ -0,0 +1,120 @@
+import random
+from collections import deque
+import pytest
+from src.database.reaction_index import ReactionIndex
+from src.database.contraction import ContractionHierarchy
+
+
+def random_reactions(n, m, seed, islands=1):
+    rng = random.Random(seed)
+    reactions = []
+    for _ in range(m):
+        island = rng.randrange(islands)
+        size = n // islands
+        reactions.append((f"C{island * size + rng.randrange(size)}",
+                          f"C{island * size + rng.randrange(size)}", {}))
+    return reactions
+
+
+def make_index(n, reactions, generation=7):
+    return ReactionIndex([{"formula": f"C{i}"} for i in range(n)], reactions, generation=generation)
+
+
+def hops_from(index, source):
+    distance = {source: 0}
+    queue = deque([source])
+    while queue:
+        node = queue.popleft()
+        for edge in range(index.offsets[node], index.offsets[node + 1]):
+            target = index.edge_targets[edge]
+            if target not in distance:
+                distance[target] = distance[node] + 1
+                queue.append(target)
+    return distance
+
+
+@pytest.fixture
+def index():
+    return make_index(120, random_reactions(120, 260, seed=3, islands=3))
+
+
+class TestContractionHierarchy:
+    """Test shortcut construction, route unpacking and persistence"""
+
+    def test_distances_match_bfs(self, index):
+        hierarchy = ContractionHierarchy.build(index, workers=1)
+        assert hierarchy.shortcut_count > 0
+        for source in range(index.node_count):
+            distance = hops_from(index, source)
+            for target in range(index.node_count):
+                found = hierarchy.shortest(index.formulas[source], index.formulas[target])
+                if target in distance:
+                    assert found[0] == distance[target]
+                    assert len(found[1]) == distance[target] + 1
+                else:
+                    assert found is None
+
+    def test_routes_are_real_reactions(self, index):
+        hierarchy = ContractionHierarchy.build(index, workers=1)
+        rng = random.Random(1)
+        for _ in range(200):
+            source, target = rng.randrange(120), rng.randrange(120)
+            route = hierarchy.route(index, source, target, 10)
+            if route is None:
+                continue
+            assert index.edge_sources[route[0]] == source
+            assert index.edge_targets[route[-1]] == target
+            for a, b in zip(route, route[1:]):
+                assert index.edge_targets[a] == index.edge_sources[b]
+
+    def test_weighted_routes(self):
+        index = make_index(4, [("C0", "C1", {"type": "slow"}), ("C1", "C3", {}),
+                               ("C0", "C2", {}), ("C2", "C3", {})])
+        hierarchy = ContractionHierarchy.build(
+            index, weight=lambda alternatives: 5 if alternatives[0].reaction_type == "slow" else 1, workers=1)
+        assert hierarchy.shortest("C0", "C3") == (2, ["C0", "C2", "C3"])
+        with pytest.raises(ValueError):
+            hierarchy.route(index, 0, 3, 5)
+
+    def test_parallel_build_matches_serial(self, index):
+        serial = ContractionHierarchy.build(index, workers=1)
+        parallel = ContractionHierarchy.build(index, workers=2)
+        for source in index.formulas[::7]:
+            for target in index.formulas[::5]:
+                a, b = serial.shortest(source, target), parallel.shortest(source, target)
+                assert (a and a[0]) == (b and b[0])
+
+    def test_find_routes_uses_hierarchy(self, index):
+        rng = random.Random(4)
+        hierarchy = ContractionHierarchy.build(index, workers=1)
+        for _ in range(60):
+            source, target = rng.randrange(120), rng.randrange(120)
+            expected = index.find_routes([source], [target], 6, routes_per_pair=1)
+            index.hierarchy = hierarchy
+            found = index.find_routes([source], [target], 6, routes_per_pair=1)
+            index.hierarchy = None
+            assert [len(route) for route in found] == [len(route) for route in expected]
+
+    def test_save_and_load(self, index, tmp_path):
+        hierarchy = ContractionHierarchy.build(index, workers=1)
+        path = str(tmp_path / "graph.ch")
+        hierarchy.save(path)
+        loaded = ContractionHierarchy.load(path)
+        assert loaded.generation == 7
+        # A fresh snapshot of the same generation may number compounds differently
+        shuffled = ReactionIndex([{"formula": f"C{i}"} for i in reversed(range(120))],
+                                 random_reactions(120, 260, seed=3, islands=3), generation=7)
+        for source in range(0, 120, 11):
+            for target in range(0, 120, 3):
+                route = loaded.route(shuffled, source, target, 10)
+                distance = hops_from(shuffled, source).get(target)
+                if source == target or distance is None:
+                    assert route is None
+                else:
+                    assert len(route) == distance
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
+
+# Run it as follows: "pytest tests/12_test_contraction.py -v"
@@ -0,0 +1,109 @@
+import time
+import asyncio
+import threading
+import pytest
+from src.api import main
+from src.api.single_flight import SingleFlight
+from tests.conftest import get, get_many
+
+
+@pytest.fixture
+def calls(api):
+    """Searches actually run by /paths/; start X finds nothing"""
+    calls = []
+
+    def slow_body(start, end, *args):
+        calls.append((tuple(start), tuple(end)))
+        time.sleep(0.05)
+        return (b'{"paths":[]}', False) if start != ["X"] else None
+
+    api.setattr(main, "paths_body", slow_body)
+    # One coalescing window for the whole test
+    api.setattr(main, "COALESCE_WINDOW", float("inf"))
+    return calls
+
+
+class TestSingleFlight:
+    """Test coalescing of identical concurrent computations"""
+
+    def test_concurrent_calls_share_one_computation(self):
+        flights = SingleFlight()
+        calls = []
+
+        def work(value):
+            calls.append(value)
+            time.sleep(0.02)
+            return value * 2
+
+        async def run():
+            return await asyncio.gather(*(flights.do("k", work, 21) for _ in range(20)))
+
+        assert asyncio.run(run()) == [42] * 20
+        assert calls == [21]
+        assert flights.metrics() == {"in_flight": 0, "started": 1, "coalesced": 19, "failed": 0,
+                                     "abandoned": 0}
+
+    def test_exceptions_are_shared(self):
+        flights = SingleFlight()
+
+        def fail():
+            time.sleep(0.01)
+            raise ValueError("boom")
+
+        async def run():
+            return await asyncio.gather(*(flights.do("k", fail) for _ in range(3)),
+                                        return_exceptions=True)
+
+        assert all(isinstance(result, ValueError) for result in asyncio.run(run()))
+        assert flights.failed == 1
+
+    def test_later_calls_recompute(self):
+        flights = SingleFlight()
+
+        async def run():
+            await flights.do("k", lambda: 1)
+            await flights.do("k", lambda: 2)
+
+        asyncio.run(run())
+        assert flights.started == 2
+
+    def test_cancelled_caller_does_not_cancel_others(self):
+        flights = SingleFlight()
+        release = threading.Event()
+
+        async def run():
+            first = asyncio.ensure_future(flights.do("k", lambda: release.wait(1) and "done"))
+            second = asyncio.ensure_future(flights.do("k", lambda: "other"))
+            await asyncio.sleep(0.01)
+            first.cancel()
+            release.set()
+            return await second
+
+        assert asyncio.run(run()) == "done"
+
+
+class TestPathCoalescing:
+    """Test that identical /paths/ requests share one search"""
+
+    def test_identical_requests_coalesce(self, calls):
+        responses = asyncio.run(get_many(
+            ["/paths/?start=A&end=B"] * 10 + ["/paths/?start=A&end=C"] * 5))
+        assert all(response.status_code == 200 for response in responses)
+        assert sorted(calls) == [(("A",), ("B",)), (("A",), ("C",))]
+        assert main.path_flights.coalesced == 13
+
+    def test_not_found_is_shared(self, calls):
+        responses = asyncio.run(get_many(["/paths/?start=X&end=B"] * 4))
+        assert [response.status_code for response in responses] == [404] * 4
+        assert len(calls) == 1
+
+    def test_metrics(self, calls):
+        asyncio.run(get_many(["/paths/?start=A&end=B"] * 3))
+        response = get("/metrics")
+        assert response.json()["path_single_flight"]["coalesced"] == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
+
+# Run it as follows: "pytest tests/13_test_single_flight.py -v"
@@ -0,0 +1,148 @@
+import time
+import asyncio
+import threading
+import httpx
+import pytest
+from src.api import main
+from src.api.lanes import Lane, LaneFullError, lanes_from_env
+from src.database.write_queue import WriteQueue
+from tests.conftest import FakeGraph as BaseFakeGraph, get
+
+
+class FakeGraph(BaseFakeGraph):
+    def get_compound_suggestions(self, prefix, limit):
+        return [{"formula": prefix}]
+
+
+class ProbedGraph(BaseFakeGraph):
+    """Answers the readiness probe, recording which thread ran it"""
+    index_ready = True
+
+    def __init__(self):
+        self.threads = []
+
+    def _session(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def run(self, query):
+        self.threads.append(threading.current_thread().name)
+        return self
+
+    def single(self):
+        return {"num": 1}
+
+
+@pytest.fixture
+def lanes():
+    lanes = {"interactive": Lane("interactive", 2, 8), "search": Lane("search", 1, 2),
+             "batch": Lane("batch", 1, 1), "write": Lane("write", 1, 1)}
+    yield lanes
+    for lane in lanes.values():
+        lane.shutdown(wait=False)
+
+
+@pytest.fixture
+def slow_searches(api):
+    def slow_body(start, end, *args):
+        time.sleep(0.3)
+        return b'{"paths":[]}', False
+
+    api.setattr(main, "graph", FakeGraph())
+    api.setattr(main, "paths_body", slow_body)
+
+
+class TestLane:
+    """Test bounded per-class executors"""
+
+    def test_rejects_beyond_workers_and_queue(self):
+        lane = Lane("test", 1, 1)
+        release = threading.Event()
+        running = lane.submit(release.wait)
+        queued = lane.submit(lambda: "queued")
+        with pytest.raises(LaneFullError) as error:
+            lane.submit(lambda: "refused")
+        assert error.value.status_code == 503
+        assert lane.metrics()["running"] == 1 and lane.metrics()["queued"] == 1
+        release.set()
+        assert queued.result(1) == "queued" and running.result(1)
+        assert lane.metrics()["rejected"] == 1
+        lane.submit(lambda: None).result(1)
+        lane.shutdown()
+
+    def test_sizes_from_env(self, monkeypatch):
+        monkeypatch.setenv("CHEMPATH_LANE_SEARCH_WORKERS", "3")
+        monkeypatch.setenv("CHEMPATH_LANE_SEARCH_QUEUE", "0")
+        lanes = lanes_from_env()
+        assert (lanes["search"].workers, lanes["search"].max_queue) == (3, 0)
+        assert lanes["interactive"].workers == 8
+        for lane in lanes.values():
+            lane.shutdown()
+
+
+class TestEndpointLanes:
+    """Test that deep searches cannot hold up autocomplete"""
+
+    def test_suggestions_stay_fast_during_search_burst(self, lanes, slow_searches):
+        async def run():
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                searches = [asyncio.ensure_future(client.get(f"/paths/?start=A{i}&end=B"))
+                            for i in range(6)]
+                await asyncio.sleep(0.05)
+                started = time.monotonic()
+                suggestion = await client.get("/compounds/suggestions/?prefix=CH")
+                elapsed = time.monotonic() - started
+                return suggestion, elapsed, await asyncio.gather(*searches)
+
+        suggestion, elapsed, searches = asyncio.run(run())
+        assert suggestion.status_code == 200
+        assert elapsed < 0.2
+        codes = sorted(response.status_code for response in searches)
+        # One running plus two queued; the rest are turned away
+        assert codes == [200, 200, 200, 503, 503, 503]
+        assert lanes["search"].metrics()["rejected"] == 3
+
+
+
+class TestOffTheLoop:
+    """Test that database and write queue calls run on lane threads"""
+
+    def test_readiness_probe(self, api):
+        graph = ProbedGraph()
+        api.setattr(main, "graph", graph)
+        assert get("/ready").status_code == 200
+        assert graph.threads and graph.threads[0].startswith("chempath-interactive")
+
+    def test_write_queue(self, api, tmp_path):
+        queue = WriteQueue(str(tmp_path / "writes.db"))
+        api.setattr(main, "write_queue", queue)
+        submit, status = queue.submit, queue.status
+        threads = []
+        api.setattr(queue, "submit", lambda *args: threads.append(
+            threading.current_thread().name) or submit(*args))
+        api.setattr(queue, "status", lambda *args: threads.append(
+            threading.current_thread().name) or status(*args))
+        ticket = main_post("/compounds/", {"formula": "CH4"}).json()["ticket"]
+        assert get(f"/writes/{ticket}").json()["status"] == "queued"
+        assert [thread.startswith("chempath-write") for thread in threads] == [True, True]
+        queue.stop()
+
+
+def main_post(url, body):
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(url, json=body)
+    return asyncio.run(run())
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
+
+# Run it as follows: "pytest tests/14_test_lanes.py -v"
@@ -0,0 +1,87 @@
+import pytest
+from src.api import main
+from tests.conftest import FakeGraph as BaseFakeGraph, get
+
+
+class FakeGraph(BaseFakeGraph):
+    def __init__(self, estimate):
+        self.estimate = estimate
+        self.estimates = 0
+
+    def estimate_routes(self, *args):
+        self.estimates += 1
+        return self.estimate
+
+
+@pytest.fixture
+def calls(api):
+    """Searches run by /paths/, with a cost limit of 1000 (hard limit 100000)"""
+    calls = []
+
+    def body(start, end, max_steps, start_class, end_class, paths_per_pair, constraints,
+             shortest_only=False, deadline=None, partial=False):
+        calls.append({"shortest_only": shortest_only})
+        return b'{"paths":[]}', False
+
+    api.setattr(main, "paths_body", body)
+    api.setattr(main, "PATH_COST_LIMIT", 1000)
+    api.setattr(main, "PATH_COST_HARD_LIMIT", 100000)
+    return calls
+
+
+class TestAdmission:
+    """Test cost estimates and admission control on /paths/"""
+
+    def test_cheap_query_runs_in_full(self, api, calls):
+        api.setattr(main, "graph", FakeGraph(50))
+        response = get("/paths/?start=A&end=B")
+        assert response.status_code == 200
+        assert response.headers["x-path-cost-estimate"] == "50"
+        assert response.headers["x-path-plan"] == "full"
+        assert calls == [{"shortest_only": False}]
+
+    def test_estimate_stays_off_the_interactive_lane(self, api, calls, lanes):
+        api.setattr(main, "graph", FakeGraph(50))
+        get("/paths/?start=A&end=B")
+        assert lanes["interactive"].completed == 0
+
+    def test_not_modified_skips_the_estimate(self, api, calls):
+        graph = FakeGraph(50)
+        api.setattr(main, "graph", graph)
+        response = get("/paths/?start=A&end=B", headers={"If-None-Match": 'W/"g1"'})
+        assert response.status_code == 304
+        assert graph.estimates == 0 and calls == []
+
+    def test_expensive_query_is_downgraded(self, api, calls):
+        api.setattr(main, "graph", FakeGraph(5000))
+        api.setattr(main, "PATH_COST_POLICY", "downgrade")
+        response = get("/paths/?start=A&end=B&max_steps=10")
+        assert response.headers["x-path-plan"] == "shortest"
+        assert calls == [{"shortest_only": True}]
+
+    def test_expensive_query_is_queued(self, api, calls, lanes):
+        api.setattr(main, "graph", FakeGraph(5000))
+        api.setattr(main, "PATH_COST_POLICY", "queue")
+        response = get("/paths/?start=A&end=B")
+        assert response.headers["x-path-plan"] == "queued"
+        # Only the estimate ran on the search lane
+        assert lanes["batch"].completed == 1 and lanes["search"].completed == 1
+
+    def test_expensive_query_is_rejected(self, api, calls):
+        api.setattr(main, "graph", FakeGraph(5000))
+        api.setattr(main, "PATH_COST_POLICY", "reject")
+        response = get("/paths/?start=A&end=B")
+        assert response.status_code == 422
+        assert response.headers["x-path-cost-estimate"] == "5000"
+        assert calls == []
+
+    def test_hard_limit_always_rejects(self, api, calls):
+        api.setattr(main, "graph", FakeGraph(10 ** 9))
+        api.setattr(main, "PATH_COST_POLICY", "downgrade")
+        assert get("/paths/?start=A&end=B").status_code == 422
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
+
+# Run it as follows: "pytest tests/15_test_admission.py -v"
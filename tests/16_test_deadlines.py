@@ -0,0 +1,197 @@
+import time
+import asyncio
+import pytest
+from fastapi import HTTPException
+from src.api import main
+from src.api.single_flight import SingleFlight
+from src.database.deadline import Deadline, DeadlineExceeded
+from src.database.graph_manager import ChemicalGraph
+from src.database.reaction_index import ReactionIndex
+from tests.conftest import FakeGraph as BaseFakeGraph, get, get_many
+
+
+class FakeGraph(BaseFakeGraph):
+    """Answers instantly, or only once the request's deadline has passed"""
+
+    def __init__(self, slow=False, slow_load=False):
+        self.slow = slow
+        self.slow_load = slow_load
+        self.index = ReactionIndex(
+            [{"formula": "CH3OH"}, {"formula": "CH2O"}],
+            [("CH3OH", "CH2O", {"reagent": "K2Cr2O7/H+"})]
+        )
+
+    def estimate_routes(self, start, end, max_depth, start_class, end_class, deadline=None):
+        if self.slow_load:
+            while not deadline.expired:
+                time.sleep(0.005)
+            raise DeadlineExceeded("snapshot load exceeded the time budget")
+        return super().estimate_routes(start, end, max_depth)
+
+    def get_index(self, deadline=None):
+        return self.index
+
+    def find_routes(self, start, end, max_depth, deadline=None, partial=False, stats=None,
+                    **kwargs):
+        stats["truncated"] = False
+        if self.slow:
+            while not deadline.expired:
+                time.sleep(0.005)
+            if not partial:
+                raise DeadlineExceeded("time budget exceeded")
+            stats["truncated"] = True
+            return []
+        routes = self.index.find_routes(self.index.resolve(start), self.index.resolve(end), max_depth)
+        return [self.index.describe_route(route) for route in routes]
+
+
+class FakeRequest:
+    def __init__(self, disconnected=True):
+        self.disconnected = disconnected
+
+    async def is_disconnected(self):
+        return self.disconnected
+
+
+class TimedOut(Exception):
+    code = "Neo.ClientError.Transaction.TransactionTimedOutClientConfiguration"
+
+
+class SlowDriver:
+    """Reads the generation, then times out every transaction given a timeout"""
+
+    def __init__(self):
+        self.timeouts = []
+
+    def session(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute_read(self, work):
+        if getattr(work, "timeout", None) is None:
+            return 0
+        self.timeouts.append(work.timeout)
+        raise TimedOut("transaction timed out")
+
+    def close(self):
+        pass
+
+
+class TestPathDeadlines:
+    """Test time budgets, partial answers and cancellation of /paths/"""
+
+    def test_complete_answer_is_cacheable(self, api):
+        api.setattr(main, "graph", FakeGraph())
+        response = get("/paths/?start=CH3OH&end=CH2O&timeout=5")
+        assert response.status_code == 200
+        assert "truncated" not in response.json()
+        assert response.headers["etag"]
+
+    def test_timeout_answers_504(self, api):
+        api.setattr(main, "graph", FakeGraph(slow=True))
+        started = time.monotonic()
+        response = get("/paths/?start=CH3OH&end=CH2O&timeout=0.05")
+        assert response.status_code == 504
+        assert time.monotonic() - started < 1
+
+    def test_default_timeout(self, api):
+        api.setattr(main, "graph", FakeGraph(slow=True))
+        api.setattr(main, "PATH_TIMEOUT", 0.05)
+        assert get("/paths/?start=CH3OH&end=CH2O").status_code == 504
+
+    def test_partial_answer_is_marked_truncated(self, api):
+        api.setattr(main, "graph", FakeGraph(slow=True))
+        response = get("/paths/?start=CH3OH&end=CH2O&timeout=0.05&partial=true")
+        assert response.status_code == 200
+        assert response.json()["truncated"] is True
+        assert "etag" not in response.headers
+        assert response.headers["cache-control"] == "no-store"
+
+    def test_slow_snapshot_load_answers_504(self, api):
+        api.setattr(main, "graph", FakeGraph(slow_load=True))
+        assert get("/paths/?start=CH3OH&end=CH2O&timeout=0.05").status_code == 504
+        assert get("/paths/stream?start=CH3OH&end=CH2O&timeout=0.05").status_code == 504
+
+    def test_snapshot_load_gets_the_time_left(self):
+        graph = ChemicalGraph("bolt://test", "neo4j", "secret", connect=False)
+        graph._driver = SlowDriver()
+        graph._ready.set()
+        with pytest.raises(DeadlineExceeded):
+            graph.estimate_routes("CH3OH", "CH2O", deadline=Deadline(5))
+        assert 4 < graph._driver.timeouts[0] <= 5
+        graph.close()
+
+    def test_disconnect_cancels_search(self, api):
+        api.setattr(main, "DISCONNECT_POLL_INTERVAL", 0.01)
+        flights = SingleFlight()
+        deadline = Deadline(5)
+
+        def search():
+            while not deadline.expired:
+                time.sleep(0.005)
+            deadline.check()
+
+        async def run():
+            return await main.unless_disconnected(
+                FakeRequest(), flights.do("k", search, on_abandon=deadline.cancel))
+
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(run())
+        assert error.value.status_code == 499
+        assert deadline.cancelled
+        assert flights.metrics()["abandoned"] == 1
+
+    def test_follower_keeps_search_alive(self, api):
+        api.setattr(main, "DISCONNECT_POLL_INTERVAL", 0.01)
+        flights = SingleFlight()
+        deadline = Deadline(5)
+
+        def search():
+            time.sleep(0.1)
+            deadline.check()
+            return "routes"
+
+        async def run():
+            leader = asyncio.ensure_future(main.unless_disconnected(
+                FakeRequest(), flights.do("k", search, on_abandon=deadline.cancel)))
+            follower = asyncio.ensure_future(main.unless_disconnected(
+                FakeRequest(disconnected=False), flights.do("k", search)))
+            return await asyncio.gather(leader, follower, return_exceptions=True)
+
+        leader, follower = asyncio.run(run())
+        assert leader.status_code == 499
+        assert follower == "routes"
+        assert not deadline.cancelled
+
+    @pytest.mark.parametrize("window, searches", [(float("inf"), 1), (0.05, 2)])
+    def test_late_requests_get_their_own_deadline(self, api, window, searches):
+        deadlines = []
+
+        def slow_body(*args):
+            deadlines.append(args[-2])
+            time.sleep(0.2)
+            return b'{"paths":[]}', False
+
+        api.setattr(main, "paths_body", slow_body)
+        api.setattr(main, "COALESCE_WINDOW", window)
+
+        async def staggered():
+            first = asyncio.ensure_future(get_many(["/paths/?start=A&end=B"]))
+            await asyncio.sleep(0.1)
+            second = await get_many(["/paths/?start=A&end=B"])
+            return await first + second
+
+        responses = asyncio.run(staggered())
+        assert [response.status_code for response in responses] == [200, 200]
+        assert len(deadlines) == searches
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
+
+# Run it as follows: "pytest tests/16_test_deadlines.py -v"
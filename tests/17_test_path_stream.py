@@ -0,0 +1,142 @@
+import json
+import asyncio
+import pytest
+from src.api import main
+from src.database.deadline import DeadlineExceeded
+from src.database.reaction_index import ReactionIndex
+from tests.conftest import FakeGraph as BaseFakeGraph, get
+
+
+class FakeGraph(BaseFakeGraph):
+    """Streams depths from a real index, optionally running out of time after some"""
+
+    def __init__(self, expire_after=None):
+        self.expire_after = expire_after
+        self.deadlines = []
+        self.closed = False
+        self.index = ReactionIndex(
+            [{"formula": "CH3CH2OH"}, {"formula": "CH3CHO"}, {"formula": "CH3COOH"}],
+            [("CH3CH2OH", "CH3CHO", {"reagent": "K2Cr2O7/H+"}),
+             ("CH3CH2OH", "CH3COOH", {"reagent": "KMnO4/H+"}),
+             ("CH3CHO", "CH3COOH", {"reagent": "K2Cr2O7/H+"}),
+             ("CH3CHO", "CH3CH2OH", {"reagent": "NaBH4"})]
+        )
+
+    def routes_by_depth(self, start, end, max_depth, limit=None, deadline=None, **kwargs):
+        self.deadlines.append(deadline)
+        index = self.index
+        depths = index.routes_by_depth(index.resolve(start), index.resolve(end), max_depth, limit)
+        try:
+            for sent, (depth, routes) in enumerate(depths):
+                if sent == self.expire_after:
+                    raise DeadlineExceeded("time budget exceeded")
+                yield depth, [index.describe_route(route) for route in routes], index
+        finally:
+            self.closed = True
+
+
+async def disconnect_after_first_frame(url):
+    """Call the app directly, hanging up once the first depth has been sent"""
+    path, query = url.split("?")
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+             "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+             "query_string": query.encode(), "root_path": "", "headers": [],
+             "client": ("test", 1), "server": ("test", 80)}
+    sent, first_frame = [], asyncio.Event()
+
+    async def receive():
+        if not sent:
+            sent.append(None)
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await first_frame.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message.get("body"):
+            sent.append(message["body"])
+            first_frame.set()
+
+    await main.app(scope, receive, send)
+    return [body for body in sent if body]
+
+
+def lines(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+class TestPathStream:
+    """Test iterative deepening results streamed by /paths/stream"""
+
+    def test_depths_stream_shortest_first(self, api):
+        graph = FakeGraph()
+        api.setattr(main, "graph", graph)
+        response = get("/paths/stream?start=CH3CH2OH&end=CH3COOH&max_steps=2")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        messages = lines(response)
+        assert [message.get("depth") for message in messages] == [1, 2, None]
+        assert messages[1]["paths"][0]["compounds"] == ["CH3CH2OH", "CH3CHO", "CH3COOH"]
+        assert "CH3CHO" in messages[1]["compounds"]
+        assert messages[-1] == {"done": True, "routes": 2, "truncated": False}
+        assert graph.deadlines[0].cancelled
+
+    def test_stops_at_limit(self, api):
+        api.setattr(main, "graph", FakeGraph())
+        messages = lines(get("/paths/stream?start=CH3CH2OH&end=CH3COOH&limit=1"))
+        assert [message.get("depth") for message in messages] == [1, None]
+        assert messages[-1]["routes"] == 1
+
+    def test_server_sent_events(self, api):
+        api.setattr(main, "graph", FakeGraph())
+        response = get("/paths/stream?start=CH3CH2OH&end=CH3COOH&max_steps=2",
+                       headers={"Accept": "text/event-stream"})
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = response.text.strip().split("\n\n")
+        assert [event.split("\n")[0] for event in events] == \
+            ["event: depth", "event: depth", "event: done"]
+        assert json.loads(events[0].split("\n")[1][len("data: "):])["depth"] == 1
+
+    def test_timeout_after_first_depth_truncates(self, api):
+        api.setattr(main, "graph", FakeGraph(expire_after=1))
+        messages = lines(get("/paths/stream?start=CH3CH2OH&end=CH3COOH"))
+        assert [message.get("depth") for message in messages] == [1, None]
+        assert messages[-1]["truncated"] is True
+
+    def test_timeout_before_first_depth(self, api):
+        api.setattr(main, "graph", FakeGraph(expire_after=0))
+        assert get("/paths/stream?start=CH3CH2OH&end=CH3COOH").status_code == 504
+
+    def test_not_found(self, api):
+        api.setattr(main, "graph", FakeGraph())
+        assert get("/paths/stream?start=CH3COOH&end=CH3CH2OH").status_code == 404
+
+    def test_downgraded_query_sends_shortest_depth_only(self, api):
+        api.setattr(main, "graph", FakeGraph())
+        api.setattr(main, "PATH_COST_LIMIT", 1)
+        api.setattr(main, "PATH_COST_POLICY", "downgrade")
+        response = get("/paths/stream?start=CH3CH2OH&end=CH3COOH")
+        assert response.headers["x-path-plan"] == "shortest"
+        assert [message.get("depth") for message in lines(response)] == [1, None]
+
+
+    def test_disconnect_stops_search(self, api):
+        graph = FakeGraph()
+        api.setattr(main, "graph", graph)
+        frames = asyncio.run(disconnect_after_first_frame(
+            "/paths/stream?start=CH3CH2OH&end=CH3COOH&max_steps=2"))
+        assert [json.loads(frame).get("depth") for frame in frames] == [1]
+        assert graph.deadlines[0].cancelled
+        assert graph.closed
+
+    def test_not_found_stops_search(self, api):
+        graph = FakeGraph()
+        api.setattr(main, "graph", graph)
+        assert get("/paths/stream?start=CH3COOH&end=CH3CH2OH").status_code == 404
+        assert graph.deadlines[0].cancelled
+        assert graph.closed
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
+
+# Run it as follows: "pytest tests/17_test_path_stream.py -v"
@@ -0,0 +1,120 @@
+import time
+import threading
+import pytest
+from src.database.graph_manager import ChemicalGraph
+
+
+class FakeCounters:
+    def __init__(self, contains_updates):
+        self.contains_updates = contains_updates
+
+
+class FakeResult:
+    def __init__(self, rows, updates=False):
+        self.rows = rows
+        self.updates = updates
+
+    def data(self):
+        return self.rows
+
+    def single(self):
+        return self.rows[0] if self.rows else None
+
+    def consume(self):
+        return type("Summary", (), {"counters": FakeCounters(self.updates)})()
+
+
+class FakeDatabase:
+    """Just the GraphMeta generation; other queries return the rows queued for them"""
+
+    def __init__(self):
+        self.generation = 100
+        self.reads = 0
+        self.queued = []
+
+    def run(self, query, **params):
+        if "SET m.generation" in query:
+            self.generation += 1
+            return FakeResult([{"generation": self.generation}], True)
+        if "RETURN m.generation" in query:
+            self.reads += 1
+            return FakeResult([{"generation": self.generation}])
+        return self.queued.pop(0)
+
+    def session(self):
+        return FakeSession(self)
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    def __init__(self, database):
+        self.database = database
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute_read(self, work):
+        return work(self.database)
+
+    execute_write = execute_read
+
+
+@pytest.fixture
+def graph():
+    graph = ChemicalGraph("bolt://test", "neo4j", "secret", connect=False, generation_ttl=0.02)
+    graph._driver = FakeDatabase()
+    graph._ready.set()
+    yield graph
+    graph.close()
+
+
+class TestGeneration:
+    """Test generation bumps, cached reads and cache invalidation"""
+
+    def test_write_bumps_and_invalidates(self, graph):
+        graph._index = "stale"
+        graph._driver.queued.append(FakeResult([{"c": 1}], updates=True))
+        with graph._session() as session:
+            graph._write(session, "MERGE (c:Compound {formula: 'X'}) RETURN c")
+        assert graph.generation == 101
+        assert graph._index is None
+
+    def test_unchanged_merge_does_not_bump(self, graph):
+        graph._index = "current"
+        graph._driver.queued.append(FakeResult([{"c": 1}], updates=False))
+        with graph._session() as session:
+            graph._write(session, "MERGE (c:Compound {formula: 'X'}) RETURN c")
+        assert graph._driver.generation == 100
+        assert graph._index == "current"
+
+    def test_generation_never_queries(self, graph):
+        time.sleep(0.05)
+        assert graph.generation == 0
+        assert graph._driver.reads == 0
+        assert graph.refresh_generation() == 100
+        assert graph._driver.reads == 1
+
+    def test_watcher_notices_other_writers(self, graph):
+        graph._index = "stale"
+        thread = threading.Thread(target=graph._watch_generation, daemon=True)
+        thread.start()
+        graph._driver.generation = 150
+        deadline = time.monotonic() + 2
+        while graph.generation != 150 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert graph.generation == 150
+        assert graph._index is None
+        graph._closed.set()
+        thread.join(1)
+        assert not thread.is_alive()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
+
+# Run it as follows: "pytest tests/18_test_generation.py -v"
@@ -0,0 +1,58 @@
+import pytest
+import neo4j
+from src.database.graph_manager import ChemicalGraph
+
+
+class FakeDriver:
+    """Records the queries run on it"""
+
+    def __init__(self, fail=False):
+        self.queries = []
+        self.fail = fail
+
+    def verify_connectivity(self):
+        pass
+
+    def session(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def run(self, query, **params):
+        if self.fail:
+            raise PermissionError("not allowed")
+        self.queries.append(" ".join(query.split()))
+
+    def close(self):
+        pass
+
+
+def connect(monkeypatch, driver):
+    monkeypatch.setattr(neo4j.GraphDatabase, "driver", lambda *args, **kwargs: driver)
+    return ChemicalGraph("bolt://test", "neo4j", "secret", max_retries=1)
+
+
+class TestConnect:
+    """Test what happens when the graph connects"""
+
+    def test_constraints_are_created(self, monkeypatch):
+        driver = FakeDriver()
+        graph = connect(monkeypatch, driver)
+        assert graph.is_ready
+        assert any("FOR (c:Compound) REQUIRE c.formula IS UNIQUE" in q for q in driver.queries)
+        assert any("FOR (h:IngestHash) REQUIRE h.hash IS UNIQUE" in q for q in driver.queries)
+        assert all("IF NOT EXISTS" in query for query in driver.queries)
+
+    def test_constraint_failure_does_not_block_connecting(self, monkeypatch):
+        graph = connect(monkeypatch, FakeDriver(fail=True))
+        assert graph.is_ready
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
+
+# Run it as follows: "pytest tests/19_test_connect.py -v"
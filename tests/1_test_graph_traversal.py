@@ -14,7 +14,8 @@ def graph():
     graph = ChemicalGraph(
         os.getenv("NEO4J_URI"),
         os.getenv("NEO4J_USER"),
-        os.getenv("NEO4J_PASSWORD")
+        os.getenv("NEO4J_PASSWORD"),
+        max_retries=1
     )
     
     # Ingest test data
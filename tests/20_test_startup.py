@@ -0,0 +1,173 @@
+import time
+import threading
+import pytest
+import neo4j
+from src.api import main
+from src.database.graph_manager import ChemicalGraph
+from tests.conftest import FakeGraph as BaseFakeGraph, get
+
+
+class FakeDriver:
+    """An empty database that answers every query"""
+
+    def __init__(self):
+        self.queries = []
+
+    def verify_connectivity(self):
+        pass
+
+    def session(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def run(self, query, **params):
+        self.queries.append(" ".join(query.split()))
+        return self
+
+    def execute_read(self, work):
+        return work(self)
+
+    def single(self):
+        return {"num": 1} if self.queries[-1] == "RETURN 1 as num" else None
+
+    def data(self):
+        return []
+
+    def close(self):
+        pass
+
+
+class FlakyNeo4j:
+    """Refuses the first `failures` connections, then hands out the driver"""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.attempts = 0
+        self.driver = FakeDriver()
+
+    def __call__(self, *args, **kwargs):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise neo4j.exceptions.ServiceUnavailable("connection refused")
+        return self.driver
+
+
+class RecordingEvent(threading.Event):
+    """Records how long each wait asked for"""
+
+    def __init__(self):
+        super().__init__()
+        self.waits = []
+
+    def wait(self, timeout=None):
+        self.waits.append(timeout)
+        return super().wait(timeout)
+
+
+class UntouchableGraph(BaseFakeGraph):
+    """Fails the test if anything opens a database session"""
+    index_ready = True
+
+    def _session(self):
+        raise AssertionError("the database was queried")
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def flaky(monkeypatch):
+    neo4j_driver = FlakyNeo4j(failures=2)
+    monkeypatch.setattr(neo4j.GraphDatabase, "driver", neo4j_driver)
+    return neo4j_driver
+
+
+@pytest.fixture
+def graph():
+    graph = ChemicalGraph("bolt://test", "neo4j", "secret", connect=False,
+                          retry_delay=0.01, landmarks=0)
+    yield graph
+    graph.close()
+
+
+class TestBackgroundConnect:
+    """Test connecting to Neo4j off the request path"""
+
+    def test_retries_with_backoff(self, flaky, graph):
+        graph._closed = RecordingEvent()
+        graph.connect_in_background(warm_index=False)
+        assert wait_for(lambda: graph.is_ready)
+        assert flaky.attempts == 3
+        assert graph._closed.waits[:2] == [0.01, 0.02]
+        assert not graph.index_ready
+
+    def test_warms_the_index(self, flaky, graph):
+        graph.connect_in_background()
+        assert wait_for(lambda: graph.index_ready)
+
+    def test_synchronous_connect_gives_up(self, monkeypatch):
+        monkeypatch.setenv("NEO4J_CONNECT_RETRIES", "2")
+        monkeypatch.setenv("NEO4J_RETRY_DELAY", "0")
+        neo4j_driver = FlakyNeo4j(failures=5)
+        monkeypatch.setattr(neo4j.GraphDatabase, "driver", neo4j_driver)
+        with pytest.raises(neo4j.exceptions.ServiceUnavailable):
+            ChemicalGraph("bolt://test", "neo4j", "secret")
+        assert neo4j_driver.attempts == 2
+
+
+class TestStartupEndpoints:
+    """Test what the API answers before and after the graph is usable"""
+
+    def test_health_does_not_touch_database(self, api):
+        api.setattr(main, "graph", UntouchableGraph())
+        response = get("/health")
+        assert response.status_code == 200
+        assert response.json()["database"] == "connected"
+
+    def test_health_while_connecting(self, api, graph):
+        api.setattr(main, "graph", graph)
+        response = get("/health")
+        assert response.status_code == 200
+        assert response.json()["database"] == "connecting"
+
+    def test_ready_while_connecting(self, api, graph):
+        api.setattr(main, "graph", graph)
+        assert get("/ready").status_code == 503
+
+    def test_ready_while_index_warms(self, api, flaky, graph):
+        api.setattr(main, "graph", graph)
+        graph.connect_in_background(warm_index=False)
+        assert wait_for(lambda: graph.is_ready)
+        response = get("/ready")
+        assert response.status_code == 503
+        assert response.json()["detail"] == "Route index is warming up"
+        graph.get_index()
+        assert get("/ready").status_code == 200
+
+    @pytest.mark.parametrize("url", [
+        "/generation",
+        "/compounds/",
+        "/compounds/CH3CH2OH",
+        "/paths/?start=CH3CH2OH&end=CH3COOH",
+        "/paths/stream?start=CH3CH2OH&end=CH3COOH",
+    ])
+    def test_data_endpoints_wait_for_graph(self, api, graph, url):
+        api.setattr(main, "graph", graph)
+        response = get(url)
+        assert response.status_code == 503
+        assert response.json()["detail"] == "Database connection not ready"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
+
+# Run it as follows: "pytest tests/20_test_startup.py -v"
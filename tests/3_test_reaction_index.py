@@ -0,0 +1,406 @@
+import random
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from src.database.reaction_index import ReactionIndex, parse_temperature, reagent_components
+from src.database.deadline import Deadline, DeadlineExceeded
+
+
+@pytest.fixture
+def index():
+    """Small in-memory reaction network mirroring the seed data"""
+    compounds = [
+        {"formula": "CH3OH", "name": "Methanol", "class": "alcohol"},
+        {"formula": "CH3CH2OH", "name": "Ethanol", "class": "alcohol"},
+        {"formula": "CH2O", "name": "Formaldehyde", "class": "aldehyde"},
+        {"formula": "CH3CHO", "name": "Acetaldehyde", "class": "aldehyde"},
+        {"formula": "HCOOH", "name": "Formic acid", "class": "carboxylic_acid"},
+        {"formula": "CH3COOH", "name": "Acetic acid", "class": "carboxylic_acid"},
+        {"formula": "C6H5NH2", "name": "Aniline", "class": "amine"},
+    ]
+    reactions = [
+        ("CH3OH", "CH2O", {"reagent": "K2Cr2O7/H+", "type": "oxidation"}),
+        ("CH2O", "HCOOH", {"reagent": "K2Cr2O7/H+", "type": "oxidation"}),
+        ("CH3CH2OH", "CH3CHO", {"reagent": "K2Cr2O7/H+", "type": "oxidation"}),
+        ("CH3CH2OH", "CH3COOH", {"reagent": "KMnO4/H+", "type": "oxidation"}),
+        ("CH3CHO", "CH3COOH", {"reagent": "K2Cr2O7/H+", "type": "oxidation"}),
+        ("CH3CHO", "CH3CH2OH", {"reagent": "NaBH4", "type": "reduction"}),
+        ("CH3CCH", "CH3CHO", {"reagent": "missing reactant"}),
+    ]
+    return ReactionIndex(compounds, reactions)
+
+
+def describe(index, routes):
+    return [index.describe_route(route).to_dict() for route in routes]
+
+
+class TestReactionIndex:
+    """Test the in-memory route search snapshot"""
+
+    def test_parallel_reactions_collapse(self, index):
+        extra = ("CH3CH2OH", "CH3CHO", {"reagent": "CuO", "type": "oxidation"})
+        duplicate = ("CH3CH2OH", "CH3CHO", {"reagent": "K2Cr2O7/H+", "type": "oxidation"})
+        collapsed = ReactionIndex(index.compounds, [
+            (index.formulas[index.edge_sources[e]], index.formulas[index.edge_targets[e]],
+             index.edge_alternatives(e)[0].to_dict())
+            for e in range(index.edge_count)
+        ] + [extra, duplicate])
+        assert collapsed.edge_count == index.edge_count
+
+        paths = describe(collapsed, collapsed.find_routes(
+            collapsed.resolve(["CH3CH2OH"]), collapsed.resolve(["CH3CHO"]), 1))
+        assert len(paths) == 1, "Alternative reagents should not multiply paths"
+        assert [c["reagent"] for c in paths[0]["alternatives"][0]] == ["K2Cr2O7/H+", "CuO"]
+        assert paths[0]["reagents"] == ["K2Cr2O7/H+"]
+
+        mask = collapsed.compile_constraints({"exclude_reagents": ["K2Cr2O7"]})
+        routes = collapsed.find_routes(
+            collapsed.resolve(["CH3CH2OH"]), collapsed.resolve(["CH3CHO"]), 1, edge_mask=mask)
+        path = collapsed.describe_route(routes[0], {"exclude_reagents": ["K2Cr2O7"]})
+        assert [reaction.reagent for reaction in path.reactions] == ["CuO"]
+        assert len(path.steps[0]) == 1
+
+    def test_routes_share_compound_table(self, index):
+        sources = index.resolve(compound_class="alcohol")
+        targets = index.resolve(compound_class="carboxylic_acid")
+        routes = [index.describe_route(r) for r in index.find_routes(sources, targets, 4)]
+        table = index.compound_table(routes)
+
+        assert all(formula in table for route in routes for formula in route.compounds)
+        assert table["CH3CH2OH"] == {"formula": "CH3CH2OH", "name": "Ethanol", "class": "alcohol"}
+        assert routes[0].compounds[0] is index.formulas[index.ids[routes[0].start]], \
+            "Routes should reference the interned formula, not a copy"
+
+    def test_dangling_reactions_skipped(self, index):
+        assert index.node_count == 7
+        assert index.edge_count == 6
+
+    def test_single_pair(self, index):
+        sources = index.resolve(["CH3CH2OH"])
+        targets = index.resolve(["CH3COOH"])
+        paths = describe(index, index.find_routes(sources, targets, 5))
+
+        assert paths[0]["total_steps"] == 1
+        assert paths[0]["reagents"] == ["KMnO4/H+"]
+        assert all(a["total_steps"] <= b["total_steps"] for a, b in zip(paths, paths[1:])), \
+            "Paths should be ordered by length"
+        assert all(p["total_steps"] <= 5 for p in paths)
+
+    def test_depth_limit(self, index):
+        sources = index.resolve(["CH3OH"])
+        targets = index.resolve(["HCOOH"])
+        assert index.find_routes(sources, targets, 1) == []
+        assert len(index.find_routes(sources, targets, 2)) == 1
+
+    def test_class_selectors(self, index):
+        sources = index.resolve(compound_class="alcohol")
+        targets = index.resolve(compound_class="carboxylic_acid")
+        paths = describe(index, index.find_routes(sources, targets, 4, routes_per_pair=1))
+
+        pairs = [(p["start"], p["end"]) for p in paths]
+        assert sorted(pairs) == [("CH3CH2OH", "CH3COOH"), ("CH3OH", "HCOOH")]
+        assert len(set(pairs)) == len(pairs), "Should keep one route per pair"
+
+    def test_mixed_formulas_and_class(self, index):
+        sources = index.resolve(["C6H5NH2", "Unknown"], "alcohol")
+        assert [index.formulas[s] for s in sources] == ["C6H5NH2", "CH3OH", "CH3CH2OH"]
+
+    def test_cycles_reuse_no_reaction(self, index):
+        sources = index.resolve(["CH3CH2OH"])
+        routes = index.find_routes(sources, sources, 5)
+        assert len(routes) == 1, "Only the oxidation/reduction loop returns to ethanol"
+        assert len(routes[0]) == 2
+
+    def test_unreachable(self, index):
+        sources = index.resolve(["C6H5NH2"])
+        targets = index.resolve(["CH3COOH"])
+        assert index.find_routes(sources, targets, 10) == []
+
+
+class TestRouteConstraints:
+    """Test constraint masks applied during expansion"""
+
+    @pytest.fixture
+    def index(self):
+        compounds = [{"formula": f} for f in ["A", "B", "C", "D"]]
+        reactions = [
+            ("A", "B", {"reagent": "K2Cr2O7/H+", "type": "oxidation",
+                        "temperature": "heat", "curriculum": True}),
+            ("B", "D", {"reagent": "NaBH4", "type": "reduction",
+                        "temperature": "room temperature", "curriculum": True}),
+            ("A", "C", {"reagent": "CuO", "type": "oxidation", "temperature": "300°C"}),
+            ("C", "D", {"reagent": "H2/Pd", "type": "reduction", "temperature": 25}),
+        ]
+        return ReactionIndex(compounds, reactions)
+
+    def reagents(self, index, constraints):
+        mask = index.compile_constraints(constraints)
+        routes = index.find_routes(index.resolve(["A"]), index.resolve(["D"]), 5, edge_mask=mask)
+        return sorted(tuple(index.describe_route(r).to_dict()["reagents"]) for r in routes)
+
+    def test_unconstrained(self, index):
+        assert index.compile_constraints({"exclude_reagents": None}) is None
+        assert len(self.reagents(index, None)) == 2
+
+    def test_exclude_reagent_component(self, index):
+        assert self.reagents(index, {"exclude_reagents": ["K2Cr2O7"]}) == [("CuO", "H2/Pd")]
+
+    def test_charged_reagent_keeps_its_sign(self, index):
+        assert reagent_components("K2Cr2O7/H+") == ["K2Cr2O7/H+", "K2Cr2O7", "H+"]
+        assert reagent_components("NaOH + H2O") == ["NaOH + H2O", "NaOH", "H2O"]
+        assert self.reagents(index, {"exclude_reagents": ["H+"]}) == [("CuO", "H2/Pd")]
+        assert len(self.reagents(index, {"exclude_reagents": ["H"]})) == 2
+
+    def test_temperatures(self):
+        assert parse_temperature("0-5°C") == 5.0
+        assert parse_temperature("-10 to -5 °C") == -5.0
+        assert parse_temperature("-78°C") == -78.0
+        assert parse_temperature("reflux") == 100.0
+
+    def test_reaction_types(self, index):
+        assert self.reagents(index, {"reaction_types": ["reduction"]}) == []
+
+    def test_max_temperature(self, index):
+        assert self.reagents(index, {"max_temperature": 150}) == [("K2Cr2O7/H+", "NaBH4")]
+
+    def test_curriculum_only(self, index):
+        assert self.reagents(index, {"curriculum_only": True}) == [("K2Cr2O7/H+", "NaBH4")]
+
+    def test_mask_is_cached(self, index):
+        constraints = {"exclude_reagents": ["CuO"]}
+        assert index.compile_constraints(constraints) is index.compile_constraints(constraints)
+
+
+def reachable_from(index, source):
+    seen, stack = {source}, [source]
+    while stack:
+        node = stack.pop()
+        for edge in range(index.offsets[node], index.offsets[node + 1]):
+            target = index.edge_targets[edge]
+            if target not in seen:
+                seen.add(target)
+                stack.append(target)
+    return seen
+
+
+class TestCondensation:
+    """Test SCC condensation and reachability labels"""
+
+    def test_cycle_is_one_component(self, index):
+        ethanol, acetaldehyde = index.resolve(["CH3CH2OH", "CH3CHO"])
+        assert index.component[ethanol] == index.component[acetaldehyde]
+
+    def test_topological_order(self, index):
+        position = {c: i for i, c in enumerate(index.topological_order)}
+        for edge in range(index.edge_count):
+            a = index.component[index.edge_sources[edge]]
+            b = index.component[index.edge_targets[edge]]
+            assert a == b or position[a] < position[b]
+
+    def test_labels_never_reject_a_reachable_pair(self):
+        rng = random.Random(7)
+        compounds = [{"formula": f"C{i}"} for i in range(60)]
+        reactions = [(f"C{rng.randrange(60)}", f"C{rng.randrange(60)}", {"reagent": "r"})
+                     for _ in range(70)]
+        index = ReactionIndex(compounds, reactions, closure_limit=0)
+        rejected = 0
+        for source in range(index.node_count):
+            reachable = reachable_from(index, source)
+            for target in range(index.node_count):
+                if target in reachable:
+                    assert index.may_reach(source, target)
+                elif not index.may_reach(source, target):
+                    rejected += 1
+        assert rejected > 0
+
+    def test_unreachable_pair_skips_search(self, index, monkeypatch):
+        def fail(*args, **kwargs):
+            raise AssertionError("searched")
+        monkeypatch.setattr(index, "distances_to", fail)
+        assert index.find_routes(index.resolve(["HCOOH"]), index.resolve(["CH3OH"]), 5) == []
+        assert index.find_routes(index.resolve(["CH3OH"]), index.resolve(["C6H5NH2"]), 5) == []
+
+
+class TestClosure:
+    """Test the bitset transitive closure and reachability queries"""
+
+    def random_index(self, closure_limit=1000):
+        rng = random.Random(3)
+        compounds = [{"formula": f"C{i}"} for i in range(80)]
+        reactions = [(f"C{rng.randrange(80)}", f"C{rng.randrange(80)}", {}) for _ in range(110)]
+        return ReactionIndex(compounds, reactions, closure_limit=closure_limit)
+
+    def test_closure_is_exact(self):
+        index = self.random_index()
+        assert index.closure is not None
+        for source in range(index.node_count):
+            reachable = reachable_from(index, source)
+            for target in range(index.node_count):
+                assert index.may_reach(source, target) == (target in reachable or target == source)
+
+    def test_distance_within_steps(self, index):
+        methanol, formic, aniline = index.resolve(["CH3OH", "HCOOH", "C6H5NH2"])
+        assert index.distance(methanol, formic) == 2
+        assert index.distance(methanol, formic, 1) is None
+        assert not index.reachable(methanol, formic, 1)
+        assert index.reachable(methanol, formic, 2)
+        assert not index.reachable(methanol, aniline)
+        assert not index.reachable(formic, methanol)
+
+    def test_without_closure(self):
+        exact, plain = self.random_index(), self.random_index(closure_limit=0)
+        assert plain.closure is None
+        for source in range(0, 80, 3):
+            for target in range(80):
+                assert plain.reachable(source, target) == exact.reachable(source, target)
+                assert plain.distance(source, target, 4) == exact.distance(source, target, 4)
+
+    def test_many_sources_answered_exactly(self):
+        index = self.random_index()
+        sources = list(range(0, 80, 2))
+        expected = set()
+        for source in sources:
+            expected |= reachable_from(index, source)
+        for target in range(80):
+            assert index.any_may_reach(sources, [target]) == (target in expected or target in sources)
+
+
+class TestCostEstimate:
+    """Test path query cost estimates and shortest-only depths"""
+
+    def test_estimate_bounds_the_search(self):
+        rng = random.Random(12)
+        compounds = [{"formula": f"C{i}"} for i in range(60)]
+        reactions = [(f"C{rng.randrange(60)}", f"C{rng.randrange(60)}", {}) for _ in range(150)]
+        index = ReactionIndex(compounds, reactions)
+        for _ in range(30):
+            sources, targets = [rng.randrange(60)], [rng.randrange(60)]
+            for depth in (2, 4, 6):
+                stats = {}
+                routes = index.find_routes(sources, targets, depth, stats=stats)
+                estimate = index.estimate_routes(sources, targets, depth)
+                assert estimate >= len(routes)
+                assert estimate >= stats.get("expanded", 0) - 1
+
+    def test_concurrent_estimates_agree(self):
+        rng = random.Random(8)
+        compounds = [{"formula": f"C{i}"} for i in range(300)]
+        reactions = [(f"C{rng.randrange(300)}", f"C{rng.randrange(300)}", {}) for _ in range(900)]
+        serial = ReactionIndex(compounds, reactions, closure_limit=0)
+        shared = ReactionIndex(compounds, reactions, closure_limit=0)
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(shared._walk_counts, [depth % 10 + 1 for depth in range(40)]))
+        assert len(shared._walks) == 11
+        assert [list(walks) for walks in shared._walks] == \
+            [list(serial._walk_counts(depth)) for depth in range(11)]
+
+    def test_estimate_grows_with_depth(self, index):
+        methanol, formic = index.resolve(["CH3OH", "HCOOH"])
+        assert index.estimate_routes([methanol], [formic], 1) == 1
+        assert index.estimate_routes([methanol], [formic], 3) == 2
+        assert index.estimate_routes([formic], [methanol], 3) == 0
+
+    def test_shortest_depth(self, index):
+        ethanol, acetaldehyde, acid = index.resolve(["CH3CH2OH", "CH3CHO", "CH3COOH"])
+        assert index.shortest_depth([ethanol], [acid], 5) == 1
+        assert index.shortest_depth([acid], [ethanol], 5) is None
+        # Ethanol is a target itself, so only the cycle back to it counts
+        assert index.shortest_depth([ethanol], [ethanol], 5) == 2
+        mask = index.compile_constraints({"exclude_reagents": ["KMnO4/H+"]})
+        assert index.shortest_depth([ethanol], [acid], 5, mask) == 2
+
+
+class ChecksDeadline(Deadline):
+    """A deadline that passes after a fixed number of checks"""
+
+    def __init__(self, checks):
+        super().__init__()
+        self.checks = checks
+
+    def check(self):
+        self.checks -= 1
+        if self.checks < 0:
+            raise DeadlineExceeded("time budget exceeded")
+
+
+class TestDeadline:
+    """Test time budgets and partial results of route searches"""
+
+    @staticmethod
+    def layered_index():
+        # Four fully connected layers of eight: 8**3 routes from C0 to C31
+        compounds = [{"formula": f"C{i}"} for i in range(32)]
+        reactions = [(f"C{layer * 8 + a}", f"C{(layer + 1) * 8 + b}", {})
+                     for layer in range(3) for a in range(8) for b in range(8)]
+        reactions += [(f"C{24 + a}", "C31", {}) for a in range(7)]
+        return ReactionIndex(compounds, reactions)
+
+    def test_deadline(self):
+        deadline = Deadline(60)
+        assert not deadline.expired and 0 < deadline.remaining() <= 60
+        deadline.cancel()
+        assert deadline.expired and deadline.remaining() == 0
+        with pytest.raises(DeadlineExceeded):
+            deadline.check()
+        assert Deadline().remaining() is None
+
+    def test_expired_deadline_stops_search(self):
+        index = self.layered_index()
+        with pytest.raises(DeadlineExceeded):
+            index.find_routes([0], [31], 5, deadline=ChecksDeadline(0))
+
+    def test_partial_returns_routes_found_so_far(self):
+        index = self.layered_index()
+        full = index.find_routes([0], [31], 5)
+        stats = {}
+        routes = index.find_routes([0], [31], 5, stats=stats, deadline=ChecksDeadline(1),
+                                   partial=True)
+        assert stats["truncated"]
+        assert 0 < len(routes) < len(full)
+        assert set(routes) <= set(full)
+
+    def test_generous_deadline_changes_nothing(self, index):
+        methanol, formic = index.resolve(["CH3OH", "HCOOH"])
+        stats = {}
+        routes = index.find_routes([methanol], [formic], 5, stats=stats, deadline=Deadline(60))
+        assert routes == index.find_routes([methanol], [formic], 5)
+        assert stats["truncated"] is False
+
+
+class TestIterativeDeepening:
+    """Test route enumeration one depth at a time"""
+
+    def test_matches_full_search_by_depth(self):
+        rng = random.Random(5)
+        compounds = [{"formula": f"C{i}"} for i in range(30)]
+        for _ in range(20):
+            reactions = [(f"C{rng.randrange(30)}", f"C{rng.randrange(30)}", {}) for _ in range(70)]
+            index = ReactionIndex(compounds, reactions)
+            sources, targets = [rng.randrange(30)], [rng.randrange(30), rng.randrange(30)]
+            depths = list(index.routes_by_depth(sources, targets, 5))
+            assert [depth for depth, _ in depths] == sorted({depth for depth, _ in depths})
+            assert all(len(route) == depth for depth, routes in depths for route in routes)
+            found = [route for _, routes in depths for route in routes]
+            assert sorted(found) == sorted(index.find_routes(sources, targets, 5))
+
+    def test_stops_at_limit(self):
+        index = TestDeadline.layered_index()
+        depths = list(index.routes_by_depth([0], [31], 5, limit=10))
+        assert [(depth, len(routes)) for depth, routes in depths] == [(3, 10)]
+
+    def test_starts_at_shortest_distance(self, index):
+        methanol, formic = index.resolve(["CH3OH", "HCOOH"])
+        depths = index.routes_by_depth([methanol], [formic], 10)
+        depth, routes = next(depths)
+        assert depth == 2 and len(routes) == 1
+        assert next(depths, None) is None
+
+    def test_routes_per_pair_across_depths(self, index):
+        ethanol, acid = index.resolve(["CH3CH2OH", "CH3COOH"])
+        depths = list(index.routes_by_depth([ethanol], [acid], 5, routes_per_pair=1))
+        assert [(depth, len(routes)) for depth, routes in depths] == [(1, 1)]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
+
+# Run it as follows: "pytest tests/3_test_reaction_index.py -v"
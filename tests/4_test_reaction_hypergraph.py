@@ -0,0 +1,105 @@
+import pytest
+from src.database.graph_manager import ChemicalGraph
+from src.database.reaction_hypergraph import ReactionHypergraph
+
+
+class FakeTransaction:
+    """Answers the hypergraph load the way Neo4j returns it"""
+
+    def run(self, query, **params):
+        if "m.generation" in query:
+            return FakeResult([{"generation": 7}])
+        if "MATCH (c:Compound) RETURN c" in query:
+            return FakeResult([{"c": {"formula": f}} for f in ["CH3CH2OH", "CH3CHO"]])
+        return FakeResult([
+            {"reactants": ["CH3CH2OH"], "products": ["CH3CHO"],
+             "conditions": {"reagent": "PCC", "variant": "PCC"}},
+        ])
+
+    def session(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute_read(self, work):
+        return work(self)
+
+    def close(self):
+        pass
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def data(self):
+        return self.rows
+
+    def single(self):
+        return self.rows[0] if self.rows else None
+
+
+@pytest.fixture
+def hypergraph():
+    """Esterification network mixing single and multi-reactant reactions"""
+    compounds = [
+        {"formula": f} for f in
+        ["CH3OH", "CH3CH2OH", "CH3CHO", "CH3COOH", "CH3COOCH3", "CH3COOCH2CH3"]
+    ]
+    reactions = [
+        (["CH3CH2OH"], ["CH3CHO"], {"reagent": "K2Cr2O7/H+"}),
+        (["CH3CHO"], ["CH3COOH"], {"reagent": "K2Cr2O7/H+"}),
+        (["CH3CH2OH"], ["CH3COOH"], {"reagent": "KMnO4/H+"}),
+        (["CH3COOH", "CH3OH"], ["CH3COOCH3"], {"reagent": "H2SO4"}),
+        (["CH3COOH", "CH3CH2OH"], ["CH3COOCH2CH3"], {"reagent": "H2SO4"}),
+        (["CH3COOH", "Unknown"], ["CH3COOCH3"], {"reagent": "dangling"}),
+    ]
+    return ReactionHypergraph(compounds, reactions)
+
+
+class TestReactionHypergraph:
+    """Test AND-OR route planning over multi-reactant reactions"""
+
+    def test_incidence(self, hypergraph):
+        assert hypergraph.reaction_count == 5
+        acid = hypergraph.ids["CH3COOH"]
+        consumers = hypergraph.consumers[
+            hypergraph.consumer_offsets[acid]:hypergraph.consumer_offsets[acid + 1]]
+        assert len(consumers) == 2
+
+    def test_needs_every_reactant(self, hypergraph):
+        assert hypergraph.plan("CH3COOCH3", ["CH3CH2OH"]) is None
+
+    def test_plan_with_co_reactant(self, hypergraph):
+        plan = hypergraph.plan("CH3COOCH3", ["CH3CH2OH", "CH3OH"])
+        assert plan["total_steps"] == 2
+        assert plan["starting_materials"] == ["CH3CH2OH", "CH3OH"]
+        assert plan["steps"][0]["products"] == ["CH3COOH"]
+        assert plan["steps"][-1]["reactants"] == ["CH3COOH", "CH3OH"]
+
+    def test_shared_starting_material(self, hypergraph):
+        plan = hypergraph.plan("CH3COOCH2CH3", ["CH3CH2OH"])
+        assert [step["conditions"]["reagent"] for step in plan["steps"]] == ["KMnO4/H+", "H2SO4"]
+
+    def test_max_steps(self, hypergraph):
+        assert hypergraph.plan("CH3COOCH3", ["CH3CH2OH", "CH3OH"], max_steps=1) is None
+
+
+    def test_loaded_conditions_hide_variant(self):
+        graph = ChemicalGraph("bolt://test", "neo4j", "secret", connect=False)
+        graph._driver = FakeTransaction()
+        graph._ready.set()
+        loaded = graph._load_hypergraph()
+        plan = loaded.plan("CH3CHO", ["CH3CH2OH"])
+        assert loaded.generation == 7
+        assert plan["steps"][0]["conditions"] == {"reagent": "PCC"}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
+
+# Run it as follows: "pytest tests/4_test_reaction_hypergraph.py -v"
@@ -0,0 +1,145 @@
+import os
+import pickle
+import random
+from collections import deque
+import pytest
+from src.database.reaction_index import ReactionIndex
+from src.database.batch_search import BatchSolver
+from src.database.frontier import hop_distances, NO_ROUTE
+from src.database.landmarks import LandmarkIndex
+
+
+@pytest.fixture
+def index():
+    compounds = [{"formula": f} for f in ["A", "B", "C", "D", "E"]]
+    reactions = [
+        ("A", "B", {"reagent": "r1"}),
+        ("B", "C", {"reagent": "r2"}),
+        ("A", "C", {"reagent": "r3"}),
+        ("C", "D", {"reagent": "r4"}),
+    ]
+    return ReactionIndex(compounds, reactions)
+
+
+PAIRS = [("A", "C"), ("A", "D"), ("B", "D"), ("A", "C"), ("E", "A"), ("C", "D"), ("X", "A")]
+
+
+def expected(index, pairs):
+    results = []
+    for start, end in pairs:
+        routes = index.find_routes(index.resolve([start]), index.resolve([end]), 5)
+        results.append([index.describe_route(r).to_dict() for r in routes])
+    return results
+
+
+class TestBatchSolver:
+    """Test batch path solving with and without the process pool"""
+
+    def test_inline_matches_single_queries(self, index):
+        solver = BatchSolver(workers=1)
+        results = solver.solve(index, PAIRS)
+        assert [(r["start"], r["end"]) for r in results] == PAIRS
+        assert [[p.to_dict() for p in r["paths"]] for r in results] == expected(index, PAIRS)
+
+    def test_process_pool_matches_single_queries(self, index):
+        solver = BatchSolver(workers=2, min_parallel_groups=1)
+        try:
+            results = solver.solve(index, PAIRS)
+            assert [[p.to_dict() for p in r["paths"]] for r in results] == expected(index, PAIRS)
+        finally:
+            solver.close()
+
+    def test_pool_outlives_snapshots(self, index):
+        solver = BatchSolver(workers=2, min_parallel_groups=1)
+        try:
+            solver.solve(index, PAIRS)
+            pool, first = solver._pool, solver._snapshot_path
+            newer = ReactionIndex([{"formula": f} for f in "ABCDE"],
+                                  [("A", "E", {"reagent": "r5"})], generation=1)
+            results = solver.solve(newer, [("A", "E"), ("B", "E")])
+            assert [len(r["paths"]) for r in results] == [1, 0]
+            assert solver._pool is pool
+            assert not os.path.exists(first)
+        finally:
+            solver.close()
+
+    def test_snapshot_leaves_out_attachments_and_caches(self, index):
+        index.landmarks = LandmarkIndex(index, 2)
+        index.hierarchy = object()
+        expected_paths = expected(index, PAIRS)
+        index.compile_constraints({"exclude_reagents": ["r3"]})
+        solver = BatchSolver(workers=2, min_parallel_groups=1)
+        try:
+            solver.solve(index, PAIRS)
+            with open(solver._snapshot_path, "rb") as f:
+                loaded = pickle.load(f)
+            assert loaded.landmarks is None and loaded.hierarchy is None
+            assert loaded._compiled == {} and loaded._reverse_offsets is None
+            assert len(loaded._walks) == 1
+            assert loaded.closure == index.closure
+            assert expected(loaded, PAIRS) == expected_paths
+            assert loaded.estimate_routes([0], [3], 3) == index.estimate_routes([0], [3], 3)
+        finally:
+            solver.close()
+
+    def test_constraints_apply_to_batch(self, index):
+        solver = BatchSolver(workers=1)
+        results = solver.solve(index, [("A", "C")], constraints={"exclude_reagents": ["r3"]})
+        assert [p.to_dict()["reagents"] for p in results[0]["paths"]] == [["r1", "r2"]]
+
+
+def bfs(index, source, max_depth, edge_mask=None):
+    distance = {source: 0}
+    queue = deque([source])
+    while queue:
+        node = queue.popleft()
+        if distance[node] == max_depth:
+            continue
+        for edge in range(index.offsets[node], index.offsets[node + 1]):
+            target = index.edge_targets[edge]
+            if (edge_mask is None or edge_mask[edge]) and target not in distance:
+                distance[target] = distance[node] + 1
+                queue.append(target)
+    return distance
+
+
+class TestHopDistances:
+    """Test batched frontier expansion"""
+
+    def test_matches_bfs_per_source(self):
+        rng = random.Random(8)
+        compounds = [{"formula": f"C{i}"} for i in range(150)]
+        reactions = [(f"C{rng.randrange(150)}", f"C{rng.randrange(150)}",
+                      {"reagent": f"r{rng.randrange(3)}"}) for _ in range(300)]
+        index = ReactionIndex(compounds, reactions)
+        mask = index.compile_constraints({"exclude_reagents": ["r0"]})
+        sources = [rng.randrange(150) for _ in range(100)]
+        for edge_mask in (None, mask):
+            rows = hop_distances(index, sources, 4, edge_mask=edge_mask)
+            for source, row in zip(sources, rows):
+                distance = bfs(index, source, 4, edge_mask)
+                assert {t: d for t, d in enumerate(row) if d != NO_ROUTE} == distance
+
+    def test_selected_targets(self, index):
+        a, b, c, d, e = range(5)
+        rows = hop_distances(index, [a, c, a], 5, targets=[d, b, e, d])
+        assert [list(row) for row in rows] == [[2, 1, -1, 2], [1, -1, -1, 1], [2, 1, -1, 2]]
+        assert list(hop_distances(index, [a], 1, targets=[d])[0]) == [NO_ROUTE]
+
+    def test_batch_skips_pairs_out_of_reach(self, index, monkeypatch):
+        solver = BatchSolver(workers=1)
+        searched = []
+        import src.database.batch_search as batch_search
+        solve_source = batch_search.solve_source
+        monkeypatch.setattr(batch_search, "solve_source",
+                            lambda index, source, targets, *args: searched.append(source) or
+                            solve_source(index, source, targets, *args))
+        results = solver.solve(index, [("A", "D"), ("E", "A"), ("D", "A")], max_depth=1)
+        assert searched == []
+        assert [r["paths"] for r in results] == [[], [], []]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
+
+# Run it as follows: "pytest tests/5_test_batch_search.py -v"
@@ -0,0 +1,69 @@
+import json
+import pytest
+from src.api import serialization
+from src.api.serialization import FragmentCache, RawJSONResponse, dumps
+from src.database.reaction_index import ReactionIndex
+
+
+@pytest.fixture(autouse=True, params=["orjson", "json"])
+def encoder(request, monkeypatch):
+    """Run every test with orjson and with the stdlib encoder fallback"""
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(serialization, "orjson", None)
+    return request.param
+
+
+@pytest.fixture
+def index():
+    compounds = [
+        {"formula": "CH3CH2OH", "name": "Ethanol", "class": "alcohol"},
+        {"formula": "CH3CHO", "name": "Acetaldehyde"},
+        {"formula": "CH3COOH", "name": "Acetic acid", "molecular_weight": 60.05},
+    ]
+    reactions = [
+        ("CH3CH2OH", "CH3CHO", {"reagent": "K2Cr2O7/H+", "temperature": "heat"}),
+        ("CH3CH2OH", "CH3CHO", {"reagent": "CuO", "temperature": "300°C"}),
+        ("CH3CHO", "CH3COOH", {"reagent": "K2Cr2O7/H+", "type": "oxidation"}),
+        ("CH3CH2OH", "CH3COOH", {"reagent": "KMnO4/H+", "curriculum": True}),
+    ]
+    return ReactionIndex(compounds, reactions)
+
+
+def routes(index):
+    found = index.find_routes(index.resolve(["CH3CH2OH"]), index.resolve(["CH3COOH"]), 3)
+    return [index.describe_route(route) for route in found]
+
+
+class TestFragmentCache:
+    """Test that assembled JSON matches encoding the full payload"""
+
+    def test_routes_match_to_dict(self, index):
+        fragments = FragmentCache(index)
+        paths = routes(index)
+        assert json.loads(fragments.routes(paths)) == [route.to_dict() for route in paths]
+
+    def test_compound_table(self, index):
+        fragments = FragmentCache(index)
+        table = json.loads(fragments.compound_table(routes(index)))
+        assert list(table) == ["CH3CH2OH", "CH3COOH", "CH3CHO"]
+        assert table["CH3COOH"] == {"formula": "CH3COOH", "name": "Acetic acid",
+                                    "molecular_weight": 60.05}
+
+    def test_fragments_are_reused(self, index):
+        fragments = FragmentCache(index)
+        first = routes(index)[0]
+        assert fragments.reaction(first.reactions[0]) is fragments.reaction(first.reactions[0])
+        assert fragments.compound("CH3CH2OH") is fragments.compound("CH3CH2OH")
+
+    def test_raw_response(self):
+        assert RawJSONResponse(b'{"a":1}').body == b'{"a":1}'
+        assert json.loads(RawJSONResponse({"temperature": "300°C"}).body) == {"temperature": "300°C"}
+        assert json.loads(dumps([1, "x"])) == [1, "x"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
+
+# Run it as follows: "pytest tests/6_test_serialization.py -v"
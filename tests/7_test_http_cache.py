@@ -0,0 +1,68 @@
+import gzip
+import pytest
+from starlette.requests import Request
+from src.api import http_cache
+from src.api.http_cache import make_etag, not_modified, cached_response, MIN_COMPRESS_SIZE
+
+
+def request_with(headers):
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/compounds/",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+    })
+
+
+class TestConditionalGet:
+    """Test ETag revalidation and content negotiation"""
+
+    def test_etag_changes_with_generation(self):
+        assert make_etag(1) != make_etag(2)
+        assert make_etag(3).startswith('W/"')
+
+    def test_not_modified(self):
+        etag = make_etag(7)
+        response = not_modified(request_with({"If-None-Match": etag}), etag)
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+
+        strong = etag[2:]
+        assert not_modified(request_with({"If-None-Match": f'"x", {strong}'}), etag) is not None
+        assert not_modified(request_with({"If-None-Match": make_etag(6)}), etag) is None
+        assert not_modified(request_with({}), etag) is None
+
+    def test_gzip_large_bodies(self):
+        body = b"[" + b",".join([b'{"formula":"CH3CH2OH"}'] * 200) + b"]"
+        assert len(body) > MIN_COMPRESS_SIZE
+        response = cached_response(request_with({"Accept-Encoding": "gzip, deflate"}), body, make_etag(1))
+        assert response.headers["content-encoding"] == "gzip"
+        assert gzip.decompress(response.body) == body
+        assert response.headers["vary"] == "Accept-Encoding"
+
+    def test_brotli_preferred(self):
+        brotli = pytest.importorskip("brotli")
+        body = b"[" + b",".join([b'{"formula":"CH3CH2OH"}'] * 200) + b"]"
+        response = cached_response(request_with({"Accept-Encoding": "gzip, br"}), body, make_etag(1))
+        assert response.headers["content-encoding"] == "br"
+        assert brotli.decompress(response.body) == body
+
+    def test_gzip_without_brotli(self, monkeypatch):
+        monkeypatch.setattr(http_cache, "brotli", None)
+        body = b"[" + b",".join([b'{"formula":"CH3CH2OH"}'] * 200) + b"]"
+        response = cached_response(request_with({"Accept-Encoding": "br, gzip"}), body, make_etag(1))
+        assert response.headers["content-encoding"] == "gzip"
+        assert gzip.decompress(response.body) == body
+
+    def test_small_or_refused_bodies_uncompressed(self):
+        small = cached_response(request_with({"Accept-Encoding": "gzip"}), b"[]", make_etag(1))
+        assert "content-encoding" not in small.headers
+        body = b"x" * (MIN_COMPRESS_SIZE * 2)
+        refused = cached_response(request_with({"Accept-Encoding": "gzip;q=0"}), body, make_etag(1))
+        assert refused.body == body
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
+
+# Run it as follows: "pytest tests/7_test_http_cache.py -v"
@@ -0,0 +1,100 @@
+import pytest
+from src.database.write_queue import WriteQueue, QueueFullError
+
+
+class FakeGraph:
+    """Records add_batch calls; reactions need both compounds to exist"""
+
+    def __init__(self, compounds=(), fail_on=None):
+        self.compounds = set(compounds)
+        self.batches = []
+        self.fail_on = fail_on
+        self.is_ready = True
+
+    def add_batch(self, compounds, reactions):
+        if self.fail_on and any(formula == self.fail_on for formula, _ in compounds):
+            raise ValueError("bad compound")
+        self.batches.append((compounds, reactions))
+        self.compounds.update(formula for formula, _ in compounds)
+        return [r in self.compounds and p in self.compounds for r, p, _ in reactions]
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = WriteQueue(str(tmp_path / "writes.db"), max_depth=5, batch_size=10)
+    yield queue
+    queue.stop()
+
+
+class TestWriteQueue:
+    """Test the write-behind queue without a database"""
+
+    def test_submit_and_drain(self, queue):
+        graph = FakeGraph()
+        ticket = queue.submit("compound", {"formula": "CH4", "properties": {"name": "methane"}})
+        assert queue.status(ticket)["status"] == "queued"
+        assert queue.depth == 1
+
+        assert queue.drain_once(graph) == 1
+        assert queue.status(ticket)["status"] == "done"
+        assert queue.depth == 0
+        assert graph.batches == [([("CH4", {"name": "methane"})], [])]
+
+    def test_coalesces_repeated_writes(self, queue):
+        graph = FakeGraph()
+        queue.submit("compound", {"formula": "C2H4", "properties": {"name": "ethene"}})
+        queue.submit("compound", {"formula": "C2H4", "properties": {"state": "gas"}})
+        queue.submit("compound", {"formula": "C2H6", "properties": {}})
+        queue.submit("reaction", {"reactant": "C2H4", "product": "C2H6",
+                                  "conditions": {"reagent": "H2/Ni"}})
+        queue.submit("reaction", {"reactant": "C2H4", "product": "C2H6",
+                                  "conditions": {"reagent": "H2/Ni", "temperature": 150}})
+        queue.drain_once(graph)
+
+        compounds, reactions = graph.batches[0]
+        assert dict(compounds)["C2H4"] == {"name": "ethene", "state": "gas"}
+        assert reactions == [("C2H4", "C2H6", {"reagent": "H2/Ni", "temperature": 150})]
+
+    def test_missing_compound_fails_ticket(self, queue):
+        ticket = queue.submit("reaction", {"reactant": "X", "product": "Y",
+                                           "conditions": {"reagent": "r"}})
+        queue.drain_once(FakeGraph())
+        result = queue.status(ticket)
+        assert result["status"] == "failed"
+        assert "not found" in result["error"]
+
+    def test_backpressure(self, queue):
+        for i in range(5):
+            queue.submit("compound", {"formula": f"C{i}"})
+        with pytest.raises(QueueFullError):
+            queue.submit("compound", {"formula": "C9"})
+
+    def test_bad_write_is_isolated(self, queue):
+        graph = FakeGraph(fail_on="BAD")
+        good = queue.submit("compound", {"formula": "CH4"})
+        bad = queue.submit("compound", {"formula": "BAD"})
+        for _ in range(queue.max_attempts):
+            queue.drain_once(graph)
+        assert queue.status(good)["status"] == "done"
+        assert queue.status(bad)["status"] == "failed"
+        assert queue.depth == 0
+
+    def test_queue_survives_restart(self, tmp_path):
+        path = str(tmp_path / "writes.db")
+        queue = WriteQueue(path)
+        ticket = queue.submit("compound", {"formula": "CH4"})
+        queue.stop()
+
+        queue = WriteQueue(path)
+        try:
+            assert queue.depth == 1
+            queue.drain_once(FakeGraph())
+            assert queue.status(ticket)["status"] == "done"
+        finally:
+            queue.stop()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
+
+# Run it as follows: "pytest tests/8_test_write_queue.py -v"
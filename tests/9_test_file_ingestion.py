@@ -0,0 +1,282 @@
+import json
+import time
+import threading
+import pytest
+from src.database.file_ingestion import (
+    normalize_formula, parse_record, read_raw, ingest_files, BulkWriter, IngestionStats, dedupe
+)
+from src.database.data_ingestion import REACTION_SETS, reaction_set_records
+
+
+class DeadlockError(Exception):
+    code = "Neo.TransientError.Transaction.DeadlockDetected"
+
+
+class FakeGraph:
+    """
+    Collects add_batch calls; reactions need both compounds to exist. Every
+    compound a batch writes or links is locked while it runs; with deadlocks,
+    a batch touching a locked compound fails like Neo4j would.
+    """
+
+    def __init__(self, deadlocks=False):
+        self.deadlocks = deadlocks
+        self.compounds = {}
+        self.reactions = []
+        self.batches = 0
+        self.generation_bumps = 0
+        self.hashes = set()
+        self.in_flight = set()
+        self.collisions = 0
+        self._lock = threading.Lock()
+
+    def add_batch(self, compounds, reactions, bump_generation=True,
+                  compound_hashes=None, reaction_hashes=None, placeholders=None):
+        touched = ({formula for formula, _ in compounds} | set(placeholders or []) |
+                   {r for r, _, _ in reactions} | {p for _, p, _ in reactions})
+        with self._lock:
+            clash = touched & self.in_flight
+            self.collisions += len(clash)
+            if clash and self.deadlocks:
+                raise DeadlockError("deadlock")
+            self.in_flight |= touched
+        time.sleep(0.001)
+        with self._lock:
+            self.in_flight -= touched
+            self.batches += 1
+            # Like SET c += properties REMOVE c.placeholder
+            for formula, properties in compounds:
+                existing = self.compounds.get(formula, {})
+                self.compounds[formula] = {**{key: value for key, value in existing.items()
+                                              if key != "placeholder"}, **properties}
+            for formula in placeholders or []:
+                self.compounds.setdefault(formula, {"placeholder": True})
+            written = [r in self.compounds and p in self.compounds for r, p, _ in reactions]
+            self.reactions.extend(r for r, ok in zip(reactions, written) if ok)
+            for hashes in compound_hashes or []:
+                self.hashes.update(hashes)
+            for hashes, ok in zip(reaction_hashes or [], written):
+                if ok:
+                    self.hashes.update(hashes)
+            return written
+
+    def known_hashes(self, hashes):
+        return self.hashes.intersection(hashes)
+
+    def bump_generation(self):
+        self.generation_bumps += 1
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    path = tmp_path / "reactions.csv"
+    path.write_text(
+        "formula,name,class,molecular_weight,reactant,product,reagent,temperature,type\n"
+        "CH3CH2OH,Ethanol,alcohol,46.07,,,,,\n"
+        "CH3CHO,Acetaldehyde,,,,,,,\n"
+        ",,,,CH3CH2OH,CH3CHO,K2Cr2O7/H+,heat,oxidation\n"
+        ",,,,CH3CH2OH,CH3CHO,K2Cr2O7/H+,heat,oxidation\n"
+        ",,,,CH3CH2OH,,CuO,,\n"
+        ",,,,CH3CHO,C2H5Br,PBr3,25,\n",
+        encoding="utf-8"
+    )
+    return str(path)
+
+
+@pytest.fixture
+def jsonl_file(tmp_path):
+    path = tmp_path / "reactions.jsonl"
+    lines = [
+        {"formula": "C₂H₄", "name": "Ethene"},
+        {"formula": "C2H6"},
+        {"reactant": "C2H4", "product": "C2H6", "conditions": {"reagent": "H2/Ni"}},
+    ]
+    path.write_text("\n".join(json.dumps(line) for line in lines) + "\n{broken\n",
+                    encoding="utf-8")
+    return str(path)
+
+
+class TestParsing:
+    """Test record normalization and validation"""
+
+    def test_normalize_formula(self):
+        assert normalize_formula(" C₂H₅ OH ") == "C2H5OH"
+        assert normalize_formula("HCHO") == "CH2O"
+
+    def test_csv_rows(self, csv_file):
+        records = [parse_record(raw) for raw in read_raw(csv_file)]
+        assert records[0] == ("compound", "CH3CH2OH", {
+            "formula": "CH3CH2OH", "name": "Ethanol", "class": "alcohol", "molecular_weight": 46.07})
+        assert records[2] == ("reaction", "CH3CH2OH", "CH3CHO",
+                              {"reagent": "K2Cr2O7/H+", "temperature": "heat", "type": "oxidation"})
+        assert records[4][0] == "invalid"
+        assert records[5][3]["temperature"] == 25.0
+
+    def test_jsonl_bad_line_is_invalid(self, jsonl_file):
+        records = [parse_record(raw) for raw in read_raw(jsonl_file)]
+        assert records[0][1] == "C2H4"
+        assert records[-1][0] == "invalid"
+
+
+class TestIngestFiles:
+    """Test the streaming pipeline against a fake graph"""
+
+    def test_pipeline(self, csv_file, jsonl_file):
+        graph = FakeGraph()
+        stats = ingest_files(graph, [csv_file, jsonl_file], batch_size=2, progress_interval=60)
+        assert stats.read == 10
+        assert stats.invalid == 2
+        assert stats.duplicates == 1
+        assert stats.compounds == 4
+        assert stats.reactions == 2
+        assert stats.missing == 1
+        assert graph.generation_bumps == 1
+
+    def test_dedupe_window_is_bounded(self):
+        stats = IngestionStats(60)
+        records = [("compound", f"C{i}", {}) for i in range(5)]
+        kept = list(dedupe(records + records[3:] + records[:1], stats, window=3))
+        # C3 and C4 are still in the window; C0 was evicted and passes again
+        assert [record[1] for record in kept] == ["C0", "C1", "C2", "C3", "C4", "C0"]
+        assert stats.duplicates == 2
+
+    def test_workers_match_inline(self, csv_file, jsonl_file):
+        inline, pooled = FakeGraph(), FakeGraph()
+        ingest_files(inline, [csv_file, jsonl_file], progress_interval=60)
+        ingest_files(pooled, [csv_file, jsonl_file], workers=2, progress_interval=60)
+        assert pooled.compounds == inline.compounds
+        assert sorted(map(repr, pooled.reactions)) == sorted(map(repr, inline.reactions))
+
+    def test_missing_compounds_are_flagged(self, csv_file):
+        stats = ingest_files(FakeGraph(), [csv_file], progress_interval=60)
+        assert stats.missing_examples == [("CH3CHO", "C2H5Br")]
+
+    def test_create_missing(self, csv_file):
+        graph = FakeGraph()
+        stats = ingest_files(graph, [csv_file], progress_interval=60, create_missing=True)
+        assert stats.missing == 0
+        assert stats.reactions == 2
+        assert graph.compounds["C2H5Br"] == {"placeholder": True}
+        assert "placeholder" not in graph.compounds["CH3CHO"]
+
+    def test_placeholder_resolved_by_later_record(self, csv_file, tmp_path):
+        graph = FakeGraph()
+        ingest_files(graph, [csv_file], progress_interval=60, create_missing=True)
+        later = tmp_path / "later.jsonl"
+        later.write_text(json.dumps({"formula": "C2H5Br", "name": "Bromoethane"}) + "\n")
+        ingest_files(graph, [str(later)], progress_interval=60)
+        assert graph.compounds["C2H5Br"] == {"formula": "C2H5Br", "name": "Bromoethane"}
+
+    def test_dry_run(self, csv_file):
+        stats = ingest_files(None, [csv_file], progress_interval=60)
+        assert stats.reactions == 2
+
+
+class TestBulkWriter:
+    """Test sharded concurrent writes"""
+
+    def records(self):
+        compounds = [("compound", f"C{i}", {"formula": f"C{i}"}) for i in range(20)]
+        reactions = [("reaction", f"C{i}", f"C{(i * 7 + 1) % 20}", {"reagent": f"r{j}"})
+                     for i in range(20) for j in range(5)]
+        return compounds + reactions
+
+    def test_writes_everything_once(self):
+        graph = FakeGraph()
+        stats = IngestionStats(60)
+        BulkWriter(graph, writers=4, batch_size=8).write(self.records(), stats)
+        assert stats.compounds == 20
+        assert stats.reactions == 100
+        assert len(graph.reactions) == 100
+
+    def test_compound_batches_do_not_share_nodes(self):
+        graph = FakeGraph()
+        compounds = [record for record in self.records() if record[0] == "compound"]
+        BulkWriter(graph, writers=4, batch_size=3).write(compounds, IngestionStats(60))
+        assert graph.batches > 4
+        assert graph.collisions == 0
+
+    def test_shared_products_are_retried(self):
+        graph = FakeGraph(deadlocks=True)
+        stats = IngestionStats(60)
+        BulkWriter(graph, writers=4, batch_size=3, max_retries=100,
+                   retry_delay=0.0001).write(self.records(), stats)
+        # Reactions of different reactants may share a product
+        assert graph.collisions > 0
+        assert stats.reactions == 100
+        assert len(graph.reactions) == 100
+
+    def test_retries_transient_errors(self):
+        graph = FakeGraph()
+        add_batch = graph.add_batch
+        failures = []
+
+        def flaky(compounds, reactions, **kwargs):
+            if len(failures) < 2:
+                failures.append(1)
+                raise DeadlockError("deadlock")
+            return add_batch(compounds, reactions, **kwargs)
+
+        graph.add_batch = flaky
+        stats = IngestionStats(60)
+        BulkWriter(graph, writers=2, retry_delay=0.001).write(self.records(), stats)
+        assert stats.reactions == 100
+
+    def test_other_errors_are_raised(self):
+        graph = FakeGraph()
+
+        def broken(compounds, reactions, **kwargs):
+            raise ValueError("bad data")
+
+        graph.add_batch = broken
+        with pytest.raises(ValueError):
+            BulkWriter(graph, writers=2).write(self.records(), IngestionStats(60))
+
+
+class TestIdempotentIngestion:
+    """Test content hashing and skipping of already ingested records"""
+
+    def test_reingest_is_noop(self, csv_file, jsonl_file):
+        graph = FakeGraph()
+        first = ingest_files(graph, [csv_file, jsonl_file], progress_interval=60)
+        batches = graph.batches
+        second = ingest_files(graph, [csv_file, jsonl_file], progress_interval=60)
+        assert second.unchanged == first.compounds + first.reactions
+        assert second.compounds == second.reactions == 0
+        # Only the reaction whose product is still missing is sent again
+        assert graph.batches == batches + 1
+        assert second.missing == 1
+        assert graph.generation_bumps == 1
+
+    def test_missing_reaction_is_retried_later(self, csv_file):
+        graph = FakeGraph()
+        ingest_files(graph, [csv_file], progress_interval=60)
+        graph.compounds["C2H5Br"] = {}
+        stats = ingest_files(graph, [csv_file], progress_interval=60)
+        assert stats.reactions == 1
+        assert stats.missing == 0
+
+    def test_force_rewrites(self, csv_file):
+        graph = FakeGraph()
+        ingest_files(graph, [csv_file], progress_interval=60)
+        stats = ingest_files(graph, [csv_file], progress_interval=60, skip_known=False)
+        assert stats.unchanged == 0
+        assert stats.compounds == 2
+
+    def test_reaction_sets_are_deduplicated(self):
+        graph = FakeGraph()
+        stats = IngestionStats(60)
+        BulkWriter(graph).write(dedupe(reaction_set_records(REACTION_SETS), stats), stats)
+        assert "HCHO" not in graph.compounds
+        assert graph.compounds["CH2O"]["molecular_weight"] == 30.03
+        oxidations = [r for r in graph.reactions
+                      if r[:2] == ("CH3CH2OH", "CH3CHO") and r[2]["reagent"] == "K2Cr2O7/H+"]
+        assert len(oxidations) == 1
+        assert oxidations[0][2]["mechanism"] == "primary alcohol oxidation"
+        assert stats.duplicates >= 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
+
+# Run it as follows: "pytest tests/9_test_file_ingestion.py -v"
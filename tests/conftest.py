@@ -0,0 +1,44 @@
+import asyncio
+import httpx
+import pytest
+from src.api import main
+from src.api.lanes import Lane
+from src.api.single_flight import SingleFlight
+
+
+class FakeGraph:
+    """A ready graph at generation 1 whose path queries are all cheap"""
+    is_ready = True
+    generation = 1
+
+    def estimate_routes(self, start, end, max_depth, start_class=None, end_class=None,
+                        deadline=None):
+        return 10
+
+
+@pytest.fixture
+def lanes():
+    """Private lanes for one test; override to size them"""
+    lanes = {name: Lane(name, 2, 64) for name in ("interactive", "search", "batch", "write")}
+    yield lanes
+    for lane in lanes.values():
+        lane.shutdown(wait=False)
+
+
+@pytest.fixture
+def api(monkeypatch, lanes):
+    """The API module with a FakeGraph, the lanes and a fresh SingleFlight; yields monkeypatch"""
+    monkeypatch.setattr(main, "graph", FakeGraph())
+    monkeypatch.setattr(main, "lanes", lanes)
+    monkeypatch.setattr(main, "path_flights", SingleFlight(lanes["search"]))
+    return monkeypatch
+
+
+async def get_many(urls, headers=None):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await asyncio.gather(*(client.get(url, headers=headers) for url in urls))
+
+
+def get(url, headers=None):
+    return asyncio.run(get_many([url], headers))[0]